@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Tests that persist quests use the embedded SQLite backend; keep them off
+# the developer's own raindrop-backend/citizen_hero.sqlite3.
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="citizen-hero-tests-"), "quests.sqlite3"))
@@ -115,6 +115,21 @@
     return resp;
   }
 
+  async function patchJson(path, body) {
+    const url = API_BASE_URL + path;
+    const options = {
+      method: "PATCH",
+      headers: {
+        "Content-Type": "application/json",
+        "Accept": "application/json"
+      },
+      credentials: "include",
+      body: JSON.stringify(body || {})
+    };
+    const resp = await fetch(url, options);
+    return resp;
+  }
+
   async function deleteRequest(path) {
     const url = API_BASE_URL + path;
     const options = {
@@ -208,12 +223,19 @@
     });
 
     try {
-      const resp = await postJson("/generate-quest", payload);
-      let questData;
-      if (resp.ok) {
-        questData = await resp.json();
-      } else {
-        console.warn("generate-quest returned non-OK status:", resp.status);
+      let questData = null;
+      try {
+        questData = await streamQuest(payload);
+      } catch (err) {
+        console.warn("generate-quest stream unavailable, using /generate-quest:", err);
+      }
+      if (!questData) {
+        const resp = await postJson("/generate-quest", payload);
+        if (resp.ok) {
+          questData = await resp.json();
+        } else {
+          console.warn("generate-quest returned non-OK status:", resp.status);
+        }
       }
       if (!questData) {
         questData = buildLocalFallbackQuest(state.basePayload);
@@ -231,6 +253,93 @@
     }
   }
 
+  // Streams /generate-quest:stream (Server-Sent Events read through fetch,
+  // since EventSource cannot POST) and previews the quest name, summary and
+  // steps as they arrive.  Resolves with the stored quest from the final
+  // "done" event, or null if the stream ends without one.
+  async function streamQuest(payload) {
+    const resp = await fetch(API_BASE_URL + "/generate-quest:stream", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+      },
+      credentials: "include",
+      body: JSON.stringify(payload || {})
+    });
+    if (!resp.ok || !resp.body || !resp.body.getReader) {
+      return null;
+    }
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let preview = { quest_name: "", mission_summary: "", steps: [] };
+    renderQuestPreview(preview);
+    showSection("quest");
+
+    for (;;) {
+      const chunk = await reader.read();
+      if (chunk.done) return null;
+      buffer += decoder.decode(chunk.value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const event = parseSseEvent(buffer.slice(0, boundary));
+        buffer = buffer.slice(boundary + 2);
+        if (!event) continue;
+        if (event.name === "done") return event.data;
+        if (event.name === "error") return null;
+        if (event.name === "reset") {
+          preview = { quest_name: "", mission_summary: "", steps: [] };
+        } else if (event.name === "step") {
+          preview.steps.push(event.data);
+        } else {
+          preview[event.name] = event.data;
+        }
+        renderQuestPreview(preview);
+      }
+    }
+  }
+
+  function parseSseEvent(block) {
+    let name = "message";
+    const data = [];
+    block.split("\n").forEach(function (line) {
+      if (line.indexOf("event:") === 0) name = line.slice(6).trim();
+      else if (line.indexOf("data:") === 0) data.push(line.slice(5).trim());
+    });
+    if (!data.length) return null;
+    return { name: name, data: JSON.parse(data.join("\n")) };
+  }
+
+  // Read-only card shown while a quest streams in; the full view (with
+  // step checkboxes) replaces it once the quest has been stored.
+  function renderQuestPreview(partial) {
+    questOutput.innerHTML = "";
+    const card = document.createElement("div");
+    card.className = "quest-card";
+
+    const title = document.createElement("h3");
+    title.textContent = partial.quest_name || "Suit OS JayNova is forging your quest…";
+    card.appendChild(title);
+
+    if (partial.mission_summary) {
+      const summary = document.createElement("p");
+      summary.textContent = partial.mission_summary;
+      card.appendChild(summary);
+    }
+
+    const stepsList = document.createElement("ul");
+    stepsList.className = "step-list";
+    partial.steps.forEach(function (step, idx) {
+      const li = document.createElement("li");
+      li.className = "step-item";
+      li.textContent = (step.title || "Step " + (idx + 1)) + (step.description ? " — " + step.description : "");
+      stepsList.appendChild(li);
+    });
+    card.appendChild(stepsList);
+    questOutput.appendChild(card);
+  }
+
   function buildLocalFallbackQuest(basePayload) {
     const idea = (basePayload && basePayload.mission_idea) || "your world";
     return {
@@ -429,6 +538,7 @@
         syncQuestProgressFromSteps(quest, progressBar, sgxpSummary);
         upsertSuitLogEntry(quest);
         renderSuitLog();
+        saveStepProgress(quest, id, checkbox.checked);
       });
     });
 
@@ -471,6 +581,24 @@
     questOutput.appendChild(card);
   }
 
+  // Persist a step toggle so progress follows the hero across devices.
+  // Local-only quests (id 0) have nothing to sync.
+  async function saveStepProgress(quest, stepId, completed) {
+    if (!quest.id) return;
+    const query = state.clientId ? "?client_id=" + encodeURIComponent(state.clientId) : "";
+    try {
+      const resp = await patchJson(
+        "/quests/" + encodeURIComponent(quest.id) + "/steps/" + encodeURIComponent(stepId) + query,
+        { completed: completed }
+      );
+      if (!resp.ok) {
+        console.warn("Saving step progress failed with", resp.status);
+      }
+    } catch (err) {
+      console.warn("Saving step progress failed", err);
+    }
+  }
+
   // ----- SUIT LOG ----------------------------------------------------------
   function upsertSuitLogEntry(quest) {
     // If backend didn't assign an id, keep a single local entry per mission name.
@@ -1,37 +1,274 @@
-from flask import Flask, request, jsonify, send_from_directory, make_response
+from flask import Flask, Response, g, request, stream_with_context
 from flask_cors import CORS
 from generate_quest import generate_quest, generate_clarifying_questions
+import copy
+import hmac
 import os
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 
-# Import Postgres DB helper
+# Import quest storage helpers (Postgres or embedded SQLite)
 import db
+import health
+import inference_client
+import fast_json
+from fast_json import json_response, raw_json_response
+import metrics
+import quest_cache
+import quest_io
+import quest_progress
+import quest_read_cache
+import quest_stream
+import quest_writer
+import rate_limit
+import static_assets
+from inference_client import generate_with_source
+from singleflight import SingleFlight
 
-# Initialize Flask app
-app = Flask(
-    __name__,
-    static_folder=os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend")),
-    static_url_path="/"
+# Initialize Flask app; the frontend is served by static_assets, not Flask's static route
+app = Flask(__name__, static_folder=None)
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
+
+# Fingerprinted, precompressed frontend kept in memory.  Rebuilt when a file
+# changes outside production unless STATIC_ASSETS_RELOAD says otherwise.
+_reload_default = "0" if os.getenv("APP_ENV") == "production" else "1"
+frontend_assets = static_assets.StaticAssets(
+    FRONTEND_DIR, reload=os.getenv("STATIC_ASSETS_RELOAD", _reload_default).lower() in ("1", "true", "yes")
 )
 
-# Enable CORS with credential support so the frontend can send cookies when hosted on a different origin
-CORS(app, supports_credentials=True)
+# Enable CORS with credential support so the frontend can send cookies when hosted on a different origin.
+# X-Next-Cursor carries the Suit Log pagination cursor and must be readable from JS.
+CORS(app, supports_credentials=True, expose_headers=["X-Next-Cursor"])
 
-# Initialize DB schema on startup (production will have DATABASE_URL set)
-if os.getenv("APP_ENV") == "production":
-    db.init_schema()
-else:
-    # For local dev, fallback to skipping DB if DATABASE_URL is not set or Postgres is unavailable
-    try:
-        db.init_schema()
-    except Exception as e:
-        print(f"Postgres not configured, skipping DB init: {e}")
+# Coalesces concurrent generations of the same normalized mission
+_generation_flights = SingleFlight()
+
+# Serve GET /quests and /quests/<id> straight from database-rendered JSON
+# text instead of decoding and re-encoding every stored quest in Python.
+QUEST_JSON_PASSTHROUGH = os.getenv("QUEST_JSON_PASSTHROUGH", "").lower() in ("1", "true", "yes")
+
+# Suit Log page size bounds for GET /quests
+DEFAULT_QUEST_PAGE_SIZE = 20
+MAX_QUEST_PAGE_SIZE = 100
+
+# POST /generate-quests:batch limits: missions per request, and generations
+# running at once across all batch requests in this worker.
+BATCH_MAX_MISSIONS = int(os.getenv("BATCH_MAX_MISSIONS", "50"))
+BATCH_GENERATION_WORKERS = int(os.getenv("BATCH_GENERATION_WORKERS", "8"))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_GENERATION_WORKERS, thread_name_prefix="quest-batch")
+
+# Leaderboard size bounds for GET /leaderboard
+DEFAULT_LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+
+# Initialize the DB schema (Postgres when DATABASE_URL is set, otherwise the
+# embedded SQLite file; see db.py) in the background, retrying until the
+# database is reachable.  /readyz reports not ready until it has been applied.
+# Nothing starts at import: cold starts reach their first request without
+# loading a database driver or opening a connection.
+schema_init = health.RetryingTask("schema-init", db.init_schema) if db.is_configured() else None
+
+readiness = health.HealthMonitor([
+    ("database", health.database_check(schema_init), True),
+    ("inference", health.inference_check, False),
+])
+
+# Endpoints that never wait for schema creation on a cold start.
+_SCHEMA_INDEPENDENT_ENDPOINTS = frozenset({
+    "healthz", "readyz", "metrics_endpoint", "clarify_mission_endpoint",
+    "serve_frontend", "serve_frontend_asset",
+})
+# How long the first database request of a process waits for the first
+# schema creation attempt.
+SCHEMA_WAIT_TIMEOUT = float(os.getenv("SCHEMA_WAIT_TIMEOUT", "10"))
+
+
+@app.before_request
+def _start_background_tasks():
+    """Start schema creation and readiness checks on this process's first request."""
+    if schema_init is not None and not schema_init.done:
+        schema_init.start()
+        if request.endpoint not in _SCHEMA_INDEPENDENT_ENDPOINTS:
+            schema_init.wait_first_attempt(SCHEMA_WAIT_TIMEOUT)
+    readiness.start()
+    # Opens this worker's spill file and requeues quests a crashed worker
+    # left behind (no database I/O; the flusher thread writes them).
+    quest_writer.get_writer()
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # Label by URL rule, not raw path, to keep series cardinality bounded.
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        metrics.record_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+
+def _dependency_gauges():
+    """Pool, cache and circuit breaker gauges, sampled when /metrics is scraped."""
+    pool = db.pool_stats()
+    if pool:
+        for key in ("size", "idle", "in_use", "waiting"):
+            yield "citizen_hero_db_pool_connections", "DB pool connections by state.", {"state": key}, pool[key]
+        for key in ("checkouts", "timeouts", "created", "closed", "recycled", "failed_checks", "connect_errors"):
+            yield "citizen_hero_db_pool_events", "Cumulative DB pool events.", {"event": key}, pool[key]
+    cache = quest_cache.cache_stats()
+    if cache:
+        for key in ("hits", "shared_hits", "misses", "evictions", "expired", "size"):
+            yield "citizen_hero_quest_cache", "Quest generation cache counters.", {"stat": key}, cache[key]
+    reads = quest_read_cache.cache_stats()
+    if reads:
+        for key in ("hits", "shared_hits", "misses", "stale", "not_modified", "invalidations", "size"):
+            yield "citizen_hero_quest_read_cache", "Quest read cache counters.", {"stat": key}, reads[key]
+    for key, value in _generation_flights.stats().items():
+        yield "citizen_hero_single_flight", "Quest generation coalescing counters.", {"stat": key}, value
+    progress = quest_progress.progress_stats()
+    if progress:
+        for key, value in progress.items():
+            yield "citizen_hero_quest_progress", "Step progress toggles and batched writes.", {"stat": key}, value
+    for scope, stats in rate_limit.limiter_stats().items():
+        for key, value in stats.items():
+            yield "citizen_hero_admission", "Rate limit and inference admission counters.", \
+                {"scope": scope, "stat": key}, value
+    writer = quest_writer.writer_stats()
+    if writer:
+        for key, value in writer.items():
+            yield "citizen_hero_quest_writer", "Write-behind quest queue depth and counters.", {"stat": key}, value
+    for name, result in readiness.snapshot()["checks"].items():
+        yield "citizen_hero_dependency_up", "1 when the last background check passed.", {"check": name}, \
+            1 if result["ok"] else 0
+    breaker = inference_client.client_stats()
+    if breaker:
+        yield "citizen_hero_inference_circuit_open", "1 when the SmartInference circuit is not closed.", {}, \
+            0 if breaker["state"] == "closed" else 1
 
 
+metrics.register_gauges(_dependency_gauges)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint (merged across workers when METRICS_DIR is set)."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/livez', methods=['GET'])
 @app.route('/healthz', methods=['GET'])
 def healthz():
-    """Simple health-check endpoint used by deployment platforms."""
-    return jsonify({"status": "ok"}), 200
+    """Liveness: the process is up and serving (no dependency checks)."""
+    return json_response({"status": "ok"}, 200)
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness: 200 when required dependencies were healthy at the last
+    background check, 503 otherwise.  Never queries a dependency itself.
+    """
+    snapshot = readiness.snapshot()
+    return json_response(snapshot, 200 if snapshot["ready"] else 503)
+
+
+@app.route('/stats/db-pool', methods=['GET'])
+def db_pool_stats():
+    """Expose connection pool usage so the pool can be sized from real traffic."""
+    return json_response({"db_pool": db.pool_stats()}, 200)
+
+
+@app.route('/stats/quest-cache', methods=['GET'])
+def quest_cache_stats():
+    """Expose generation/read cache hit/miss and request coalescing counters."""
+    return json_response({
+        "quest_cache": quest_cache.cache_stats(),
+        "single_flight": _generation_flights.stats(),
+        "read_cache": quest_read_cache.cache_stats(),
+    }, 200)
+
+
+def _generate(data):
+    """Generate a quest for ``data``, reusing a cached one for repeat missions.
+
+    Concurrent requests for the same normalized mission wait on a single
+    in-flight generation and each receive their own copy of its result.
+    SmartInference is used when configured (and healthy), the offline
+    templates otherwise.
+    """
+    quest, shared = _generation_flights.do(
+        quest_cache.cache_key(data),
+        lambda: _generate_cached(data),
+    )
+    return copy.deepcopy(quest) if shared else quest
+
+
+def _generate_cached(data):
+    """One cache lookup, then one generation on a miss; SmartInference calls
+    are admitted by the inference concurrency limiter, offline ones are not.
+
+    :raises rate_limit.Overloaded: when too many SmartInference calls are in flight.
+    """
+    cache = quest_cache.get_cache()
+    key = quest_cache.cache_key(data)
+    quest = cache.get(key) if cache is not None else None
+    if quest is None:
+        quest, source = generate_with_source(data, generate_quest)
+        if cache is not None and source in quest_cache.CACHED_SOURCES:
+            cache.set(key, quest)
+    return quest
+
+
+def _rate_limited(scope, cost=None):
+    """
+    Spend tokens from the caller's ``scope`` bucket before running the view;
+    429 with Retry-After when it is empty.  ``cost()`` prices the request
+    (default 1 token).
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = rate_limit.get_limiter(scope)
+            if limiter is not None:
+                allowed, retry_after = limiter.take(_rate_limit_key(), cost() if cost else 1)
+                if not allowed:
+                    return _retry_later(429, retry_after, "Too many requests")
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _rate_limit_key():
+    """The caller's session, or its address when it sent none.
+
+    A request without a client id or cookie gets a fresh random session,
+    which would otherwise come with a fresh bucket every time.
+    """
+    session_id = _get_session_id()
+    if g.get("new_session"):
+        return f"addr:{request.remote_addr}"
+    return session_id
+
+
+def _retry_later(status, retry_after, message):
+    resp = json_response({"error": message, "retry_after": retry_after}, status)
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+
+@app.errorhandler(rate_limit.Overloaded)
+def _shed(exc):
+    """Admission control shed the request: 503 with Retry-After."""
+    return _retry_later(503, exc.retry_after, "Server busy")
 
 
 @app.route('/clarify-mission', methods=['POST'])
@@ -39,7 +276,7 @@ def clarify_mission_endpoint():
     """Endpoint to generate clarifying questions."""
     data = request.get_json() or {}
     questions = generate_clarifying_questions(data)
-    return jsonify({"questions": questions})
+    return json_response({"questions": questions})
 
 
 def _get_session_id():
@@ -68,97 +305,426 @@ def _get_session_id():
     session_id = request.cookies.get("session_id")
     if not session_id:
         session_id = str(uuid.uuid4())
+        g.new_session = True
     return session_id
 
 
 @app.route('/generate-quest', methods=['POST'])
+@_rate_limited("generate")
 def generate_quest_endpoint():
-    """Generate a quest, persist it to Postgres, and return the stored record."""
+    """Generate a quest, persist it, and return the stored record.
+
+    With QUEST_WRITE_BEHIND the quest is queued with a reserved id and
+    written in a later batch (see ``quest_writer``).
+    """
     data = request.get_json() or {}
-    quest = generate_quest(data)
+    quest = _generate(data)
+    session_id = _get_session_id()
+    resp = json_response(_store_quest(session_id, quest))
+    # Ensure the session cookie is set for the client
+    resp.set_cookie('session_id', session_id, httponly=True, samesite='Lax')
+    return resp
+
+
+@app.route('/generate-quest:stream', methods=['POST'])
+@_rate_limited("generate")
+def generate_quest_stream_endpoint():
+    """
+    Streaming variant of /generate-quest as Server-Sent Events.
+
+    Same body as /generate-quest.  ``quest_name``, ``mission_summary`` and
+    one ``step`` event per step are sent as soon as they are parsed from
+    the SmartInference response; ``done`` carries the stored quest with
+    its id.  ``reset`` means SmartInference failed part way and the events
+    that follow replace everything sent before; ``error`` ends a stream
+    that could not produce a quest.
+    """
+    data = request.get_json(silent=True) or {}
     session_id = _get_session_id()
-    # Insert into Postgres and get generated id/created_at
-    if os.getenv("DATABASE_URL"):
+    # Admitted before any event is sent, so a shed request still gets a 503.
+    # Offline-only generation (no client, or an open circuit) is not limited.
+    slots = inference_client.upstream_slots(inference_client.get_client())
+    acquired_at = slots.acquire() if slots is not None else None
+
+    def events():
+        try:
+            for event, value in quest_stream.generate_events(data, generate_quest):
+                if event == "quest":
+                    yield quest_stream.format_event("done", _store_quest(session_id, value))
+                else:
+                    yield quest_stream.format_event(event, value)
+        except Exception as e:
+            print(f"Quest stream failed: {e}")
+            yield quest_stream.format_event("error", {"error": "Quest generation failed"})
+
+    resp = Response(stream_with_context(events()), mimetype="text/event-stream")
+    if slots is not None:
+        # Runs even if the client disconnects before the first event.
+        resp.call_on_close(lambda: slots.release(acquired_at))
+    resp.headers["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream.
+    resp.headers["X-Accel-Buffering"] = "no"
+    resp.set_cookie('session_id', session_id, httponly=True, samesite='Lax')
+    return resp
+
+
+def _store_quest(session_id, quest):
+    """Persist a generated quest and return it with its ``id``/``created_at``."""
+    # Insert into the database and get generated id/created_at
+    if db.is_configured():
         try:
-            inserted = db.insert_quest(session_id, quest)
+            inserted = _queue_quest(session_id, quest) or db.insert_quest(session_id, quest)
             quest_with_meta = {"id": inserted["id"], "created_at": inserted["created_at"], **quest}
         except Exception as e:
             print(f"DB Insert failed: {e}")
             # Fallback for when DB is configured but fails
             quest_with_meta = {"id": 0, "created_at": "local-dev", **quest}
+        # The new quest heads this session's Suit Log.
+        quest_read_cache.invalidate(session_id)
     else:
         # Local dev without DB
         quest_with_meta = {"id": 0, "created_at": "local-dev", **quest}
+    return quest_with_meta
 
-    resp = make_response(jsonify(quest_with_meta))
-    # Ensure the session cookie is set for the client
+
+def _queue_quest(session_id, quest):
+    """Hand the quest to the write-behind queue; None to insert it directly."""
+    writer = quest_writer.get_writer()
+    if writer is None:
+        return None
+    try:
+        return writer.submit(session_id, quest)
+    except Exception as e:
+        print(f"Write-behind queue unavailable, inserting directly: {e}")
+        return None
+
+
+def _batch_cost():
+    data = request.get_json(silent=True)
+    missions = data.get("missions") if isinstance(data, dict) else None
+    return len(missions) if isinstance(missions, list) and missions else 1
+
+
+@app.route('/generate-quests:batch', methods=['POST'])
+@_rate_limited("generate", cost=_batch_cost)
+def generate_quests_batch_endpoint():
+    """
+    Generate several quests in one request (e.g. a teacher setting up a class).
+
+    Body: ``{"missions": [{"mission_idea": ..., "help_mode": ...}, ...]}``.
+    Missions are generated concurrently on a bounded thread pool and every
+    successful quest is stored with one multi-row INSERT.  The response has
+    one entry per mission, in request order: ``{"index", "quest"}`` on
+    success or ``{"index", "error"}`` when that mission failed.
+    """
+    data = request.get_json(silent=True) or {}
+    missions = data.get("missions") if isinstance(data, dict) else None
+    if not isinstance(missions, list) or not missions:
+        return json_response({"error": "missions must be a non-empty list"}, 400)
+    if len(missions) > BATCH_MAX_MISSIONS:
+        return json_response({"error": f"At most {BATCH_MAX_MISSIONS} missions per batch"}, 400)
+
+    futures = [
+        _batch_executor.submit(_generate, mission) if isinstance(mission, dict) else None
+        for mission in missions
+    ]
+    results = []
+    generated = []
+    for index, future in enumerate(futures):
+        if future is None:
+            results.append({"index": index, "error": "Mission must be a JSON object"})
+            continue
+        try:
+            quest = future.result()
+        except rate_limit.Overloaded as e:
+            results.append({"index": index, "error": "Server busy", "retry_after": e.retry_after})
+            continue
+        except Exception as e:
+            print(f"Batch generation failed for mission {index}: {e}")
+            results.append({"index": index, "error": "Quest generation failed"})
+            continue
+        results.append({"index": index, "quest": quest})
+        generated.append(results[-1])
+
+    session_id = _get_session_id()
+    stored = None
+    if db.is_configured() and generated:
+        try:
+            stored = db.insert_quests(session_id, [entry["quest"] for entry in generated])
+        except Exception as e:
+            print(f"DB batch insert failed: {e}")
+        quest_read_cache.invalidate(session_id)
+    for position, entry in enumerate(generated):
+        meta = stored[position] if stored else {"id": 0, "created_at": "local-dev"}
+        entry["quest"] = {"id": meta["id"], "created_at": meta["created_at"], **entry["quest"]}
+
+    resp = json_response({"results": results})
     resp.set_cookie('session_id', session_id, httponly=True, samesite='Lax')
     return resp
 
 
 @app.route('/quests', methods=['GET'])
 def get_quests():
-    """Retrieve all quests for the current session from Postgres."""
-    if not os.getenv("DATABASE_URL"):
-        return jsonify([])
+    """Retrieve one page of quests for the current session from the database.
+
+    Query parameters:
+    - ``limit``: page size (default 20, max 100).
+    - ``cursor``: opaque cursor from a previous response's ``X-Next-Cursor``
+      header.  The header is omitted on the last page.
+    """
+    if not db.is_configured():
+        return json_response([])
+    try:
+        limit = int(request.args.get("limit", DEFAULT_QUEST_PAGE_SIZE))
+    except ValueError:
+        return json_response({"error": "limit must be an integer"}, 400)
+    limit = max(1, min(limit, MAX_QUEST_PAGE_SIZE))
+    cursor = request.args.get("cursor") or None
+
     session_id = _get_session_id()
-    quests = db.list_quests(session_id)
-    return jsonify(quests)
+    _flush_pending_writes(session_id=session_id)
+
+    def load():
+        if QUEST_JSON_PASSTHROUGH:
+            body, next_cursor = db.list_quests_page_json(session_id, limit=limit, cursor=cursor)
+            return body.encode("utf-8"), next_cursor
+        quests, next_cursor = db.list_quests_page(session_id, limit=limit, cursor=cursor)
+        return fast_json.dumps(quests), next_cursor
+
+    cache = quest_read_cache.get_cache()
+    try:
+        if cache is None:
+            body, next_cursor = load()
+            return _quest_response(quest_read_cache.CachedResponse(session_id, None, body, next_cursor, None))
+        # The version token comes first: an unchanged Suit Log is answered
+        # with 304 before the cache or the database is consulted.
+        token = cache.version(session_id)
+        etag = quest_read_cache.make_etag(token, quest_read_cache.page_key(session_id, limit, cursor))
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(cache, etag)
+        return _quest_response(cache.fetch_page(session_id, token, limit, cursor, load))
+    except ValueError:
+        return json_response({"error": "Invalid cursor"}, 400)
 
 
 @app.route('/quests/<int:quest_id>', methods=['GET'])
 def get_quest(quest_id):
-    """Retrieve a single quest by its ID from Postgres."""
-    quest = db.get_quest_by_id(quest_id)
-    if quest is None:
-        return jsonify({"error": "Quest not found"}), 404
-    return jsonify(quest)
+    """Retrieve a single quest by its ID from the database."""
+    if not db.is_configured():
+        return json_response({"error": "Quest not found"}, 404)
+    _flush_pending_writes(quest_id=quest_id)
+
+    def load():
+        if QUEST_JSON_PASSTHROUGH:
+            body = db.get_quest_json_by_id(quest_id)
+            # The owner is only needed to validate the cache entry.
+            return (body.encode("utf-8"), fast_json.loads(body).get("session_id")) if body is not None else None
+        quest = db.get_quest_by_id(quest_id)
+        return (fast_json.dumps(quest), quest["session_id"]) if quest is not None else None
+
+    cache = quest_read_cache.get_cache()
+    if cache is None:
+        loaded = load()
+        entry = quest_read_cache.CachedResponse(loaded[1], None, loaded[0], None, None) if loaded else None
+    else:
+        entry = cache.fetch_quest(quest_id, load)
+    if entry is None:
+        return json_response({"error": "Quest not found"}, 404)
+    if entry.etag is not None and request.if_none_match.contains_weak(entry.etag):
+        return _not_modified(cache, entry.etag)
+    return _quest_response(entry)
+
+
+def _quest_response(entry):
+    """JSON response for a (possibly cached) quest read, with its validators."""
+    resp = raw_json_response(entry.body)
+    if entry.next_cursor:
+        resp.headers["X-Next-Cursor"] = entry.next_cursor
+    if entry.etag is not None:
+        resp.set_etag(entry.etag, weak=True)
+    # Browsers may keep the body but must revalidate it on every use.
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+def _not_modified(cache, etag):
+    cache.record_not_modified()
+    resp = Response(status=304)
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+@app.route('/stats/session', methods=['GET'])
+def session_stats():
+    """SGXP totals and quest counts for the caller's session."""
+    if not db.is_configured():
+        return json_response({"quest_count": 0, "completed_quests": 0, "total_sgxp": 0, "earned_sgxp": 0})
+    session_id = _get_session_id()
+    _flush_pending_writes(session_id=session_id)
+    return json_response(db.get_session_stats(session_id))
+
+
+@app.route('/stats/global', methods=['GET'])
+def global_stats():
+    """Totals across all heroes, quest counts by help mode and top codenames."""
+    if not db.is_configured():
+        return json_response({
+            "quest_count": 0, "completed_quests": 0, "total_sgxp": 0, "earned_sgxp": 0,
+            "sessions": 0, "help_modes": {}, "top_codenames": [],
+        })
+    return json_response(db.get_global_stats())
+
+
+@app.route('/leaderboard', methods=['GET'])
+def leaderboard():
+    """
+    Top heroes by earned SGXP.
+
+    Session ids are not exposed; the caller's own entry is flagged with
+    ``"you": true``.
+    """
+    if not db.is_configured():
+        return json_response([])
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LEADERBOARD_SIZE))
+    except ValueError:
+        return json_response({"error": "limit must be an integer"}, 400)
+    limit = max(1, min(limit, MAX_LEADERBOARD_SIZE))
+    session_id = _get_session_id()
+    _flush_pending_writes(session_id=session_id)
+    entries = []
+    for rank, entry in enumerate(db.get_leaderboard(limit), start=1):
+        owner = entry.pop("session_id")
+        entries.append({"rank": rank, **entry, "you": owner == session_id})
+    return json_response(entries)
+
+
+def _is_admin():
+    """True when the request carries ``Authorization: Bearer $ADMIN_TOKEN``."""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+@app.route('/admin/export', methods=['GET'])
+def export_quests():
+    """
+    Stream all quests (or ``?session_id=``'s) as NDJSON for backups and
+    migrations; ``?after_id=`` resumes an interrupted export.  Requires
+    ADMIN_TOKEN and answers 404 when it is not configured.
+    """
+    if not _is_admin():
+        return json_response({"error": "Not found"}, 404)
+    if not db.is_configured():
+        return Response("", mimetype="application/x-ndjson")
+    try:
+        after_id = int(request.args.get("after_id", 0))
+    except ValueError:
+        return json_response({"error": "after_id must be an integer"}, 400)
+    lines = quest_io.iter_ndjson(session_id=request.args.get("session_id"), after_id=after_id)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+def _flush_queued_quests(session_id=None, quest_id=None):
+    """Write this worker's write-behind quests before they are read or changed."""
+    writer = quest_writer.get_writer()
+    if writer is not None and writer.has_pending(session_id=session_id, quest_id=quest_id):
+        writer.flush()
+
+
+def _flush_pending_writes(session_id=None, quest_id=None):
+    """Write this worker's queued quests and step toggles before they are read back."""
+    _flush_queued_quests(session_id=session_id, quest_id=quest_id)
+    tracker = quest_progress.get_tracker()
+    if tracker.has_pending(session_id=session_id, quest_id=quest_id):
+        tracker.flush()
+
+
+@app.route('/quests/<int:quest_id>/steps/<int:step_id>', methods=['PATCH'])
+def update_step_progress(quest_id, step_id):
+    """
+    Mark one quest step as completed or not.
+
+    Body: ``{"completed": true|false}``.  Returns the quest's progress
+    (``completed_step_ids``, ``earned_sgxp``, ``total_sgxp``) right away;
+    the write itself is batched with other toggles by ``quest_progress``.
+    """
+    data = request.get_json(silent=True) or {}
+    completed = data.get("completed")
+    if not isinstance(completed, bool):
+        return json_response({"error": "completed must be true or false"}, 400)
+    if not db.is_configured():
+        return json_response({"error": "Quest not found"}, 404)
+    session_id = _get_session_id()
+    _flush_queued_quests(quest_id=quest_id)
+    try:
+        progress = quest_progress.get_tracker().toggle(session_id, quest_id, step_id, completed)
+    except LookupError:
+        return json_response({"error": "Step not found"}, 404)
+    if progress is None:
+        return json_response({"error": "Quest not found"}, 404)
+    # Reads flush the toggle first, so they must not be answered from cache.
+    quest_read_cache.invalidate(session_id)
+    return json_response(progress)
 
 
 @app.route('/quests/<int:quest_id>', methods=['DELETE'])
+@_rate_limited("delete")
 def delete_quest_endpoint(quest_id):
     """Delete a single quest for the current session/client.
 
     Returns 204 on success, 404 if not found (or owned by another client).
-    In environments without DATABASE_URL configured, this is treated as a
+    When quest storage is turned off (DB_BACKEND=none), this is treated as a
     no-op success so the frontend UX stays simple.
     """
-    if not os.getenv("DATABASE_URL"):
+    if not db.is_configured():
         # No persistent storage in this environment; pretend delete succeeded.
         return ('', 204)
     session_id = _get_session_id()
+    _flush_queued_quests(quest_id=quest_id)
     try:
         deleted = db.delete_quest(session_id, quest_id)
+        quest_read_cache.invalidate(session_id)
     except Exception as e:
         print(f"Error deleting quest {quest_id}: {e}")
-        return jsonify({"error": "Failed to delete quest"}), 500
+        return json_response({"error": "Failed to delete quest"}, 500)
     if not deleted:
-        return jsonify({"error": "Quest not found"}), 404
+        return json_response({"error": "Quest not found"}, 404)
     return ('', 204)
 
 
 @app.route('/quests', methods=['DELETE'])
+@_rate_limited("delete")
 def delete_all_quests_endpoint():
     """Delete all quests for the current session/client.
 
-    Returns JSON with the number of quests removed; in environments without
-    DATABASE_URL configured, this is treated as a no-op success.
+    Returns JSON with the number of quests removed; with quest storage
+    turned off (DB_BACKEND=none), this is treated as a no-op success.
     """
-    if not os.getenv("DATABASE_URL"):
-        return jsonify({"deleted": 0}), 200
+    if not db.is_configured():
+        return json_response({"deleted": 0}, 200)
     session_id = _get_session_id()
+    _flush_queued_quests(session_id=session_id)
     try:
         deleted_count = db.delete_all_quests(session_id)
+        quest_read_cache.invalidate(session_id)
     except Exception as e:
         print(f"Error deleting quests for session {session_id}: {e}")
-        return jsonify({"error": "Failed to delete quests"}), 500
-    return jsonify({"deleted": deleted_count}), 200
+        return json_response({"error": "Failed to delete quests"}, 500)
+    return json_response({"deleted": deleted_count}, 200)
 
 
-# Serve the frontend entry point
+# Serve the frontend entry point and its assets
 @app.route("/", methods=["GET"])
 def serve_frontend():
-    return send_from_directory(app.static_folder, "index.html")
+    return frontend_assets.serve("index.html")
+
+
+@app.route("/<path:filename>", methods=["GET"])
+def serve_frontend_asset(filename):
+    return frontend_assets.serve(filename)
 
 
 if __name__ == '__main__':
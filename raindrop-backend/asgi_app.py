@@ -0,0 +1,778 @@
+"""
+Async (ASGI) entry point for the Citizen Hero API.
+
+``app.py`` is a synchronous Flask app: each worker is parked for the whole
+SmartInference call (up to the read timeout) and every Postgres round
+trip, so concurrency is capped at the worker count.  This module serves
+the same API routes with the same JSON contracts on a single asyncio event
+loop, using ``httpx`` for SmartInference (``inference_client``) and an
+``asyncpg`` pool for Postgres (``db_async``), so one process can hold
+hundreds of generations in flight.
+
+Storage follows the same backend selection as the Flask app (``db``).
+Reads, inserts and deletes of single quests use ``db_async`` on Postgres;
+everything else (SQLite, step progress, stats, batch inserts, exports)
+runs the ``db`` helpers on worker threads.  Rate limits are shared with
+the Flask app (``rate_limit``); admission control uses the same settings,
+with callers queued on the event loop (``AsyncConcurrencyLimiter``).
+
+Routes: every API route of ``app.py`` (``ROUTES``; ``test_asgi_app``
+fails if the two drift apart).  The static frontend (``FLASK_ONLY_ROUTES``)
+is still served by the Flask app or the static host.
+``/generate-quest:stream`` and ``/admin/export`` drive the same blocking
+pipelines as Flask (``quest_stream``, ``quest_io``) from worker threads,
+one event at a time.
+
+Run it with any ASGI server, e.g.::
+
+    pip install -r requirements-async.txt
+    uvicorn asgi_app:app --port 5000
+
+``scripts/compare_wsgi_asgi.py`` benchmarks this mode against Gunicorn +
+Flask.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import functools
+import hmac
+import json
+import os
+import re
+import time
+import uuid
+from http.cookies import SimpleCookie
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import db
+import db_async
+import fast_json
+import health
+import inference_client
+import metrics
+import quest_cache
+import quest_io
+import quest_progress
+import quest_read_cache
+import quest_stream
+import rate_limit
+from generate_quest import generate_quest, generate_clarifying_questions
+from inference_client import agenerate_with_source, close_async_client
+
+# Suit Log page size bounds for GET /quests (same as app.py)
+DEFAULT_QUEST_PAGE_SIZE = 20
+MAX_QUEST_PAGE_SIZE = 100
+
+# POST /generate-quests:batch limits (same variables as app.py)
+BATCH_MAX_MISSIONS = int(os.getenv("BATCH_MAX_MISSIONS", "50"))
+BATCH_GENERATION_WORKERS = int(os.getenv("BATCH_GENERATION_WORKERS", "8"))
+_batch_slots = asyncio.Semaphore(BATCH_GENERATION_WORKERS)
+
+# Leaderboard size bounds for GET /leaderboard (same as app.py)
+DEFAULT_LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+
+# Flask routes this app deliberately does not serve.
+FLASK_ONLY_ROUTES = frozenset({"/", "/<path:filename>"})
+
+readiness = health.HealthMonitor([
+    ("database", health.database_check(), True),
+    ("inference", health.inference_check, False),
+])
+
+
+class Request:
+    """Just enough of a request object for the handlers below."""
+
+    def __init__(self, scope: Dict[str, Any], body: bytes) -> None:
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.body = body
+        self.headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+        }
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        self.args = {key: values[0] for key, values in query.items()}
+        cookie = SimpleCookie()
+        cookie.load(self.headers.get("cookie", ""))
+        self.cookies = {key: morsel.value for key, morsel in cookie.items()}
+        client = scope.get("client")
+        self.remote_addr = client[0] if client else None
+        self.session_id: Optional[str] = None
+        self.new_session = False
+        self._json = None
+
+    def get_json(self) -> Dict[str, Any]:
+        """Parsed JSON body, or {} if it is missing or not a JSON object."""
+        if self._json is None:
+            try:
+                parsed = json.loads(self.body) if self.body else {}
+            except ValueError:
+                parsed = {}
+            self._json = parsed if isinstance(parsed, dict) else {}
+        return self._json
+
+
+class Response:
+    """A response; ``stream`` (async iterator of bytes) replaces ``body``
+    when set, and ``on_close`` callbacks run once it has been sent or the
+    client went away, whichever comes first."""
+
+    def __init__(self, body: bytes = b"", status: int = 200, headers: Optional[List[Tuple[str, str]]] = None,
+                 stream: Optional[AsyncIterator[bytes]] = None) -> None:
+        self.body = body
+        self.status = status
+        self.headers = headers or []
+        self.stream = stream
+        self.on_close: List[Callable[[], None]] = []
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    return Response(fast_json.dumps(payload), status, [("content-type", "application/json")])
+
+
+def _session_cookie(session_id: str) -> Tuple[str, str]:
+    return "set-cookie", f"session_id={session_id}; HttpOnly; Path=/; SameSite=Lax"
+
+
+def _get_session_id(request: Request) -> str:
+    """Same resolution order as ``app._get_session_id``, fixed per request."""
+    if request.session_id is None:
+        client_id = request.args.get("client_id") or request.get_json().get("client_id")
+        session_id = client_id or request.cookies.get("session_id")
+        if not session_id:
+            session_id = str(uuid.uuid4())
+            request.new_session = True
+        request.session_id = session_id
+    return request.session_id
+
+
+async def _storage(name: str, *args: Any, **kwargs: Any) -> Any:
+    """Call quest storage helper ``name`` on the backend ``db`` selects.
+
+    Postgres goes through the asyncpg twin in ``db_async`` where there is
+    one.  Anything else (SQLite, and helpers ``db_async`` does not mirror)
+    runs the ``db`` helper on a worker thread, off the event loop.
+    """
+    if db.backend_name() == "postgres" and hasattr(db_async, name):
+        return await getattr(db_async, name)(*args, **kwargs)
+    return await asyncio.to_thread(getattr(db, name), *args, **kwargs)
+
+
+async def _flush_progress(session_id: Optional[str] = None, quest_id: Optional[int] = None) -> None:
+    """Write this process's step toggles before the quests they touch are read."""
+    tracker = quest_progress.get_tracker()
+    if tracker.has_pending(session_id=session_id, quest_id=quest_id):
+        await asyncio.to_thread(tracker.flush)
+
+
+async def _iterate_in_thread(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Drive a blocking iterator from worker threads, one item per hop.
+
+    The iterator is closed (on a thread too) when the consumer stops early,
+    so generators like ``InferenceClient.stream`` can settle their state.
+    """
+    done = object()
+    try:
+        while True:
+            item = await asyncio.to_thread(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await asyncio.to_thread(close)
+
+
+# ---------------------------------------------------------------------------
+# Rate limits and admission control (same policy as app.py)
+# ---------------------------------------------------------------------------
+
+def _retry_later(status: int, retry_after: int, message: str) -> Response:
+    resp = json_response({"error": message, "retry_after": retry_after}, status)
+    resp.headers.append(("retry-after", str(retry_after)))
+    return resp
+
+
+def _rate_limit_key(request: Request) -> str:
+    """The caller's session, or its address when it sent none."""
+    session_id = _get_session_id(request)
+    if request.new_session:
+        return f"addr:{request.remote_addr}"
+    return session_id
+
+
+def _rate_limited(scope: str, cost: Optional[Callable[[Request], int]] = None):
+    """Async twin of ``app._rate_limited``: 429 with Retry-After when the
+    caller's ``scope`` bucket is empty."""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request: Request, *args: Any) -> Response:
+            limiter = rate_limit.get_limiter(scope)
+            if limiter is not None:
+                take = functools.partial(limiter.take, _rate_limit_key(request), cost(request) if cost else 1)
+                # The shared SQLite bucket store does file I/O; memory buckets do not.
+                if isinstance(limiter.store, rate_limit.MemoryBucketStore):
+                    allowed, retry_after = take()
+                else:
+                    allowed, retry_after = await asyncio.to_thread(take)
+                if not allowed:
+                    return _retry_later(429, retry_after, "Too many requests")
+            return await handler(request, *args)
+
+        return wrapper
+
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Quest generation with async request coalescing
+# ---------------------------------------------------------------------------
+
+_inflight: Dict[str, asyncio.Future] = {}
+_flight_counters = {"leaders": 0, "coalesced": 0}
+
+
+async def _cached(call, *args: Any) -> Any:
+    """Run a quest cache ``call``.  The shared SQLite tier
+    (``QUEST_CACHE_SQLITE_PATH``) does file I/O and waits on file locks,
+    so with it the call goes to a worker thread; the in-process LRU is
+    only a dict lookup and stays on the loop."""
+    if quest_cache.get_cache().shared is None:
+        return call(*args)
+    return await asyncio.to_thread(call, *args)
+
+
+async def _generate(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate (or reuse) a quest; concurrent duplicates share one generation.
+
+    :raises rate_limit.Overloaded: when too many SmartInference calls are in flight.
+    """
+    key = quest_cache.cache_key(data)
+    pending = _inflight.get(key)
+    if pending is not None:
+        _flight_counters["coalesced"] += 1
+        return copy.deepcopy(await asyncio.shield(pending))
+
+    _flight_counters["leaders"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        cache = quest_cache.get_cache()
+        quest = await _cached(cache.get, key) if cache is not None else None
+        if quest is None:
+            quest, source = await agenerate_with_source(data, generate_quest)
+            if cache is not None and source in quest_cache.CACHED_SOURCES:
+                await _cached(cache.set, key, quest)
+        future.set_result(quest)
+        return quest
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        # Mark the exception as retrieved when nobody else was waiting.
+        future.exception()
+        raise
+    finally:
+        del _inflight[key]
+
+
+async def _invalidate_reads(session_id: str) -> None:
+    """Make the Flask workers' cached Suit Log of ``session_id`` stale after a write.
+
+    Only reaches other processes through the shared tier
+    (``QUEST_READ_CACHE_SQLITE_PATH``), whose file I/O runs on a thread.
+    """
+    cache = quest_read_cache.get_cache()
+    if cache is None:
+        return
+    if cache.shared is None:
+        cache.invalidate(session_id)
+    else:
+        await asyncio.to_thread(cache.invalidate, session_id)
+
+
+async def _store_quest(session_id: str, quest: Dict[str, Any]) -> Dict[str, Any]:
+    """Persist a generated quest and return it with its ``id``/``created_at``."""
+    if db.is_configured():
+        try:
+            inserted = await _storage("insert_quest", session_id, quest)
+            return {"id": inserted["id"], "created_at": inserted["created_at"], **quest}
+        except Exception as e:
+            print(f"DB Insert failed: {e}")
+        finally:
+            # The new quest heads this session's Suit Log.
+            await _invalidate_reads(session_id)
+    return {"id": 0, "created_at": "local-dev", **quest}
+
+
+# ---------------------------------------------------------------------------
+# Route handlers
+# ---------------------------------------------------------------------------
+
+async def healthz(request: Request) -> Response:
+    """Liveness: the process is up and serving (no dependency checks)."""
+    return json_response({"status": "ok"})
+
+
+async def readyz(request: Request) -> Response:
+    """Readiness from the last background dependency check, as in app.py."""
+    snapshot = readiness.snapshot()
+    return json_response(snapshot, 200 if snapshot["ready"] else 503)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus scrape endpoint (merged across workers when METRICS_DIR is set)."""
+    body = await asyncio.to_thread(metrics.render)
+    return Response(body.encode("utf-8"), 200, [("content-type", "text/plain; version=0.0.4; charset=utf-8")])
+
+
+async def db_pool_stats(request: Request) -> Response:
+    """Pool usage: the asyncpg pool on Postgres, the ``db`` pool otherwise."""
+    pool = db_async.pool_stats() if db.backend_name() == "postgres" else db.pool_stats()
+    return json_response({"db_pool": pool})
+
+
+async def quest_cache_stats(request: Request) -> Response:
+    """Generation cache and request coalescing counters (no read cache here)."""
+    return json_response({
+        "quest_cache": quest_cache.cache_stats(),
+        "single_flight": dict(_flight_counters, in_flight=len(_inflight)),
+        "read_cache": None,
+    })
+
+
+async def clarify_mission(request: Request) -> Response:
+    questions = generate_clarifying_questions(request.get_json())
+    return json_response({"questions": questions})
+
+
+@_rate_limited("generate")
+async def generate_quest_endpoint(request: Request) -> Response:
+    """Generate a quest, persist it, and return the stored record."""
+    quest = await _generate(request.get_json())
+    session_id = _get_session_id(request)
+    resp = json_response(await _store_quest(session_id, quest))
+    resp.headers.append(_session_cookie(session_id))
+    return resp
+
+
+@_rate_limited("generate")
+async def generate_quest_stream_endpoint(request: Request) -> Response:
+    """Server-Sent Events variant of /generate-quest (see ``app.py``)."""
+    data = request.get_json()
+    session_id = _get_session_id(request)
+    # Admitted before any event is sent, so a shed request still gets a 503.
+    slots = inference_client.async_upstream_slots(inference_client.get_client())
+    acquired_at = await slots.acquire() if slots is not None else None
+
+    async def events() -> AsyncIterator[bytes]:
+        source = _iterate_in_thread(quest_stream.generate_events(data, generate_quest))
+        try:
+            async for event, value in source:
+                if event == "quest":
+                    yield quest_stream.format_event("done", await _store_quest(session_id, value))
+                else:
+                    yield quest_stream.format_event(event, value)
+        except Exception as e:
+            print(f"Quest stream failed: {e}")
+            yield quest_stream.format_event("error", {"error": "Quest generation failed"})
+        finally:
+            await source.aclose()
+
+    resp = Response(status=200, stream=events(), headers=[
+        ("content-type", "text/event-stream; charset=utf-8"),
+        ("cache-control", "no-cache"),
+        # Stop nginx-style proxies from buffering the stream.
+        ("x-accel-buffering", "no"),
+        _session_cookie(session_id),
+    ])
+    if slots is not None:
+        # Runs even if the client disconnects before the first event.
+        resp.on_close.append(lambda: slots.release(acquired_at))
+    return resp
+
+
+def _batch_cost(request: Request) -> int:
+    missions = request.get_json().get("missions")
+    return len(missions) if isinstance(missions, list) and missions else 1
+
+
+async def _generate_mission(index: int, mission: Any) -> Dict[str, Any]:
+    """One batch entry: ``{"index", "quest"}`` or ``{"index", "error"}``."""
+    if not isinstance(mission, dict):
+        return {"index": index, "error": "Mission must be a JSON object"}
+    async with _batch_slots:
+        try:
+            return {"index": index, "quest": await _generate(mission)}
+        except rate_limit.Overloaded as e:
+            return {"index": index, "error": "Server busy", "retry_after": e.retry_after}
+        except Exception as e:
+            print(f"Batch generation failed for mission {index}: {e}")
+            return {"index": index, "error": "Quest generation failed"}
+
+
+@_rate_limited("generate", cost=_batch_cost)
+async def generate_quests_batch_endpoint(request: Request) -> Response:
+    """Generate several quests concurrently and store them in one INSERT (see ``app.py``)."""
+    missions = request.get_json().get("missions")
+    if not isinstance(missions, list) or not missions:
+        return json_response({"error": "missions must be a non-empty list"}, 400)
+    if len(missions) > BATCH_MAX_MISSIONS:
+        return json_response({"error": f"At most {BATCH_MAX_MISSIONS} missions per batch"}, 400)
+
+    results = await asyncio.gather(*(_generate_mission(index, mission) for index, mission in enumerate(missions)))
+    generated = [entry for entry in results if "quest" in entry]
+    session_id = _get_session_id(request)
+    stored = None
+    if db.is_configured() and generated:
+        try:
+            stored = await _storage("insert_quests", session_id, [entry["quest"] for entry in generated])
+        except Exception as e:
+            print(f"DB batch insert failed: {e}")
+        await _invalidate_reads(session_id)
+    for position, entry in enumerate(generated):
+        meta = stored[position] if stored else {"id": 0, "created_at": "local-dev"}
+        entry["quest"] = {"id": meta["id"], "created_at": meta["created_at"], **entry["quest"]}
+
+    resp = json_response({"results": list(results)})
+    resp.headers.append(_session_cookie(session_id))
+    return resp
+
+
+async def get_quests(request: Request) -> Response:
+    if not db.is_configured():
+        return json_response([])
+    try:
+        limit = int(request.args.get("limit", DEFAULT_QUEST_PAGE_SIZE))
+    except ValueError:
+        return json_response({"error": "limit must be an integer"}, 400)
+    limit = max(1, min(limit, MAX_QUEST_PAGE_SIZE))
+    cursor = request.args.get("cursor") or None
+
+    session_id = _get_session_id(request)
+    await _flush_progress(session_id=session_id)
+    try:
+        quests, next_cursor = await _storage("list_quests_page", session_id, limit=limit, cursor=cursor)
+    except ValueError:
+        return json_response({"error": "Invalid cursor"}, 400)
+    resp = json_response(quests)
+    if next_cursor:
+        resp.headers.append(("x-next-cursor", next_cursor))
+    return resp
+
+
+@_rate_limited("delete")
+async def delete_all_quests(request: Request) -> Response:
+    if not db.is_configured():
+        return json_response({"deleted": 0})
+    session_id = _get_session_id(request)
+    try:
+        deleted_count = await _storage("delete_all_quests", session_id)
+        await _invalidate_reads(session_id)
+    except Exception as e:
+        print(f"Error deleting quests for session {session_id}: {e}")
+        return json_response({"error": "Failed to delete quests"}, 500)
+    return json_response({"deleted": deleted_count})
+
+
+async def get_quest(request: Request, quest_id: int) -> Response:
+    if not db.is_configured():
+        return json_response({"error": "Quest not found"}, 404)
+    await _flush_progress(quest_id=quest_id)
+    quest = await _storage("get_quest_by_id", quest_id)
+    if quest is None:
+        return json_response({"error": "Quest not found"}, 404)
+    return json_response(quest)
+
+
+@_rate_limited("delete")
+async def delete_quest(request: Request, quest_id: int) -> Response:
+    if not db.is_configured():
+        return Response(status=204)
+    session_id = _get_session_id(request)
+    try:
+        deleted = await _storage("delete_quest", session_id, quest_id)
+        await _invalidate_reads(session_id)
+    except Exception as e:
+        print(f"Error deleting quest {quest_id}: {e}")
+        return json_response({"error": "Failed to delete quest"}, 500)
+    if not deleted:
+        return json_response({"error": "Quest not found"}, 404)
+    return Response(status=204)
+
+
+async def update_step_progress(request: Request, quest_id: int, step_id: int) -> Response:
+    """Mark one quest step as completed or not (batched by ``quest_progress``)."""
+    completed = request.get_json().get("completed")
+    if not isinstance(completed, bool):
+        return json_response({"error": "completed must be true or false"}, 400)
+    if not db.is_configured():
+        return json_response({"error": "Quest not found"}, 404)
+    session_id = _get_session_id(request)
+    tracker = quest_progress.get_tracker()
+    try:
+        progress = await asyncio.to_thread(tracker.toggle, session_id, quest_id, step_id, completed)
+    except LookupError:
+        return json_response({"error": "Step not found"}, 404)
+    if progress is None:
+        return json_response({"error": "Quest not found"}, 404)
+    # Reads flush the toggle first, so they must not be answered from cache.
+    await _invalidate_reads(session_id)
+    return json_response(progress)
+
+
+async def session_stats(request: Request) -> Response:
+    """SGXP totals and quest counts for the caller's session."""
+    if not db.is_configured():
+        return json_response({"quest_count": 0, "completed_quests": 0, "total_sgxp": 0, "earned_sgxp": 0})
+    session_id = _get_session_id(request)
+    await _flush_progress(session_id=session_id)
+    return json_response(await _storage("get_session_stats", session_id))
+
+
+async def global_stats(request: Request) -> Response:
+    """Totals across all heroes, quest counts by help mode and top codenames."""
+    if not db.is_configured():
+        return json_response({
+            "quest_count": 0, "completed_quests": 0, "total_sgxp": 0, "earned_sgxp": 0,
+            "sessions": 0, "help_modes": {}, "top_codenames": [],
+        })
+    return json_response(await _storage("get_global_stats"))
+
+
+async def leaderboard(request: Request) -> Response:
+    """Top heroes by earned SGXP; the caller's own entry has ``"you": true``."""
+    if not db.is_configured():
+        return json_response([])
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LEADERBOARD_SIZE))
+    except ValueError:
+        return json_response({"error": "limit must be an integer"}, 400)
+    limit = max(1, min(limit, MAX_LEADERBOARD_SIZE))
+    session_id = _get_session_id(request)
+    await _flush_progress(session_id=session_id)
+    entries = []
+    for rank, entry in enumerate(await _storage("get_leaderboard", limit), start=1):
+        owner = entry.pop("session_id")
+        entries.append({"rank": rank, **entry, "you": owner == session_id})
+    return json_response(entries)
+
+
+def _is_admin(request: Request) -> bool:
+    """True when the request carries ``Authorization: Bearer $ADMIN_TOKEN``."""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}")
+
+
+async def export_quests(request: Request) -> Response:
+    """Stream quests as NDJSON for backups (see ``app.export_quests``)."""
+    if not _is_admin(request):
+        return json_response({"error": "Not found"}, 404)
+    headers = [("content-type", "application/x-ndjson")]
+    if not db.is_configured():
+        return Response(b"", 200, headers)
+    try:
+        after_id = int(request.args.get("after_id", 0))
+    except ValueError:
+        return json_response({"error": "after_id must be an integer"}, 400)
+    lines = quest_io.iter_ndjson(session_id=request.args.get("session_id"), after_id=after_id)
+    return Response(status=200, headers=headers, stream=_iterate_in_thread(lines))
+
+
+# Flask-style rules, so the table can be compared with app.url_map.
+ROUTES = [
+    ("/metrics", {"GET": metrics_endpoint}),
+    ("/livez", {"GET": healthz}),
+    ("/healthz", {"GET": healthz}),
+    ("/readyz", {"GET": readyz}),
+    ("/stats/db-pool", {"GET": db_pool_stats}),
+    ("/stats/quest-cache", {"GET": quest_cache_stats}),
+    ("/clarify-mission", {"POST": clarify_mission}),
+    ("/generate-quest", {"POST": generate_quest_endpoint}),
+    ("/generate-quest:stream", {"POST": generate_quest_stream_endpoint}),
+    ("/generate-quests:batch", {"POST": generate_quests_batch_endpoint}),
+    ("/quests", {"GET": get_quests, "DELETE": delete_all_quests}),
+    ("/quests/<int:quest_id>", {"GET": get_quest, "DELETE": delete_quest}),
+    ("/quests/<int:quest_id>/steps/<int:step_id>", {"PATCH": update_step_progress}),
+    ("/stats/session", {"GET": session_stats}),
+    ("/stats/global", {"GET": global_stats}),
+    ("/leaderboard", {"GET": leaderboard}),
+    ("/admin/export", {"GET": export_quests}),
+]
+
+
+def _compile_rule(rule: str) -> "re.Pattern[str]":
+    return re.compile("^" + re.sub(r"<int:\w+>", r"(\\d+)", re.escape(rule).replace(r"\<", "<").replace(r"\>", ">")) + "$")
+
+
+_COMPILED_ROUTES = [(_compile_rule(rule), rule, handlers) for rule, handlers in ROUTES]
+
+
+async def dispatch(request: Request) -> Tuple[Response, str]:
+    """Run the handler for ``request``; returns the response and its route rule."""
+    for pattern, rule, handlers in _COMPILED_ROUTES:
+        match = pattern.match(request.path)
+        if match is None:
+            continue
+        handler = handlers.get(request.method)
+        if handler is None:
+            return json_response({"error": "Method not allowed"}, 405), rule
+        args = [int(group) for group in match.groups()]
+        try:
+            return await handler(request, *args), rule
+        except rate_limit.Overloaded as exc:
+            # Admission control shed the request, as app._shed does.
+            return _retry_later(503, exc.retry_after, "Server busy"), rule
+    return json_response({"error": "Not found"}, 404), "<unmatched>"
+
+
+# ---------------------------------------------------------------------------
+# CORS (mirrors flask_cors with supports_credentials=True)
+# ---------------------------------------------------------------------------
+
+def _cors_headers(request: Request) -> List[Tuple[str, str]]:
+    origin = request.headers.get("origin")
+    if not origin:
+        return []
+    return [
+        ("access-control-allow-origin", origin),
+        ("access-control-allow-credentials", "true"),
+        ("access-control-expose-headers", "X-Next-Cursor"),
+        ("vary", "Origin"),
+    ]
+
+
+def _preflight(request: Request) -> Response:
+    headers = [("access-control-allow-methods", "DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT")]
+    requested = request.headers.get("access-control-request-headers")
+    if requested:
+        headers.append(("access-control-allow-headers", requested))
+    return Response(status=200, headers=headers)
+
+
+# ---------------------------------------------------------------------------
+# ASGI plumbing
+# ---------------------------------------------------------------------------
+
+async def _startup() -> None:
+    # Opens the shared cache tier and rate limit store, if any, before the
+    # loop needs them.
+    await asyncio.to_thread(quest_cache.get_cache)
+    for scope in rate_limit.SCOPE_DEFAULTS:
+        await asyncio.to_thread(rate_limit.get_limiter, scope)
+    if not db.is_configured():
+        print("Quest storage is off (DB_BACKEND=none), skipping DB init")
+    else:
+        try:
+            await db_async.init_schema()
+        except Exception as e:
+            if os.getenv("APP_ENV") == "production":
+                raise
+            print(f"Database schema init failed: {e}")
+    readiness.start()
+
+
+async def _shutdown() -> None:
+    readiness.stop()
+    # Write step toggles still buffered in this process.
+    await asyncio.to_thread(quest_progress.get_tracker().flush)
+    await close_async_client()
+    await db_async.close_pool()
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await _startup()
+            except Exception as exc:
+                await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await _shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _send_stream(stream: AsyncIterator[bytes], receive, send) -> None:
+    """Send ``stream`` chunk by chunk until it ends or the client goes away."""
+    disconnected = asyncio.Event()
+
+    async def watch() -> None:
+        # The request body has been read, so the next message is the disconnect.
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        async for chunk in stream:
+            if disconnected.is_set():
+                return
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        watcher.cancel()
+        await stream.aclose()
+
+
+async def app(scope, receive, send) -> None:
+    """ASGI application callable."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    started = time.perf_counter()
+    request = Request(scope, body)
+    if request.method == "OPTIONS" and "access-control-request-method" in request.headers:
+        response, rule = _preflight(request), "<preflight>"
+    else:
+        response, rule = await dispatch(request)
+    headers = response.headers + _cors_headers(request)
+
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        })
+        if response.stream is None:
+            await send({"type": "http.response.body", "body": response.body})
+        else:
+            await _send_stream(response.stream, receive, send)
+    finally:
+        for callback in response.on_close:
+            callback()
+    elapsed = time.perf_counter() - started
+    if metrics.METRICS_DIR:
+        # Flushing the snapshot file is disk I/O.
+        await asyncio.to_thread(metrics.record_request, rule, request.method, response.status, elapsed)
+    else:
+        metrics.record_request(rule, request.method, response.status, elapsed)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("asgi_app:app", port=int(os.getenv("PORT", "5000")))
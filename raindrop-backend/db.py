@@ -1,48 +1,236 @@
+"""
+Quest storage API used by the app, backed by Postgres or SQLite.
+
+The backend is picked per call from the environment:
+
+- ``DB_BACKEND=postgres`` or ``sqlite`` selects one explicitly;
+- ``DB_BACKEND=none`` turns persistence off (the API then answers with
+  empty results, as it always did without a database);
+- otherwise Postgres (``db_postgres``) is used when ``DATABASE_URL`` is set
+  and the embedded SQLite file (``db_sqlite``, ``SQLITE_PATH``) when not, so
+  single-node and offline deployments keep their quests.
+
+Both backends implement the functions below with the same arguments,
+return shapes and errors; ``test_storage_backends.py`` runs one suite
+against each.  Helpers shared by the backends (cursors, SGXP rewards,
+retention months) live here too.
+
+Quests older than ``QUEST_RETENTION_MONTHS`` whole months are removed by
+:func:`purge_expired_quests` (``python quest_retention.py purge``).  On
+Postgres ``quests`` is range partitioned by month on ``created_at``, so
+expired months are dropped as whole partitions; anything else is deleted
+``QUEST_DELETE_CHUNK_SIZE`` rows per transaction, as are a session's quests
+in :func:`delete_all_quests`.
+"""
+
+import base64
+import binascii
+import importlib
 import os
-import psycopg2
-from psycopg2.extras import Json, RealDictCursor
+from datetime import datetime, timezone
 
 from dotenv import load_dotenv
 
+import metrics
+
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+BACKENDS = ("postgres", "sqlite")
+
+# Version recorded by init_schema; bump it whenever either backend's schema
+# changes.  Readiness (health.py) waits until the database has caught up.
+SCHEMA_VERSION = 3
+_modules = {}
+
+# Rows removed per transaction by bulk deletes, so row locks, trigger work
+# and WAL per commit stay bounded however many quests match.
+QUEST_DELETE_CHUNK_SIZE = int(os.getenv("QUEST_DELETE_CHUNK_SIZE", "1000"))
+# Whole months of quests kept by purge_expired_quests; 0 keeps everything.
+QUEST_RETENTION_MONTHS = int(os.getenv("QUEST_RETENTION_MONTHS", "0"))
+
+
+def backend_name():
+    """Name of the storage backend in use, or None when persistence is off."""
+    name = os.getenv("DB_BACKEND", "").strip().lower()
+    if name in ("", "auto"):
+        return "postgres" if os.getenv("DATABASE_URL") else "sqlite"
+    if name in ("none", "off"):
+        return None
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND {name!r}; expected one of {', '.join(BACKENDS)} or none")
+    return name
+
+
+def is_configured():
+    """True when quests are persisted (any backend other than ``none``)."""
+    return backend_name() is not None
+
+
+def _backend():
+    name = backend_name()
+    if name is None:
+        raise RuntimeError("Quest storage is disabled (DB_BACKEND=none)")
+    module = _modules.get(name)
+    if module is None:
+        module = _modules[name] = importlib.import_module(f"db_{name}")
+    return module
+
+
+# ---------------------------------------------------------------------------
+# Helpers shared by the backends
+# ---------------------------------------------------------------------------
+
+def step_rewards(quest_payload):
+    """
+    Map step id -> SGXP reward for a quest, normalised the same way as the
+    HUD (``normaliseQuest`` in ``new_script.js``): a step without a numeric
+    id gets its 1-based position, a step without a numeric reward earns 10.
+    """
+    steps = (quest_payload or {}).get("steps")
+    if not isinstance(steps, list):
+        return {}
+    rewards = {}
+    for idx, step in enumerate(steps):
+        step = step if isinstance(step, dict) else {}
+        step_id = step.get("id")
+        reward = step.get("sgxp_reward")
+        if not isinstance(step_id, int) or isinstance(step_id, bool):
+            step_id = idx + 1
+        if not isinstance(reward, (int, float)) or isinstance(reward, bool):
+            reward = 10
+        rewards[step_id] = int(reward)
+    return rewards
+
+
+def month_start(value):
+    """First instant (UTC) of the calendar month containing ``value``."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, count):
+    """The month ``count`` months after (or before) the month start ``month``."""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def retention_cutoff(months, now=None):
+    """
+    Start of the oldest month kept when ``months`` whole months are retained
+    besides the current one; quests created before it have expired.
+    """
+    return add_months(month_start(now or datetime.now(timezone.utc)), -months)
+
 
+def encode_cursor(created_at, quest_id):
+    """Build the opaque pagination cursor pointing just past a quest row."""
+    if hasattr(created_at, 'isoformat'):
+        created_at = created_at.isoformat()
+    raw = f"{created_at}|{quest_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
-def get_connection():
-    if not DATABASE_URL:
-        raise RuntimeError("DATABASE_URL is not set")
-    return psycopg2.connect(DATABASE_URL)
 
+def decode_cursor(cursor):
+    """Parse a cursor from :func:`encode_cursor`.
 
+    :raises ValueError: if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_at, quest_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(quest_id)
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+
+
+# ---------------------------------------------------------------------------
+# Storage API (timed here once for whichever backend serves the call)
+# ---------------------------------------------------------------------------
+
+def pool_stats():
+    """Connection pool statistics, or None if the backend has no pool yet."""
+    name = backend_name()
+    if name is None or name not in _modules:
+        return None
+    return _modules[name].pool_stats()
+
+
+@metrics.timed_db
 def init_schema():
-    with get_connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS quests (
-                id SERIAL PRIMARY KEY,
-                session_id TEXT,
-                created_at TIMESTAMPTZ DEFAULT NOW(),
-                quest_json JSONB
-            );
-            """
-        )
-        conn.commit()
+    return _backend().init_schema()
 
 
+@metrics.timed_db
+def get_schema_version():
+    """Schema version recorded by :func:`init_schema`, or None before it has run.
+
+    Doubles as a connectivity check: it raises if the database is unreachable.
+    """
+    return _backend().get_schema_version()
+
+
+@metrics.timed_db
 def insert_quest(session_id, quest_payload):
-    with get_connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO quests (session_id, quest_json)
-            VALUES (%s, %s)
-            RETURNING id, created_at;
-            """,
-            (session_id, Json(quest_payload)),
-        )
-        row = cur.fetchone()
-        conn.commit()
-        return {"id": row[0], "created_at": row[1]}
+    """Store a quest; returns ``{"id", "created_at"}``."""
+    return _backend().insert_quest(session_id, quest_payload)
+
+
+@metrics.timed_db
+def insert_quests(session_id, quest_payloads):
+    """
+    Insert several quests for one session in one statement/transaction.
+
+    :returns: ``[{"id", "created_at"}, ...]`` in the order of
+        ``quest_payloads``.
+    """
+    return _backend().insert_quests(session_id, quest_payloads)
+
+
+@metrics.timed_db
+def reserve_quest_ids(count):
+    """
+    Reserve ``count`` quest ids for rows inserted later with
+    :func:`import_quests` (write-behind, see ``quest_writer``).  Reserved
+    ids are never handed out again, whether or not they end up used.
+
+    :returns: The ids, ascending.
+    """
+    return _backend().reserve_quest_ids(count)
+
+
+@metrics.timed_db
+def list_quests_page(session_id, limit=20, cursor=None):
+    """
+    Retrieve one page of a session's quests, newest first, using keyset
+    pagination on ``(created_at, id)``.
+
+    Each page is a single index range scan, so the cost per page stays
+    constant no matter how deep into the Suit Log the client has scrolled.
+
+    :param session_id: The user's session identifier (stored in cookie).
+    :param limit: Maximum number of quests to return.
+    :param cursor: Opaque cursor returned by a previous call, or None for
+        the first page.
+    :returns: ``(quests, next_cursor)`` where ``next_cursor`` is None once
+        the last page has been reached.
+    :raises ValueError: if ``cursor`` is malformed.
+    """
+    return _backend().list_quests_page(session_id, limit=limit, cursor=cursor)
+
+
+@metrics.timed_db
+def list_quests_page_json(session_id, limit=20, cursor=None):
+    """
+    Passthrough variant of :func:`list_quests_page` for the API layer: the
+    database renders each flattened quest as JSON text.
+
+    :returns: ``(json_array_text, next_cursor)``
+    :raises ValueError: if ``cursor`` is malformed.
+    """
+    return _backend().list_quests_page_json(session_id, limit=limit, cursor=cursor)
 
 
 def list_quests(session_id, limit=20):
@@ -60,85 +248,160 @@ def list_quests(session_id, limit=20):
     :param limit: Maximum number of quests to return, newest first.
     :returns: A list of flattened quest dictionaries.
     """
-    with get_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
-            """
-            SELECT id, session_id, created_at, quest_json
-            FROM quests
-            WHERE session_id = %s
-            ORDER BY created_at DESC
-            LIMIT %s;
-            """,
-            (session_id, limit),
-        )
-        rows = cur.fetchall()
-        quests = []
-        for row in rows:
-            # Start with the original quest JSON and merge in DB metadata.
-            quest_data = dict(row['quest_json']) if row.get('quest_json') else {}
-            quest_data.update({
-                'id': row['id'],
-                'session_id': row['session_id'],
-                'created_at': row['created_at'].isoformat() if hasattr(row['created_at'], 'isoformat') else row['created_at'],
-            })
-            quests.append(quest_data)
-        return quests
+    quests, _ = list_quests_page(session_id, limit=limit)
+    return quests
 
 
+@metrics.timed_db
 def get_quest_by_id(quest_id):
-    """Retrieve a single quest by its ID."""
-    with get_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
-            """
-            SELECT id, session_id, created_at, quest_json
-            FROM quests
-            WHERE id = %s
-            """,
-            (quest_id,)
-        )
-        row = cur.fetchone()
-        if row:
-            quest = row['quest_json']
-            quest.update({
-                'id': row['id'],
-                'session_id': row['session_id'],
-                'created_at': row['created_at'].isoformat() if hasattr(row['created_at'], 'isoformat') else row['created_at']
-            })
-            return quest
-        return None
+    """Retrieve a single flattened quest by its ID, or None."""
+    return _backend().get_quest_by_id(quest_id)
+
+
+@metrics.timed_db
+def get_quest_json_by_id(quest_id):
+    """Passthrough variant of :func:`get_quest_by_id`; returns JSON text or None."""
+    return _backend().get_quest_json_by_id(quest_id)
+
+
+@metrics.timed_db
+def get_quest_progress(quest_id):
+    """
+    Load what progress tracking needs for one quest.
+
+    :returns: ``{"session_id", "rewards", "completed_step_ids"}`` (rewards as
+        from :func:`step_rewards`), or None if the quest does not exist.
+    """
+    return _backend().get_quest_progress(quest_id)
+
+
+@metrics.timed_db
+def apply_step_progress(changes):
+    """
+    Apply a batch of coalesced step toggles in one transaction.
+
+    :param changes: ``{quest_id: {step_id: completed_bool}}``.  Toggles are
+        applied on top of the stored ``completed_step_ids``, so batches
+        flushed by different workers compose.  ``earned_sgxp`` is recomputed
+        for every touched quest.
+    :returns: The number of quests updated.
+    """
+    return _backend().apply_step_progress(changes)
+
+
+def iter_quest_export(session_id=None, after_id=0, batch_size=1000):
+    """
+    Yield every quest (or one session's quests) as JSON export records, in
+    id order, streaming ``batch_size`` rows at a time.
+
+    :param after_id: Only export quests with a larger id (resume point).
+    """
+    yield from _backend().iter_quest_export(session_id=session_id, after_id=after_id, batch_size=batch_size)
+
+
+@metrics.timed_db
+def import_quests(records):
+    """
+    Bulk insert quest records in one transaction.
+
+    :param records: dicts with ``session_id``, ``created_at`` (or None),
+        ``quest``, ``completed_step_ids``, ``earned_sgxp``, ``total_sgxp`` and
+        optionally ``id``.  Records that keep their ``id`` are skipped if that
+        id already exists, so re-importing the same file is harmless.
+    :returns: The number of rows actually inserted.
+    """
+    return _backend().import_quests(records)
 
 
+@metrics.timed_db
+def get_session_stats(session_id):
+    """SGXP totals and quest counts for one session (zeros if it has none)."""
+    return _backend().get_session_stats(session_id)
+
+
+@metrics.timed_db
+def get_global_stats(top_n=10):
+    """
+    Totals across all sessions plus quest counts by help mode and the
+    ``top_n`` most common codenames.
+    """
+    return _backend().get_global_stats(top_n=top_n)
+
+
+@metrics.timed_db
+def get_leaderboard(limit=10):
+    """Top sessions by earned SGXP, read from the leaderboard index."""
+    return _backend().get_leaderboard(limit=limit)
+
+
+@metrics.timed_db
 def delete_quest(session_id, quest_id):
     """Delete a single quest for this session/client.
 
     Returns True if a row was deleted, False otherwise.
     """
-    with get_connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            DELETE FROM quests
-            WHERE id = %s AND session_id = %s;
-            """,
-            (quest_id, session_id),
-        )
-        deleted = cur.rowcount
-        conn.commit()
-        return deleted > 0
+    return _backend().delete_quest(session_id, quest_id)
 
 
-def delete_all_quests(session_id):
+@metrics.timed_db
+def delete_all_quests(session_id, chunk_size=None):
     """Delete all quests for this session/client.
 
+    Rows go ``chunk_size`` (``QUEST_DELETE_CHUNK_SIZE``) per transaction, so
+    a huge session never holds its row locks in one long statement; if a
+    chunk fails, earlier chunks stay deleted and a retry finishes the job.
+
     Returns the number of rows deleted.
     """
-    with get_connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            DELETE FROM quests
-            WHERE session_id = %s;
-            """,
-            (session_id,),
-        )
-        deleted = cur.rowcount
-        conn.commit()
-        return deleted
+    return _backend().delete_all_quests(session_id, chunk_size=chunk_size or QUEST_DELETE_CHUNK_SIZE)
+
+
+# ---------------------------------------------------------------------------
+# Partitions and retention (maintenance, see quest_retention.py)
+# ---------------------------------------------------------------------------
+
+def ensure_quest_partitions():
+    """
+    Create the monthly partitions for this month and the next
+    ``QUEST_PARTITIONS_AHEAD`` (Postgres with a partitioned table only).
+
+    :returns: Names of the partitions created.
+    """
+    return _backend().ensure_partitions()
+
+
+def list_quest_partitions():
+    """``[{"name", "start", "end", "rows"}]`` oldest first (``rows`` is the
+    planner's estimate; None bounds are open ended).  Empty when ``quests``
+    is not partitioned."""
+    return _backend().list_partitions()
+
+
+def partition_quests_table():
+    """
+    Convert an existing unpartitioned Postgres ``quests`` table in place: it
+    becomes the partition for everything before next month, and monthly
+    partitions follow it.
+
+    :returns: Names of the partitions created ([] if already partitioned).
+    :raises RuntimeError: on backends without partitioning (SQLite).
+    """
+    return _backend().partition_existing_quests()
+
+
+def purge_expired_quests(retention_months=None, chunk_size=None, now=None):
+    """
+    Remove quests created before :func:`retention_cutoff` for
+    ``retention_months`` (default ``QUEST_RETENTION_MONTHS``; 0 keeps all).
+
+    Partitions that lie wholly before the cutoff are dropped (aggregates
+    are adjusted first); remaining expired rows are deleted in chunks.
+
+    :returns: ``{"cutoff", "partitions_dropped", "rows_deleted"}``
+    """
+    months = QUEST_RETENTION_MONTHS if retention_months is None else retention_months
+    if months <= 0:
+        return {"cutoff": None, "partitions_dropped": [], "rows_deleted": 0}
+    cutoff = retention_cutoff(months, now)
+    result = _backend().purge_expired_quests(cutoff, chunk_size=chunk_size or QUEST_DELETE_CHUNK_SIZE)
+    return dict(result, cutoff=cutoff)
@@ -0,0 +1,201 @@
+"""
+asyncpg twin of the ``db`` helpers, used by the ASGI entry point.
+
+Functions mirror ``db.py`` one for one (same SQL, same return shapes) so
+``asgi_app`` can serve the exact JSON contracts of the Flask app while
+keeping Postgres round trips off the event loop's critical path.  Needs
+the optional ``asyncpg`` dependency; pool sizing reuses the ``DB_POOL_*``
+environment variables.  The schema itself is not duplicated here:
+:func:`init_schema` runs :func:`db.init_schema`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+
+import db
+from db import QUEST_DELETE_CHUNK_SIZE, decode_cursor, encode_cursor, step_rewards
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+_pool = None
+
+
+async def _init_connection(conn):
+    # Decode JSONB into Python objects, as psycopg2 does.
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def get_pool():
+    """Return the asyncpg pool for this event loop, creating it on first use."""
+    global _pool
+    if _pool is None:
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is not set")
+        import asyncpg
+
+        _pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=int(os.getenv("DB_POOL_MIN", "1")),
+            max_size=int(os.getenv("DB_POOL_MAX", "10")),
+            max_inactive_connection_lifetime=float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            init=_init_connection,
+        )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+
+
+def pool_stats():
+    """Return asyncpg pool sizing, or None if no pool has been created."""
+    if _pool is None:
+        return None
+    return {
+        "min": _pool.get_min_size(),
+        "max": _pool.get_max_size(),
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+    }
+
+
+async def init_schema():
+    """Create or upgrade the schema with :func:`db.init_schema`.
+
+    The Flask app and this mode must bootstrap the same database (monthly
+    partitions, progress columns, stats triggers, dedup objects), so the
+    DDL lives in ``db_postgres`` only and runs here on a worker thread.
+    """
+    await asyncio.to_thread(db.init_schema)
+
+
+# SQLSTATE check_violation: what Postgres raises for a row with no partition.
+_CHECK_VIOLATION = "23514"
+
+
+async def insert_quest(session_id, quest_payload):
+    pool = await get_pool()
+    query = """
+        INSERT INTO quests (session_id, quest_json, total_sgxp)
+        VALUES ($1, $2, $3)
+        RETURNING id, created_at;
+    """
+    # total_sgxp is fixed at insert time, as in db_postgres.insert_quest;
+    # the stats trigger and completion both read it.
+    args = (session_id, quest_payload, sum(step_rewards(quest_payload).values()))
+    try:
+        row = await pool.fetchrow(query, *args)
+    except Exception as exc:
+        # Same recovery as db_postgres._write: the clock passed the months
+        # created ahead, so create this month's partition and try once more.
+        if getattr(exc, "sqlstate", None) != _CHECK_VIOLATION or "partition" not in str(exc):
+            raise
+        print(f"Creating missing quest partition: {exc}")
+        await asyncio.to_thread(db.ensure_quest_partitions)
+        row = await pool.fetchrow(query, *args)
+    return {"id": row["id"], "created_at": row["created_at"]}
+
+
+# Metadata columns merged into the quest document by _flatten_row.
+_QUEST_COLUMNS = (
+    "id, session_id, created_at, completed_step_ids, earned_sgxp, total_sgxp, "
+    "quest_document(quest_json, body_hash, body_mission) AS quest_json"
+)
+
+
+def _flatten_row(row):
+    """Same shape as ``db_postgres._flatten_row``."""
+    quest_data = dict(row["quest_json"]) if row["quest_json"] else {}
+    quest_data.update({
+        "id": row["id"],
+        "session_id": row["session_id"],
+        "created_at": row["created_at"].isoformat(),
+        "completed_step_ids": list(row["completed_step_ids"] or []),
+        "earned_sgxp": row["earned_sgxp"] or 0,
+        "total_sgxp": row["total_sgxp"] or 0,
+    })
+    return quest_data
+
+
+async def list_quests_page(session_id, limit=20, cursor=None):
+    """Async :func:`db.list_quests_page`; returns ``(quests, next_cursor)``."""
+    params = [session_id]
+    keyset = ""
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        keyset = "AND (created_at, id) < ($2, $3)"
+        params.extend([after_created_at, after_id])
+    params.append(limit + 1)
+
+    pool = await get_pool()
+    rows = await pool.fetch(
+        f"""
+        SELECT {_QUEST_COLUMNS}
+        FROM quests
+        WHERE session_id = $1 {keyset}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ${len(params)};
+        """,
+        *params,
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return [_flatten_row(row) for row in rows], next_cursor
+
+
+async def get_quest_by_id(quest_id):
+    pool = await get_pool()
+    row = await pool.fetchrow(
+        f"""
+        SELECT {_QUEST_COLUMNS}
+        FROM quests
+        WHERE id = $1
+        """,
+        quest_id,
+    )
+    return _flatten_row(row) if row else None
+
+
+def _rowcount(status):
+    # asyncpg returns the command tag, e.g. "DELETE 3".
+    return int(status.split()[-1])
+
+
+async def delete_quest(session_id, quest_id):
+    pool = await get_pool()
+    status = await pool.execute(
+        "DELETE FROM quests WHERE id = $1 AND session_id = $2;",
+        quest_id,
+        session_id,
+    )
+    return _rowcount(status) > 0
+
+
+async def delete_all_quests(session_id, chunk_size=QUEST_DELETE_CHUNK_SIZE):
+    # Same chunking as db.delete_all_quests: one short transaction per chunk.
+    pool = await get_pool()
+    deleted = 0
+    while True:
+        status = await pool.execute(
+            """
+            DELETE FROM quests
+            WHERE session_id = $1
+              AND id IN (SELECT id FROM quests WHERE session_id = $1 LIMIT $2);
+            """,
+            session_id,
+            chunk_size,
+        )
+        count = _rowcount(status)
+        deleted += count
+        if count < chunk_size:
+            return deleted
@@ -0,0 +1,295 @@
+"""
+Thread-safe connection pool used by the ``db`` helpers.
+
+Opening a fresh Postgres connection per request means a full TCP + TLS
+handshake against managed Postgres, which usually costs more than the
+query itself and quickly exhausts the server's connection slots under
+load.  ``ConnectionPool`` keeps a bounded set of connections around and
+hands them out to request threads:
+
+- Connections are opened on demand, never up front (so importing or
+  building the pool does no I/O).  Idle connections are closed after
+  ``max_idle`` seconds, except that the ``minconn`` most recently used
+  ones are kept open however long they sit idle.
+- At most ``maxconn`` connections exist at once; callers wait up to
+  ``timeout`` seconds for one to free up and then get ``PoolTimeout``.
+- Connections idle for longer than ``check_after`` seconds are health
+  checked on checkout and silently replaced if the check fails.
+- Connections older than ``max_lifetime`` seconds are recycled.
+
+The pool is driver-agnostic: it only needs a ``connect`` callable and,
+optionally, ``check`` / ``reset`` callables that know how to ping and
+clean up a connection.  ``db.py`` wires those up for psycopg2.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "returned_at")
+
+    def __init__(self, conn: Any) -> None:
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.returned_at = now
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of database connections."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        minconn: int = 1,
+        maxconn: int = 10,
+        timeout: float = 5.0,
+        max_lifetime: float = 1800.0,
+        max_idle: float = 300.0,
+        check_after: float = 30.0,
+        check: Optional[Callable[[Any], bool]] = None,
+        reset: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        if maxconn < 1:
+            raise ValueError("maxconn must be at least 1")
+        if minconn < 0 or minconn > maxconn:
+            raise ValueError("minconn must be between 0 and maxconn")
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._check = check
+        self._reset = reset
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: deque = deque()
+        self._in_use: Dict[int, _PooledConnection] = {}
+        # Slots held by threads that are opening or health checking a
+        # connection; they count toward maxconn but are neither idle nor
+        # in use yet.
+        self._pending = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._counters = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "recycled": 0,
+            "failed_checks": 0,
+            "connect_errors": 0,
+        }
+        self._wait_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Checkout / return
+    # ------------------------------------------------------------------
+
+    def getconn(self, timeout: Optional[float] = None) -> Any:
+        """Check out a healthy connection, waiting up to ``timeout`` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            started = time.monotonic()
+            with self._cond:
+                pooled = self._acquire_slot(deadline)
+                self._wait_seconds += time.monotonic() - started
+
+            if pooled is None:
+                # We reserved a slot for a brand new connection.
+                pooled = self._open()
+            elif not self._usable(pooled):
+                self._close(pooled)
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._pending -= 1
+                self._in_use[id(pooled.conn)] = pooled
+                self._counters["checkouts"] += 1
+            return pooled.conn
+
+    def putconn(self, conn: Any, discard: bool = False) -> None:
+        """Return ``conn`` to the pool, closing it if it is no longer usable."""
+        with self._cond:
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
+            raise ValueError("connection was not checked out from this pool")
+
+        if not discard and self._reset is not None:
+            try:
+                discard = not self._reset(conn)
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        if not discard and now - pooled.created_at >= self.max_lifetime:
+            self._bump("recycled")
+            discard = True
+
+        if discard or self._closed:
+            self._discard(pooled)
+            return
+
+        pooled.returned_at = now
+        with self._cond:
+            self._idle.append(pooled)
+            expired = self._prune_idle(now)
+            self._cond.notify()
+        # Closing can wait on the network; do it without blocking checkouts.
+        for stale in expired:
+            self._close(stale)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager that checks a connection out and always returns it.
+
+        If the body raises, the connection is rolled back (via ``reset``)
+        before it goes back to the pool.
+        """
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self) -> None:
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of pool sizing and usage counters."""
+        with self._cond:
+            idle = len(self._idle)
+            in_use = len(self._in_use)
+            snapshot = {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": idle + in_use + self._pending,
+                "idle": idle,
+                "in_use": in_use,
+                "waiting": self._waiting,
+                "wait_seconds_total": round(self._wait_seconds, 6),
+            }
+            snapshot.update(self._counters)
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _acquire_slot(self, deadline: float) -> Optional[_PooledConnection]:
+        """Pop an idle connection or reserve room for a new one.
+
+        Must be called with ``self._cond`` held.  Returns ``None`` when the
+        caller should open a new connection itself (outside the lock).
+        """
+        while True:
+            if self._closed:
+                raise PoolTimeout("connection pool is closed")
+            if self._idle:
+                # LIFO keeps the hottest connections in use and lets the
+                # rest age out via max_idle.
+                self._pending += 1
+                return self._idle.pop()
+            if len(self._in_use) + self._pending < self.maxconn:
+                self._pending += 1
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._counters["timeouts"] += 1
+                raise PoolTimeout(
+                    f"no database connection available within {self.timeout:.1f}s "
+                    f"(max={self.maxconn})"
+                )
+            self._waiting += 1
+            try:
+                self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _open(self) -> _PooledConnection:
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._pending -= 1
+                self._counters["connect_errors"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._counters["created"] += 1
+        return _PooledConnection(conn)
+
+    def _usable(self, pooled: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if now - pooled.created_at >= self.max_lifetime:
+            self._bump("recycled")
+            return False
+        if getattr(pooled.conn, "closed", False):
+            self._bump("failed_checks")
+            return False
+        if self._check is not None and now - pooled.returned_at >= self.check_after:
+            try:
+                healthy = self._check(pooled.conn)
+            except Exception:
+                healthy = False
+            if not healthy:
+                self._bump("failed_checks")
+                return False
+        return True
+
+    def _prune_idle(self, now: float) -> List[_PooledConnection]:
+        """Take idle connections above ``minconn`` that sat unused too long.
+
+        Must be called with ``self._cond`` held; the caller closes the
+        returned connections after releasing it.  The oldest idle
+        connections live at the left end of the deque.
+        """
+        expired = []
+        while len(self._idle) > self.minconn:
+            oldest = self._idle[0]
+            if now - oldest.returned_at < self.max_idle:
+                break
+            expired.append(self._idle.popleft())
+        return expired
+
+    def _bump(self, counter: str) -> None:
+        with self._cond:
+            self._counters[counter] += 1
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        self._close(pooled)
+        with self._cond:
+            self._cond.notify()
+
+    def _close(self, pooled: _PooledConnection) -> None:
+        # Always called without the lock held: closing can wait on the network.
+        self._bump("closed")
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
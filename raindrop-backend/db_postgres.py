@@ -0,0 +1,1225 @@
+"""
+Postgres storage backend for ``db`` (selected when ``DATABASE_URL`` is set).
+
+Connections come from a process-wide :class:`db_pool.ConnectionPool`, and
+aggregates are kept current by a row trigger on ``quests``.
+
+A new ``quests`` table is range partitioned by month on ``created_at``
+(``quests_pYYYY_MM``; ``QUEST_PARTITIONING=0`` keeps a plain table).
+``init_schema`` creates this month's partition and the next
+``QUEST_PARTITIONS_AHEAD``, and a write that finds no partition for its
+row creates it and retries.  Retention detaches and drops whole expired
+partitions instead of deleting their rows; see :func:`purge_expired_quests`.
+"""
+
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+from psycopg2 import errors, extensions, sql
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+from dotenv import load_dotenv
+
+import quest_dedup
+from db import SCHEMA_VERSION, add_months, decode_cursor, encode_cursor, month_start, step_rewards
+from db_pool import ConnectionPool
+
+load_dotenv()
+
+
+# Pool sizing; see db_pool.ConnectionPool for what each knob does.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+
+# Create quests partitioned by month when the table does not exist yet, and
+# how many months of empty partitions to keep ready ahead of the current one.
+QUEST_PARTITIONING = os.getenv("QUEST_PARTITIONING", "1").strip().lower() not in ("0", "false", "no", "off")
+QUEST_PARTITIONS_AHEAD = int(os.getenv("QUEST_PARTITIONS_AHEAD", "3"))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_connection():
+    """Open a brand new (unpooled) connection to ``DATABASE_URL``."""
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is not set")
+    return psycopg2.connect(database_url)
+
+
+def _check_connection(conn):
+    """Cheap liveness probe run on connections that sat idle for a while."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+    conn.rollback()
+    return True
+
+
+def _reset_connection(conn):
+    """Roll back any open transaction before a connection goes back to the pool.
+
+    Returns False for connections that are closed or in an unknown state so
+    the pool drops them instead of handing them to the next request.
+    """
+    if conn.closed:
+        return False
+    status = conn.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    return True
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use.
+
+    The pool is rebuilt after a fork so worker processes never share sockets
+    inherited from a preloading parent.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool(
+                get_connection,
+                minconn=DB_POOL_MIN,
+                maxconn=DB_POOL_MAX,
+                timeout=DB_POOL_TIMEOUT,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                max_idle=DB_POOL_MAX_IDLE,
+                check_after=DB_POOL_CHECK_AFTER,
+                check=_check_connection,
+                reset=_reset_connection,
+            )
+            _pool_pid = pid
+    return _pool
+
+
+def pool_stats():
+    """Return connection pool statistics, or None if no pool has been created."""
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.stats()
+
+
+@contextmanager
+def _connection():
+    """Borrow a pooled connection for the duration of a ``with`` block."""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+# The partitioned layout of quests: every column the plain table ends up
+# with after init_schema, and a primary key that includes the partition key.
+_PARTITIONED_QUESTS_DDL = """
+CREATE TABLE quests (
+    id {id_column},
+    session_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    quest_json JSONB,
+    body_hash TEXT,
+    body_mission TEXT,
+    completed_step_ids INTEGER[] NOT NULL DEFAULT '{{}}',
+    earned_sgxp INTEGER NOT NULL DEFAULT 0,
+    total_sgxp INTEGER,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+"""
+
+# Partitions detached by purge_expired_quests whose rows still count in the
+# aggregates; a purge interrupted after the detach finishes them next time.
+_RETIRED_PARTITIONS_DDL = """
+CREATE TABLE IF NOT EXISTS quest_retired_partitions (
+    name TEXT PRIMARY KEY,
+    detached_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+
+def init_schema():
+    with _connection() as conn, conn.cursor() as cur:
+        # Serialise concurrent workers running init_schema at boot.
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('quest_stats_init'))")
+        cur.execute("SELECT to_regclass('quests') IS NULL")
+        if QUEST_PARTITIONING and cur.fetchone()[0]:
+            cur.execute(_PARTITIONED_QUESTS_DDL.format(id_column="SERIAL"))
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quests (
+                id SERIAL PRIMARY KEY,
+                session_id TEXT,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                quest_json JSONB
+            );
+            """
+        )
+        # Serves the Suit Log query (newest quests for one session) and its
+        # keyset pagination straight from the index, without a sort.
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS quests_session_created_id_idx
+            ON quests (session_id, created_at DESC, id DESC);
+            """
+        )
+        # Step progress lives next to the quest so the Suit Log reads it with
+        # no extra query; total_sgxp is fixed at insert time.
+        cur.execute(
+            """
+            ALTER TABLE quests
+                ADD COLUMN IF NOT EXISTS completed_step_ids INTEGER[] NOT NULL DEFAULT '{}',
+                ADD COLUMN IF NOT EXISTS earned_sgxp INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS total_sgxp INTEGER;
+            """
+        )
+        # Backfill rows written before the column existed (same defaults as
+        # step_rewards: missing ids are 1-based positions, rewards default to 10).
+        cur.execute(
+            """
+            UPDATE quests SET total_sgxp = COALESCE((
+                SELECT SUM(CASE WHEN jsonb_typeof(s->'sgxp_reward') = 'number'
+                                THEN (s->>'sgxp_reward')::numeric::int ELSE 10 END)
+                FROM jsonb_array_elements(
+                    CASE WHEN jsonb_typeof(quest_json->'steps') = 'array'
+                         THEN quest_json->'steps' ELSE '[]'::jsonb END
+                ) AS s
+            ), 0)
+            WHERE total_sgxp IS NULL;
+            """
+        )
+        cur.execute(quest_dedup.POSTGRES_DDL)
+        cur.execute(_RETIRED_PARTITIONS_DDL)
+        _ensure_partitions(cur)
+        _init_aggregates(cur)
+        _record_schema_version(cur)
+        conn.commit()
+
+
+def _record_schema_version(cur):
+    # Written last, in the same transaction: a stored version means every
+    # statement above it has been applied.  Never moves backwards, so an
+    # older worker booting during a rollout does not hide a newer schema.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        INSERT INTO schema_version (id, version) VALUES (1, %s)
+        ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, applied_at = NOW()
+        WHERE schema_version.version < EXCLUDED.version;
+        """,
+        (SCHEMA_VERSION,),
+    )
+
+
+def get_schema_version():
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return None
+        cur.execute("SELECT version FROM schema_version WHERE id = 1")
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+# Aggregates maintained by a row trigger on quests, so stats and leaderboard
+# reads are single-row or index-range lookups however large quests grows.
+_AGGREGATES_DDL = """
+CREATE TABLE IF NOT EXISTS quest_session_stats (
+    session_id TEXT PRIMARY KEY,
+    quest_count INTEGER NOT NULL DEFAULT 0,
+    completed_quests INTEGER NOT NULL DEFAULT 0,
+    total_sgxp BIGINT NOT NULL DEFAULT 0,
+    earned_sgxp BIGINT NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS quest_session_stats_leaderboard_idx
+    ON quest_session_stats (earned_sgxp DESC, session_id);
+
+CREATE TABLE IF NOT EXISTS quest_global_stats (
+    id SMALLINT PRIMARY KEY CHECK (id = 1),
+    sessions BIGINT NOT NULL DEFAULT 0,
+    quest_count BIGINT NOT NULL DEFAULT 0,
+    completed_quests BIGINT NOT NULL DEFAULT 0,
+    total_sgxp BIGINT NOT NULL DEFAULT 0,
+    earned_sgxp BIGINT NOT NULL DEFAULT 0
+);
+
+-- dimension is 'help_mode' or 'codename' (the quest's OPERATION name)
+CREATE TABLE IF NOT EXISTS quest_group_counts (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    quest_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+);
+CREATE INDEX IF NOT EXISTS quest_group_counts_top_idx
+    ON quest_group_counts (dimension, quest_count DESC);
+
+CREATE OR REPLACE FUNCTION quest_stats_apply(
+    p_session_id TEXT, p_quest_json JSONB, p_quests INTEGER,
+    p_completed INTEGER, p_total BIGINT, p_earned BIGINT, p_groups BOOLEAN
+) RETURNS void AS $$
+DECLARE
+    new_count INTEGER;
+    session_delta INTEGER := 0;
+BEGIN
+    INSERT INTO quest_session_stats AS s
+        (session_id, quest_count, completed_quests, total_sgxp, earned_sgxp)
+    VALUES (COALESCE(p_session_id, ''), p_quests, p_completed, p_total, p_earned)
+    ON CONFLICT (session_id) DO UPDATE SET
+        quest_count = s.quest_count + EXCLUDED.quest_count,
+        completed_quests = s.completed_quests + EXCLUDED.completed_quests,
+        total_sgxp = s.total_sgxp + EXCLUDED.total_sgxp,
+        earned_sgxp = s.earned_sgxp + EXCLUDED.earned_sgxp
+    RETURNING quest_count INTO new_count;
+
+    -- A session counts once it has at least one quest.
+    IF new_count > 0 AND new_count - p_quests <= 0 THEN
+        session_delta := 1;
+    ELSIF new_count <= 0 AND new_count - p_quests > 0 THEN
+        session_delta := -1;
+    END IF;
+
+    UPDATE quest_global_stats SET
+        sessions = sessions + session_delta,
+        quest_count = quest_count + p_quests,
+        completed_quests = completed_quests + p_completed,
+        total_sgxp = total_sgxp + p_total,
+        earned_sgxp = earned_sgxp + p_earned
+    WHERE id = 1;
+
+    IF p_groups THEN
+        INSERT INTO quest_group_counts AS g (dimension, value, quest_count)
+        VALUES ('help_mode', COALESCE(p_quest_json->>'help_mode', 'supplies'), p_quests),
+               ('codename', COALESCE(p_quest_json->>'quest_name', ''), p_quests)
+        ON CONFLICT (dimension, value) DO UPDATE SET quest_count = g.quest_count + EXCLUDED.quest_count;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION quest_stats_trigger() RETURNS trigger AS $$
+DECLARE
+    old_done INTEGER := 0;
+    new_done INTEGER := 0;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_done := CASE WHEN OLD.total_sgxp > 0 AND OLD.earned_sgxp >= OLD.total_sgxp THEN 1 ELSE 0 END;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_done := CASE WHEN NEW.total_sgxp > 0 AND NEW.earned_sgxp >= NEW.total_sgxp THEN 1 ELSE 0 END;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        PERFORM quest_stats_apply(NEW.session_id, NEW.quest_json, 1, new_done,
+                                  COALESCE(NEW.total_sgxp, 0), NEW.earned_sgxp, TRUE);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM quest_stats_apply(OLD.session_id, OLD.quest_json, -1, -old_done,
+                                  -COALESCE(OLD.total_sgxp, 0), -OLD.earned_sgxp, TRUE);
+    ELSIF OLD.session_id IS DISTINCT FROM NEW.session_id THEN
+        PERFORM quest_stats_apply(OLD.session_id, OLD.quest_json, -1, -old_done,
+                                  -COALESCE(OLD.total_sgxp, 0), -OLD.earned_sgxp, FALSE);
+        PERFORM quest_stats_apply(NEW.session_id, NEW.quest_json, 1, new_done,
+                                  COALESCE(NEW.total_sgxp, 0), NEW.earned_sgxp, FALSE);
+    ELSE
+        -- Progress change: only the SGXP and completion deltas move.
+        PERFORM quest_stats_apply(NEW.session_id, NEW.quest_json, 0, new_done - old_done,
+                                  COALESCE(NEW.total_sgxp, 0) - COALESCE(OLD.total_sgxp, 0),
+                                  NEW.earned_sgxp - OLD.earned_sgxp, FALSE);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS quests_stats_trigger ON quests;
+CREATE TRIGGER quests_stats_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF session_id, total_sgxp, earned_sgxp ON quests
+    FOR EACH ROW EXECUTE FUNCTION quest_stats_trigger();
+"""
+
+# One-off fill of the aggregate tables from the quests already stored.
+_AGGREGATES_BACKFILL = """
+INSERT INTO quest_session_stats (session_id, quest_count, completed_quests, total_sgxp, earned_sgxp)
+SELECT COALESCE(session_id, ''), COUNT(*),
+       COUNT(*) FILTER (WHERE total_sgxp > 0 AND earned_sgxp >= total_sgxp),
+       COALESCE(SUM(total_sgxp), 0), COALESCE(SUM(earned_sgxp), 0)
+FROM quests GROUP BY COALESCE(session_id, '');
+
+INSERT INTO quest_global_stats (id, sessions, quest_count, completed_quests, total_sgxp, earned_sgxp)
+SELECT 1, COUNT(DISTINCT COALESCE(session_id, '')), COUNT(*),
+       COUNT(*) FILTER (WHERE total_sgxp > 0 AND earned_sgxp >= total_sgxp),
+       COALESCE(SUM(total_sgxp), 0), COALESCE(SUM(earned_sgxp), 0)
+FROM quests;
+
+INSERT INTO quest_group_counts (dimension, value, quest_count)
+SELECT 'help_mode', COALESCE(quest_json->>'help_mode', 'supplies'), COUNT(*) FROM quests GROUP BY 2
+UNION ALL
+SELECT 'codename', COALESCE(quest_json->>'quest_name', ''), COUNT(*) FROM quests GROUP BY 2;
+"""
+
+
+def _init_aggregates(cur):
+    # Serialise concurrent workers running init_schema at boot (re-entrant
+    # when init_schema already holds it).
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('quest_stats_init'))")
+    cur.execute(_AGGREGATES_DDL)
+    cur.execute("SELECT 1 FROM quest_global_stats WHERE id = 1")
+    if cur.fetchone() is None:
+        # Block writers so no insert lands between the trigger and the scan.
+        cur.execute("LOCK TABLE quests IN SHARE MODE")
+        cur.execute(_AGGREGATES_BACKFILL)
+
+
+# ---------------------------------------------------------------------------
+# Monthly partitions
+# ---------------------------------------------------------------------------
+
+# "FOR VALUES FROM ('2026-10-01 00:00:00+00') TO ('2026-11-01 00:00:00+00')"
+_RANGE_BOUND = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+# Longest wait for the brief exclusive lock on quests that DETACH needs,
+# so a purge never queues API traffic behind a long-running query.
+_DETACH_LOCK_TIMEOUT = "5s"
+
+
+def _is_partitioned(cur):
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('quests')")
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def _parse_bound(text):
+    """One range bound rendered in UTC; None for MINVALUE / MAXVALUE."""
+    if text in ("MINVALUE", "MAXVALUE"):
+        return None
+    value = text.strip("'")
+    if re.search(r"[+-]\d\d$", value):
+        value += ":00"
+    return datetime.fromisoformat(value)
+
+
+def _partitions(cur):
+    """Attached partitions of quests with their bounds, oldest first."""
+    # Render bounds in UTC so they parse the same whatever the server zone.
+    cur.execute("SET LOCAL TimeZone = 'UTC'")
+    cur.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), GREATEST(c.reltuples, 0)::bigint
+        FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'quests'::regclass
+        """
+    )
+    partitions = []
+    for name, bound, rows in cur.fetchall():
+        match = _RANGE_BOUND.search(bound or "")
+        if match is None:
+            continue  # DEFAULT partition: never created or dropped here
+        partitions.append({
+            "name": name,
+            "start": _parse_bound(match.group(1)),
+            "end": _parse_bound(match.group(2)),
+            "rows": rows,
+        })
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+    return sorted(partitions, key=lambda p: p["start"] or epoch)
+
+
+def _ensure_partitions(cur, months=()):
+    """
+    Create any missing monthly partition for this month, the next
+    ``QUEST_PARTITIONS_AHEAD`` and ``months``; months already covered by a
+    partition (such as a converted legacy table) are left alone.
+    """
+    if not _is_partitioned(cur):
+        return []
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('quest_partitions'))")
+    current = month_start(datetime.now(timezone.utc))
+    wanted = {add_months(current, n) for n in range(QUEST_PARTITIONS_AHEAD + 1)}
+    wanted.update(month_start(month) for month in months)
+    existing = _partitions(cur)
+    created = []
+    for month in sorted(wanted):
+        end = add_months(month, 1)
+        if any((p["start"] is None or p["start"] < end) and (p["end"] is None or p["end"] > month) for p in existing):
+            continue
+        name = f"quests_p{month:%Y_%m}"
+        cur.execute(
+            sql.SQL("CREATE TABLE {} PARTITION OF quests FOR VALUES FROM (%s) TO (%s)").format(sql.Identifier(name)),
+            (month.isoformat(), end.isoformat()),
+        )
+        existing.append({"name": name, "start": month, "end": end})
+        created.append(name)
+    if created:
+        print(f"Created quest partitions: {', '.join(created)}")
+    return created
+
+
+def ensure_partitions(months=()):
+    """Create missing monthly partitions (see :func:`_ensure_partitions`)."""
+    with _connection() as conn, conn.cursor() as cur:
+        created = _ensure_partitions(cur, months)
+        conn.commit()
+        return created
+
+
+def list_partitions():
+    with _connection() as conn, conn.cursor() as cur:
+        partitions = _partitions(cur) if _is_partitioned(cur) else []
+        conn.commit()
+        return partitions
+
+
+def _write(write, months=lambda: ()):
+    """
+    Run ``write(cur)`` in one transaction and commit.  If a row has no
+    partition to go to (the clock passed the months created ahead, or an
+    import brings old quests), create the partitions for ``months()`` and
+    the months ahead, then run it once more.
+    """
+    try:
+        with _connection() as conn, conn.cursor() as cur:
+            result = write(cur)
+            conn.commit()
+            return result
+    except errors.CheckViolation as exc:
+        if "partition" not in str(exc):
+            raise
+        print(f"Creating missing quest partition: {exc}")
+    ensure_partitions(months())
+    with _connection() as conn, conn.cursor() as cur:
+        result = write(cur)
+        conn.commit()
+        return result
+
+
+def partition_existing_quests():
+    """
+    Turn an existing plain ``quests`` table into the partition for all rows
+    before the next month boundary (``quests_legacy``), under a new
+    partitioned ``quests`` that keeps its id sequence, indexes and trigger.
+
+    The expensive steps (the unique index on ``(id, created_at)`` and the
+    range check) run first without blocking writes; the swap itself holds an
+    exclusive lock only for catalog changes.  ``quests_legacy`` is dropped
+    by retention once its newest month expires, and emptied in chunks
+    before that.
+    """
+    conn = get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            if _is_partitioned(cur):
+                return []
+            # A day of headroom, so rows written during the migration still
+            # fall before the legacy partition's upper bound.
+            bound = add_months(month_start(datetime.now(timezone.utc) + timedelta(days=1)), 1)
+            cur.execute("UPDATE quests SET created_at = NOW() WHERE created_at IS NULL")
+            # The partition must have every column of the new parent.
+            cur.execute(quest_dedup.POSTGRES_DDL)
+            # ATTACH PARTITION only reuses an index backed by a constraint for
+            # the parent's primary key; a bare unique index would be rebuilt
+            # under the exclusive lock below.
+            cur.execute(
+                "SELECT 1 FROM pg_constraint WHERE conrelid = 'quests'::regclass AND conname = 'quests_legacy_id_created_key'"
+            )
+            if cur.fetchone() is None:
+                cur.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS quests_legacy_id_created_idx ON quests (id, created_at)")
+                cur.execute(
+                    "ALTER TABLE quests ADD CONSTRAINT quests_legacy_id_created_key UNIQUE USING INDEX quests_legacy_id_created_idx"
+                )
+            cur.execute("ALTER TABLE quests DROP CONSTRAINT IF EXISTS quests_legacy_range")
+            cur.execute(
+                "ALTER TABLE quests ADD CONSTRAINT quests_legacy_range "
+                "CHECK (created_at IS NOT NULL AND created_at < %s) NOT VALID",
+                (bound.isoformat(),),
+            )
+            cur.execute("ALTER TABLE quests VALIDATE CONSTRAINT quests_legacy_range")
+        conn.autocommit = False
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE quests IN ACCESS EXCLUSIVE MODE")
+            # Both are catalog-only thanks to the validated check constraint.
+            cur.execute("ALTER TABLE quests ALTER COLUMN created_at SET NOT NULL")
+            cur.execute("SELECT pg_get_serial_sequence('quests', 'id')")
+            sequence = cur.fetchone()[0]
+            cur.execute("ALTER TABLE quests RENAME TO quests_legacy")
+            cur.execute("ALTER INDEX IF EXISTS quests_pkey RENAME TO quests_legacy_pkey")
+            cur.execute("ALTER INDEX IF EXISTS quests_session_created_id_idx RENAME TO quests_legacy_session_created_id_idx")
+            cur.execute("DROP TRIGGER IF EXISTS quests_stats_trigger ON quests_legacy")
+            cur.execute(_PARTITIONED_QUESTS_DDL.format(id_column="INTEGER NOT NULL DEFAULT nextval(%s::regclass)"), (sequence,))
+            cur.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY quests.id").format(sql.SQL(sequence)))
+            cur.execute(
+                "ALTER TABLE quests ATTACH PARTITION quests_legacy FOR VALUES FROM (MINVALUE) TO (%s)",
+                (bound.isoformat(),),
+            )
+            cur.execute("CREATE INDEX quests_session_created_id_idx ON quests (session_id, created_at DESC, id DESC)")
+            cur.execute(_AGGREGATES_DDL)
+            created = _ensure_partitions(cur)
+        conn.commit()
+        print(f"Partitioned quests: quests_legacy holds rows before {bound:%Y-%m-%d}")
+        return created
+    finally:
+        conn.close()
+
+
+# Aggregates as they stand minus one retired partition's rows: per session
+# first, then the totals, in the same lock order as the row trigger.
+_RETIRE_SESSION_STATS = """
+WITH removed AS (
+    SELECT COALESCE(session_id, '') AS session_id, COUNT(*) AS quest_count,
+           COUNT(*) FILTER (WHERE total_sgxp > 0 AND earned_sgxp >= total_sgxp) AS completed_quests,
+           COALESCE(SUM(total_sgxp), 0) AS total_sgxp, COALESCE(SUM(earned_sgxp), 0) AS earned_sgxp
+    FROM {table} GROUP BY 1
+), updated AS (
+    UPDATE quest_session_stats AS s SET
+        quest_count = s.quest_count - r.quest_count,
+        completed_quests = s.completed_quests - r.completed_quests,
+        total_sgxp = s.total_sgxp - r.total_sgxp,
+        earned_sgxp = s.earned_sgxp - r.earned_sgxp
+    FROM removed AS r
+    WHERE s.session_id = r.session_id
+    RETURNING s.quest_count AS remaining, r.quest_count AS removed
+)
+SELECT (SELECT COUNT(*) FROM updated WHERE remaining <= 0 AND remaining + removed > 0),
+       COALESCE(SUM(quest_count), 0), COALESCE(SUM(completed_quests), 0),
+       COALESCE(SUM(total_sgxp), 0), COALESCE(SUM(earned_sgxp), 0)
+FROM removed
+"""
+
+_RETIRE_GROUP_COUNTS = """
+UPDATE quest_group_counts AS g SET quest_count = g.quest_count - r.quest_count
+FROM (
+    SELECT 'help_mode' AS dimension, COALESCE(quest_json->>'help_mode', 'supplies') AS value, COUNT(*) AS quest_count
+    FROM {table} GROUP BY 2
+    UNION ALL
+    SELECT 'codename', COALESCE(quest_json->>'quest_name', ''), COUNT(*) FROM {table} GROUP BY 2
+) AS r
+WHERE g.dimension = r.dimension AND g.value = r.value
+"""
+
+
+def _detach_partition(name):
+    # Recorded in the same transaction, so a crash after this commit leaves
+    # the partition to _drop_retired_partition on the next purge.
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(f"SET LOCAL lock_timeout = '{_DETACH_LOCK_TIMEOUT}'")
+        cur.execute("INSERT INTO quest_retired_partitions (name) VALUES (%s) ON CONFLICT DO NOTHING", (name,))
+        cur.execute(sql.SQL("ALTER TABLE quests DETACH PARTITION {}").format(sql.Identifier(name)))
+        conn.commit()
+
+
+def _drop_retired_partition(name):
+    """Take a detached partition's rows out of the aggregates, then drop it."""
+    table = sql.Identifier(name)
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+        if cur.fetchone()[0]:
+            cur.execute(sql.SQL(_RETIRE_SESSION_STATS).format(table=table))
+            emptied_sessions, quests, completed, total, earned = cur.fetchone()
+            cur.execute(
+                """
+                UPDATE quest_global_stats SET
+                    sessions = sessions - %s,
+                    quest_count = quest_count - %s,
+                    completed_quests = completed_quests - %s,
+                    total_sgxp = total_sgxp - %s,
+                    earned_sgxp = earned_sgxp - %s
+                WHERE id = 1
+                """,
+                (emptied_sessions, quests, completed, total, earned),
+            )
+            cur.execute(sql.SQL(_RETIRE_GROUP_COUNTS).format(table=table))
+            cur.execute(sql.SQL("DROP TABLE {}").format(table))
+        cur.execute("DELETE FROM quest_retired_partitions WHERE name = %s", (name,))
+        conn.commit()
+
+
+def purge_expired_quests(cutoff, chunk_size=1000):
+    """
+    Drop every partition that ends on or before ``cutoff`` and delete, in
+    chunks, any other quest created before it (all of them when quests is
+    not partitioned).
+
+    Each partition is detached in its own short transaction, then its rows
+    are subtracted from the aggregates and the table dropped: no per-row
+    deletes, no dead tuples left behind for vacuum.
+
+    :returns: ``{"partitions_dropped", "rows_deleted"}``
+    """
+    with _connection() as conn, conn.cursor() as cur:
+        _ensure_partitions(cur)
+        expired = [p["name"] for p in _partitions(cur) if p["end"] is not None and p["end"] <= cutoff] \
+            if _is_partitioned(cur) else []
+        cur.execute("SELECT name FROM quest_retired_partitions ORDER BY detached_at")
+        leftovers = [row[0] for row in cur.fetchall()]
+        conn.commit()
+    dropped = []
+    for name in leftovers:
+        _drop_retired_partition(name)
+        dropped.append(name)
+    for name in expired:
+        _detach_partition(name)
+        _drop_retired_partition(name)
+        dropped.append(name)
+    if dropped:
+        print(f"Dropped expired quest partitions: {', '.join(dropped)}")
+    rows = _delete_in_chunks("created_at < %s", (cutoff,), chunk_size, order_by_id=True)
+    return {"partitions_dropped": dropped, "rows_deleted": rows}
+
+
+def _store_bodies(cur, stored):
+    """Write the shared bodies ``stored`` refers to; returns their hashes."""
+    bodies = quest_dedup.new_bodies(os.getenv("DATABASE_URL", ""), stored)
+    if bodies:
+        execute_values(
+            cur,
+            "INSERT INTO quest_bodies (hash, body) VALUES %s ON CONFLICT (hash) DO NOTHING",
+            list(bodies.items()),
+        )
+    return bodies.keys()
+
+
+def _write_deduplicated(write, stored, months=lambda: ()):
+    """:func:`_write` that first stores the bodies of ``stored`` quests."""
+    written = []
+
+    def write_all(cur):
+        written[:] = _store_bodies(cur, stored)
+        return write(cur)
+
+    result = _write(write_all, months)
+    quest_dedup.remember(os.getenv("DATABASE_URL", ""), written)
+    return result
+
+
+def insert_quest(session_id, quest_payload):
+    stored = quest_dedup.split_quest(quest_payload)
+
+    def write(cur):
+        cur.execute(
+            """
+            INSERT INTO quests (session_id, quest_json, body_hash, body_mission, total_sgxp)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING id, created_at;
+            """,
+            (session_id, Json(stored.quest_json), stored.body_hash, stored.body_mission,
+             sum(step_rewards(quest_payload).values())),
+        )
+        row = cur.fetchone()
+        return {"id": row[0], "created_at": row[1]}
+
+    return _write_deduplicated(write, [stored])
+
+
+def insert_quests(session_id, quest_payloads):
+    """
+    Insert several quests for one session with a single multi-row INSERT.
+
+    :returns: ``[{"id", "created_at"}, ...]`` in the order of
+        ``quest_payloads``.
+    """
+    if not quest_payloads:
+        return []
+    stored = [quest_dedup.split_quest(payload) for payload in quest_payloads]
+    rows = [
+        (session_id, Json(row.quest_json), row.body_hash, row.body_mission, sum(step_rewards(payload).values()))
+        for payload, row in zip(quest_payloads, stored)
+    ]
+
+    def write(cur):
+        returned = execute_values(
+            cur,
+            """
+            INSERT INTO quests (session_id, quest_json, body_hash, body_mission, total_sgxp)
+            VALUES %s
+            RETURNING id, created_at;
+            """,
+            rows,
+            page_size=len(rows),
+            fetch=True,
+        )
+        return [{"id": row[0], "created_at": row[1]} for row in returned]
+
+    return _write_deduplicated(write, stored)
+
+
+def reserve_quest_ids(count):
+    """Take ``count`` ids from the quests sequence for rows written later."""
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT nextval(pg_get_serial_sequence('quests', 'id')) FROM generate_series(1, %s)", (count,))
+        ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        return ids
+
+
+# The whole quest document, read in place of quest_json (see quest_dedup).
+_QUEST_DOCUMENT = "quest_document(quest_json, body_hash, body_mission)"
+
+# Metadata columns merged into the quest document by _flatten_row.
+_QUEST_COLUMNS = "id, session_id, created_at, completed_step_ids, earned_sgxp, total_sgxp"
+
+
+def _flatten_row(row):
+    """Merge DB metadata into the stored quest JSON for one result row."""
+    quest_data = dict(row['quest_json']) if row.get('quest_json') else {}
+    quest_data.update({
+        'id': row['id'],
+        'session_id': row['session_id'],
+        'created_at': row['created_at'].isoformat() if hasattr(row['created_at'], 'isoformat') else row['created_at'],
+        'completed_step_ids': list(row.get('completed_step_ids') or []),
+        'earned_sgxp': row.get('earned_sgxp') or 0,
+        'total_sgxp': row.get('total_sgxp') or 0,
+    })
+    return quest_data
+
+
+def list_quests_page(session_id, limit=20, cursor=None):
+    """
+    Retrieve one page of a session's quests, newest first, using keyset
+    pagination on ``(created_at, id)``.
+
+    Each page is a single index range scan on
+    ``quests_session_created_id_idx``, so the cost per page stays constant
+    no matter how deep into the Suit Log the client has scrolled.
+
+    :param session_id: The user's session identifier (stored in cookie).
+    :param limit: Maximum number of quests to return.
+    :param cursor: Opaque cursor returned by a previous call, or None for
+        the first page.
+    :returns: ``(quests, next_cursor)`` where ``next_cursor`` is None once
+        the last page has been reached.
+    :raises ValueError: if ``cursor`` is malformed.
+    """
+    rows = _fetch_page(
+        f"{_QUEST_COLUMNS}, {_QUEST_DOCUMENT} AS quest_json",
+        session_id, limit, cursor, RealDictCursor,
+    )
+    next_cursor = _next_cursor(rows, limit, lambda row: (row['created_at'], row['id']))
+    return [_flatten_row(row) for row in rows[:limit]], next_cursor
+
+
+# Flattened quest built inside Postgres and returned as JSON text, so the
+# passthrough helpers never decode quest_json into Python dicts.
+_FLAT_QUEST_JSON = (
+    f"(COALESCE({_QUEST_DOCUMENT}, '{{}}'::jsonb) || jsonb_build_object("
+    "'id', id, 'session_id', session_id, 'created_at', created_at, "
+    "'completed_step_ids', completed_step_ids, 'earned_sgxp', earned_sgxp, "
+    "'total_sgxp', COALESCE(total_sgxp, 0)))::text"
+)
+
+
+def list_quests_page_json(session_id, limit=20, cursor=None):
+    """
+    Passthrough variant of :func:`list_quests_page` for the API layer.
+
+    Postgres merges the metadata into ``quest_json`` and renders each row as
+    JSON text; the rows are joined into a JSON array string that can be
+    written to the response as-is.
+
+    :returns: ``(json_array_text, next_cursor)``
+    :raises ValueError: if ``cursor`` is malformed.
+    """
+    rows = _fetch_page(f"id, created_at, {_FLAT_QUEST_JSON}", session_id, limit, cursor)
+    next_cursor = _next_cursor(rows, limit, lambda row: (row[1], row[0]))
+    return "[" + ",".join(row[2] for row in rows[:limit]) + "]", next_cursor
+
+
+def _fetch_page(columns, session_id, limit, cursor, cursor_factory=None):
+    """Run the keyset page query; returns up to ``limit + 1`` rows."""
+    params = [session_id]
+    keyset = ""
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        keyset = "AND (created_at, id) < (%s, %s)"
+        params.extend([after_created_at, after_id])
+    # Fetch one extra row to learn whether another page exists.
+    params.append(limit + 1)
+
+    with _connection() as conn, conn.cursor(cursor_factory=cursor_factory) as cur:
+        cur.execute(
+            f"""
+            SELECT {columns}
+            FROM quests
+            WHERE session_id = %s {keyset}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s;
+            """,
+            params,
+        )
+        return cur.fetchall()
+
+
+def _next_cursor(rows, limit, position):
+    if len(rows) <= limit:
+        return None
+    created_at, quest_id = position(rows[limit - 1])
+    return encode_cursor(created_at, quest_id)
+
+
+def get_quest_by_id(quest_id):
+    """Retrieve a single quest by its ID."""
+    with _connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            f"""
+            SELECT {_QUEST_COLUMNS}, {_QUEST_DOCUMENT} AS quest_json
+            FROM quests
+            WHERE id = %s
+            """,
+            (quest_id,)
+        )
+        row = cur.fetchone()
+        if row:
+            return _flatten_row(row)
+        return None
+
+
+def get_quest_progress(quest_id):
+    """
+    Load what progress tracking needs for one quest.
+
+    :returns: ``{"session_id", "rewards", "completed_step_ids"}`` (rewards as
+        from :func:`step_rewards`), or None if the quest does not exist.
+    """
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT session_id, {_QUEST_DOCUMENT}->'steps', completed_step_ids
+            FROM quests
+            WHERE id = %s
+            """,
+            (quest_id,)
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return {
+            "session_id": row[0],
+            "rewards": step_rewards({"steps": row[1]}),
+            "completed_step_ids": list(row[2] or []),
+        }
+
+
+def apply_step_progress(changes):
+    """
+    Apply a batch of coalesced step toggles in one transaction.
+
+    :param changes: ``{quest_id: {step_id: completed_bool}}``.  Toggles are
+        applied on top of the stored ``completed_step_ids`` (rows are locked
+        while doing so), so batches flushed by different workers compose.
+        ``earned_sgxp`` is recomputed for every touched quest.
+    :returns: The number of quests updated.
+    """
+    if not changes:
+        return 0
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT id, {_QUEST_DOCUMENT}->'steps', completed_step_ids
+            FROM quests
+            WHERE id = ANY(%s)
+            ORDER BY id
+            FOR UPDATE
+            """,
+            (list(changes),)
+        )
+        updates = []
+        for quest_id, steps, completed_step_ids in cur.fetchall():
+            rewards = step_rewards({"steps": steps})
+            completed = set(completed_step_ids or [])
+            for step_id, done in changes[quest_id].items():
+                if done:
+                    completed.add(step_id)
+                else:
+                    completed.discard(step_id)
+            completed &= rewards.keys()
+            earned = sum(rewards[step_id] for step_id in completed)
+            updates.append((quest_id, sorted(completed), earned))
+        if updates:
+            execute_values(
+                cur,
+                """
+                UPDATE quests AS q
+                SET completed_step_ids = v.completed_step_ids, earned_sgxp = v.earned_sgxp
+                FROM (VALUES %s) AS v (id, completed_step_ids, earned_sgxp)
+                WHERE q.id = v.id
+                """,
+                updates,
+                template="(%s, %s::integer[], %s)",
+            )
+        conn.commit()
+        return len(updates)
+
+
+def get_quest_json_by_id(quest_id):
+    """Passthrough variant of :func:`get_quest_by_id`; returns JSON text or None."""
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT {_FLAT_QUEST_JSON}
+            FROM quests
+            WHERE id = %s
+            """,
+            (quest_id,)
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+# One quest as a self-contained export record, rendered to text by Postgres.
+_EXPORT_RECORD = (
+    "jsonb_build_object('id', id, 'session_id', session_id, 'created_at', created_at, "
+    f"'quest', {_QUEST_DOCUMENT}, 'completed_step_ids', completed_step_ids, "
+    "'earned_sgxp', earned_sgxp, 'total_sgxp', total_sgxp)::text"
+)
+
+
+def iter_quest_export(session_id=None, after_id=0, batch_size=1000):
+    """
+    Yield every quest (or one session's quests) as JSON text, in id order.
+
+    Rows are read through a server-side (named) cursor, ``batch_size`` at a
+    time, so memory stays flat however many rows are exported.  A pooled
+    connection is held until the generator is exhausted or closed.
+
+    :param after_id: Only export quests with a larger id (resume point).
+    """
+    params = [after_id]
+    session_filter = ""
+    if session_id is not None:
+        session_filter = "AND session_id = %s"
+        params.append(session_id)
+    with _connection() as conn, conn.cursor(name="quest_export") as cur:
+        cur.itersize = batch_size
+        cur.execute(
+            f"""
+            SELECT {_EXPORT_RECORD}
+            FROM quests
+            WHERE id > %s {session_filter}
+            ORDER BY id
+            """,
+            params,
+        )
+        for (record,) in cur:
+            yield record
+    # Leaving the block returns the connection; the pool rolls back the
+    # read-only transaction the named cursor needed.
+
+
+_IMPORT_COLUMNS = (
+    "session_id, created_at, quest_json, body_hash, body_mission, completed_step_ids, earned_sgxp, total_sgxp"
+)
+_IMPORT_TEMPLATE = "%s, COALESCE(%s::timestamptz, NOW()), %s, %s, %s, %s::integer[], %s, %s"
+
+
+def import_quests(records):
+    """
+    Bulk insert quest records in one transaction using multi-row INSERTs.
+
+    :param records: dicts with ``session_id``, ``created_at`` (or None),
+        ``quest``, ``completed_step_ids``, ``earned_sgxp``, ``total_sgxp`` and
+        optionally ``id``.  Records that keep their ``id`` are skipped if that
+        id already exists, so re-importing the same file is harmless.
+    :returns: The number of rows actually inserted.
+    """
+    stored = [quest_dedup.split_quest(r["quest"]) for r in records]
+    with_id = [
+        (r["id"], r["session_id"], r["created_at"], Json(s.quest_json), s.body_hash, s.body_mission,
+         r["completed_step_ids"], r["earned_sgxp"], r["total_sgxp"])
+        for r, s in zip(records, stored) if r.get("id") is not None
+    ]
+    without_id = [
+        (r["session_id"], r["created_at"], Json(s.quest_json), s.body_hash, s.body_mission,
+         r["completed_step_ids"], r["earned_sgxp"], r["total_sgxp"])
+        for r, s in zip(records, stored) if r.get("id") is None
+    ]
+
+    def write(cur):
+        inserted = 0
+        rows = with_id
+        if rows:
+            # The primary key is (id, created_at) once quests is partitioned,
+            # so skip ids that already exist explicitly.
+            cur.execute("SELECT id FROM quests WHERE id = ANY(%s)", ([row[0] for row in rows],))
+            existing = {row[0] for row in cur.fetchall()}
+            rows = [row for row in rows if row[0] not in existing]
+        if rows:
+            inserted += len(execute_values(
+                cur,
+                f"INSERT INTO quests (id, {_IMPORT_COLUMNS}) VALUES %s ON CONFLICT DO NOTHING RETURNING id",
+                rows,
+                template=f"(%s, {_IMPORT_TEMPLATE})",
+                page_size=len(rows),
+                fetch=True,
+            ))
+            # Keep the id sequence ahead of the ids we just wrote, never
+            # moving it back over ids already handed out (reserve_quest_ids).
+            cur.execute(
+                """
+                SELECT setval(seq, GREATEST((SELECT MAX(id) FROM quests),
+                                            pg_sequence_last_value(seq::regclass), 1))
+                FROM pg_get_serial_sequence('quests', 'id') AS seq
+                """
+            )
+        if without_id:
+            inserted += len(execute_values(
+                cur,
+                f"INSERT INTO quests ({_IMPORT_COLUMNS}) VALUES %s RETURNING id",
+                without_id,
+                template=f"({_IMPORT_TEMPLATE})",
+                page_size=len(without_id),
+                fetch=True,
+            ))
+        return inserted
+
+    return _write_deduplicated(write, stored, months=lambda: _record_months(records))
+
+
+def _record_months(records):
+    """Months of the explicit ``created_at`` values in import records."""
+    months = set()
+    for record in records:
+        created_at = record.get("created_at")
+        if isinstance(created_at, str):
+            try:
+                created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+            except ValueError:
+                continue
+        if isinstance(created_at, datetime):
+            months.add(month_start(created_at))
+    return months
+
+
+_STATS_FIELDS = ("quest_count", "completed_quests", "total_sgxp", "earned_sgxp")
+
+
+def get_session_stats(session_id):
+    """SGXP totals and quest counts for one session (zeros if it has none)."""
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT quest_count, completed_quests, total_sgxp, earned_sgxp
+            FROM quest_session_stats
+            WHERE session_id = %s
+            """,
+            (session_id,)
+        )
+        row = cur.fetchone() or (0, 0, 0, 0)
+        return dict(zip(_STATS_FIELDS, (int(value) for value in row)))
+
+
+def get_global_stats(top_n=10):
+    """
+    Totals across all sessions plus quest counts by help mode and the
+    ``top_n`` most common codenames.
+    """
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT quest_count, completed_quests, total_sgxp, earned_sgxp, sessions
+            FROM quest_global_stats
+            WHERE id = 1
+            """
+        )
+        row = cur.fetchone() or (0, 0, 0, 0, 0)
+        stats = dict(zip(_STATS_FIELDS, (int(value) for value in row[:4])))
+        stats["sessions"] = int(row[4])
+        cur.execute(
+            """
+            SELECT value, quest_count FROM quest_group_counts
+            WHERE dimension = 'help_mode' AND quest_count > 0
+            ORDER BY quest_count DESC
+            """
+        )
+        stats["help_modes"] = {value: int(count) for value, count in cur.fetchall()}
+        cur.execute(
+            """
+            SELECT value, quest_count FROM quest_group_counts
+            WHERE dimension = 'codename' AND quest_count > 0
+            ORDER BY quest_count DESC
+            LIMIT %s
+            """,
+            (top_n,)
+        )
+        stats["top_codenames"] = [{"codename": value, "quest_count": int(count)} for value, count in cur.fetchall()]
+        return stats
+
+
+def get_leaderboard(limit=10):
+    """Top sessions by earned SGXP, read from the leaderboard index."""
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT session_id, quest_count, completed_quests, total_sgxp, earned_sgxp
+            FROM quest_session_stats
+            WHERE quest_count > 0
+            ORDER BY earned_sgxp DESC, session_id
+            LIMIT %s
+            """,
+            (limit,)
+        )
+        return [
+            dict(zip(("session_id",) + _STATS_FIELDS, (row[0],) + tuple(int(value) for value in row[1:])))
+            for row in cur.fetchall()
+        ]
+
+
+def _delete_in_chunks(condition, params, chunk_size, order_by_id=False):
+    """
+    ``DELETE FROM quests WHERE condition``, at most ``chunk_size`` rows per
+    transaction.  Repeating the condition outside the id list lets each
+    chunk use the same index (or partition pruning) as the lookup.
+    """
+    order = "ORDER BY id" if order_by_id else ""
+    deleted = 0
+    while True:
+        with _connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                DELETE FROM quests
+                WHERE {condition}
+                  AND id IN (SELECT id FROM quests WHERE {condition} {order} LIMIT %s)
+                """,
+                params + params + (chunk_size,),
+            )
+            count = cur.rowcount
+            conn.commit()
+        deleted += count
+        if count < chunk_size:
+            return deleted
+
+
+def delete_quest(session_id, quest_id):
+    """Delete a single quest for this session/client.
+
+    Returns True if a row was deleted, False otherwise.
+    """
+    with _connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM quests
+            WHERE id = %s AND session_id = %s;
+            """,
+            (quest_id, session_id),
+        )
+        deleted = cur.rowcount
+        conn.commit()
+        return deleted > 0
+
+
+def delete_all_quests(session_id, chunk_size=1000):
+    """Delete all quests for this session/client, ``chunk_size`` per transaction.
+
+    Returns the number of rows deleted.
+    """
+    return _delete_in_chunks("session_id = %s", (session_id,), chunk_size)
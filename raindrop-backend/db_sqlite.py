@@ -0,0 +1,675 @@
+"""
+Embedded SQLite storage backend for ``db`` (used when ``DATABASE_URL`` is
+not set, or with ``DB_BACKEND=sqlite``).
+
+Gives single-node and offline deployments real persistence with no server
+to run:
+
+- one connection per thread (and per process after a fork), opened lazily
+  and kept for the life of the thread; Python's per-connection prepared
+  statement cache (``SQLITE_STATEMENT_CACHE`` entries) means the fixed SQL
+  below is compiled once per connection, not per call;
+- WAL journaling with ``synchronous=NORMAL``, so readers never block the
+  writer and commits do not wait for a full fsync;
+- writes take the write lock up front (``BEGIN IMMEDIATE``) and wait up to
+  ``SQLITE_BUSY_TIMEOUT`` seconds for it instead of failing mid-transaction;
+- the same keyset index as Postgres on ``(session_id, created_at, id)``;
+  quests are stored as JSON text and JSON1 (``json_extract``,
+  ``json_patch``, ``json_object``) does the work JSONB does in Postgres,
+  including the triggers that keep the SGXP aggregates current.
+
+``created_at`` is stored as fixed-width UTC ISO-8601 text, so string order
+is time order.  SQLite has no partitioning: retention and bulk deletes
+remove rows in chunks of ``QUEST_DELETE_CHUNK_SIZE``, each in its own short
+write transaction so other writers get the lock in between.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import quest_dedup
+from db import SCHEMA_VERSION, decode_cursor, encode_cursor, step_rewards
+
+SQLITE_PATH = os.getenv(
+    "SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "citizen_hero.sqlite3"),
+)
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+
+_local = threading.local()
+
+
+def _path():
+    # Read per call so tests (and tools) can point at another file.
+    return os.getenv("SQLITE_PATH", SQLITE_PATH)
+
+
+def _open(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT,
+        isolation_level=None,  # explicit BEGIN/COMMIT below
+        cached_statements=SQLITE_STATEMENT_CACHE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _connection():
+    """This thread's connection to the configured database file."""
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        # Never reuse a connection inherited across fork.
+        _local.pid = pid
+        _local.connections = {}
+    path = _path()
+    conn = _local.connections.get(path)
+    if conn is None:
+        conn = _local.connections[path] = _open(path)
+    return conn
+
+
+@contextmanager
+def _transaction():
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def pool_stats():
+    """SQLite has no connection pool to report on."""
+    return None
+
+
+def _format_ts(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _parse_ts(value):
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS quests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT,
+        created_at TEXT NOT NULL,
+        quest_json TEXT CHECK (quest_json IS NULL OR json_valid(quest_json)),
+        completed_step_ids TEXT NOT NULL DEFAULT '[]',
+        earned_sgxp INTEGER NOT NULL DEFAULT 0,
+        total_sgxp INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS quests_session_created_id_idx
+    ON quests (session_id, created_at DESC, id DESC)
+    """,
+    # Shared quest bodies (quest_dedup), referenced by quests.body_hash.
+    """
+    CREATE TABLE IF NOT EXISTS quest_bodies (
+        hash TEXT PRIMARY KEY,
+        body TEXT NOT NULL CHECK (json_valid(body))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS quest_session_stats (
+        session_id TEXT PRIMARY KEY,
+        quest_count INTEGER NOT NULL DEFAULT 0,
+        completed_quests INTEGER NOT NULL DEFAULT 0,
+        total_sgxp INTEGER NOT NULL DEFAULT 0,
+        earned_sgxp INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS quest_session_stats_leaderboard_idx
+    ON quest_session_stats (earned_sgxp DESC, session_id)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS quest_global_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        sessions INTEGER NOT NULL DEFAULT 0,
+        quest_count INTEGER NOT NULL DEFAULT 0,
+        completed_quests INTEGER NOT NULL DEFAULT 0,
+        total_sgxp INTEGER NOT NULL DEFAULT 0,
+        earned_sgxp INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS quest_group_counts (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        quest_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, value)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS quest_group_counts_top_idx
+    ON quest_group_counts (dimension, quest_count DESC)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quests_stats_insert AFTER INSERT ON quests
+    BEGIN
+        INSERT INTO quest_session_stats (session_id, quest_count, completed_quests, total_sgxp, earned_sgxp)
+        VALUES (COALESCE(NEW.session_id, ''), 1,
+                NEW.total_sgxp > 0 AND NEW.earned_sgxp >= NEW.total_sgxp,
+                NEW.total_sgxp, NEW.earned_sgxp)
+        ON CONFLICT (session_id) DO UPDATE SET
+            quest_count = quest_count + excluded.quest_count,
+            completed_quests = completed_quests + excluded.completed_quests,
+            total_sgxp = total_sgxp + excluded.total_sgxp,
+            earned_sgxp = earned_sgxp + excluded.earned_sgxp;
+        UPDATE quest_global_stats SET
+            sessions = sessions + (SELECT quest_count = 1 FROM quest_session_stats
+                                   WHERE session_id = COALESCE(NEW.session_id, '')),
+            quest_count = quest_count + 1,
+            completed_quests = completed_quests + (NEW.total_sgxp > 0 AND NEW.earned_sgxp >= NEW.total_sgxp),
+            total_sgxp = total_sgxp + NEW.total_sgxp,
+            earned_sgxp = earned_sgxp + NEW.earned_sgxp
+        WHERE id = 1;
+        INSERT INTO quest_group_counts (dimension, value, quest_count)
+        VALUES ('help_mode', CAST(COALESCE(json_extract(NEW.quest_json, '$.help_mode'), 'supplies') AS TEXT), 1),
+               ('codename', CAST(COALESCE(json_extract(NEW.quest_json, '$.quest_name'), '') AS TEXT), 1)
+        ON CONFLICT (dimension, value) DO UPDATE SET quest_count = quest_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quests_stats_delete AFTER DELETE ON quests
+    BEGIN
+        UPDATE quest_session_stats SET
+            quest_count = quest_count - 1,
+            completed_quests = completed_quests - (OLD.total_sgxp > 0 AND OLD.earned_sgxp >= OLD.total_sgxp),
+            total_sgxp = total_sgxp - OLD.total_sgxp,
+            earned_sgxp = earned_sgxp - OLD.earned_sgxp
+        WHERE session_id = COALESCE(OLD.session_id, '');
+        UPDATE quest_global_stats SET
+            sessions = sessions - (SELECT quest_count = 0 FROM quest_session_stats
+                                   WHERE session_id = COALESCE(OLD.session_id, '')),
+            quest_count = quest_count - 1,
+            completed_quests = completed_quests - (OLD.total_sgxp > 0 AND OLD.earned_sgxp >= OLD.total_sgxp),
+            total_sgxp = total_sgxp - OLD.total_sgxp,
+            earned_sgxp = earned_sgxp - OLD.earned_sgxp
+        WHERE id = 1;
+        UPDATE quest_group_counts SET quest_count = quest_count - 1
+        WHERE dimension = 'help_mode'
+          AND value = CAST(COALESCE(json_extract(OLD.quest_json, '$.help_mode'), 'supplies') AS TEXT);
+        UPDATE quest_group_counts SET quest_count = quest_count - 1
+        WHERE dimension = 'codename'
+          AND value = CAST(COALESCE(json_extract(OLD.quest_json, '$.quest_name'), '') AS TEXT);
+    END
+    """,
+    # Progress changes only move the SGXP and completion totals (the app
+    # never moves a quest to another session).
+    """
+    CREATE TRIGGER IF NOT EXISTS quests_stats_progress AFTER UPDATE OF earned_sgxp, total_sgxp ON quests
+    BEGIN
+        UPDATE quest_session_stats SET
+            completed_quests = completed_quests
+                - (OLD.total_sgxp > 0 AND OLD.earned_sgxp >= OLD.total_sgxp)
+                + (NEW.total_sgxp > 0 AND NEW.earned_sgxp >= NEW.total_sgxp),
+            total_sgxp = total_sgxp - OLD.total_sgxp + NEW.total_sgxp,
+            earned_sgxp = earned_sgxp - OLD.earned_sgxp + NEW.earned_sgxp
+        WHERE session_id = COALESCE(NEW.session_id, '');
+        UPDATE quest_global_stats SET
+            completed_quests = completed_quests
+                - (OLD.total_sgxp > 0 AND OLD.earned_sgxp >= OLD.total_sgxp)
+                + (NEW.total_sgxp > 0 AND NEW.earned_sgxp >= NEW.total_sgxp),
+            total_sgxp = total_sgxp - OLD.total_sgxp + NEW.total_sgxp,
+            earned_sgxp = earned_sgxp - OLD.earned_sgxp + NEW.earned_sgxp
+        WHERE id = 1;
+    END
+    """,
+)
+
+# One-off fill of the aggregate tables from the quests already stored.
+_AGGREGATES_BACKFILL = (
+    """
+    INSERT INTO quest_session_stats (session_id, quest_count, completed_quests, total_sgxp, earned_sgxp)
+    SELECT COALESCE(session_id, ''), COUNT(*),
+           SUM(total_sgxp > 0 AND earned_sgxp >= total_sgxp), SUM(total_sgxp), SUM(earned_sgxp)
+    FROM quests GROUP BY COALESCE(session_id, '')
+    """,
+    """
+    INSERT INTO quest_global_stats (id, sessions, quest_count, completed_quests, total_sgxp, earned_sgxp)
+    SELECT 1, COUNT(DISTINCT COALESCE(session_id, '')), COUNT(*),
+           COALESCE(SUM(total_sgxp > 0 AND earned_sgxp >= total_sgxp), 0),
+           COALESCE(SUM(total_sgxp), 0), COALESCE(SUM(earned_sgxp), 0)
+    FROM quests
+    """,
+    """
+    INSERT INTO quest_group_counts (dimension, value, quest_count)
+    SELECT 'help_mode', CAST(COALESCE(json_extract(quest_json, '$.help_mode'), 'supplies') AS TEXT), COUNT(*)
+    FROM quests GROUP BY 2
+    UNION ALL
+    SELECT 'codename', CAST(COALESCE(json_extract(quest_json, '$.quest_name'), '') AS TEXT), COUNT(*)
+    FROM quests GROUP BY 2
+    """,
+)
+
+
+def init_schema():
+    with _transaction() as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(quests)")}
+        if columns and "session_id" not in columns:
+            # quests.db from the early prototype: keep its rows, out of the way.
+            print("Renaming legacy SQLite quests table to quests_legacy")
+            conn.execute("ALTER TABLE quests RENAME TO quests_legacy")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(quests)")}
+        for column in ("body_hash", "body_mission"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE quests ADD COLUMN {column} TEXT")
+        if conn.execute("SELECT 1 FROM quest_global_stats WHERE id = 1").fetchone() is None:
+            for statement in _AGGREGATES_BACKFILL:
+                conn.execute(statement)
+        # Last, so a stored version means everything above was applied.
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO schema_version (id, version, applied_at) VALUES (1, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET version = excluded.version, applied_at = excluded.applied_at
+            WHERE version < excluded.version
+            """,
+            (SCHEMA_VERSION, _format_ts(datetime.now(timezone.utc))),
+        )
+
+
+def get_schema_version():
+    conn = _connection()
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone() is None:
+        return None
+    row = conn.execute("SELECT version FROM schema_version WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+_INSERT_QUEST = """
+    INSERT INTO quests (session_id, created_at, quest_json, body_hash, body_mission, total_sgxp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _store_bodies(conn, stored):
+    """Write the shared bodies ``stored`` refers to; returns their hashes."""
+    bodies = quest_dedup.new_bodies(_path(), stored)
+    if bodies:
+        conn.executemany("INSERT INTO quest_bodies (hash, body) VALUES (?, ?) ON CONFLICT (hash) DO NOTHING",
+                         bodies.items())
+    return bodies.keys()
+
+
+def insert_quest(session_id, quest_payload):
+    return insert_quests(session_id, [quest_payload])[0]
+
+
+def insert_quests(session_id, quest_payloads):
+    inserted = []
+    stored = [quest_dedup.split_quest(payload) for payload in quest_payloads]
+    with _transaction() as conn:
+        written = _store_bodies(conn, stored)
+        for payload, row in zip(quest_payloads, stored):
+            created_at = datetime.now(timezone.utc)
+            cur = conn.execute(
+                _INSERT_QUEST,
+                (session_id, _format_ts(created_at), _dumps(row.quest_json), row.body_hash, row.body_mission,
+                 sum(step_rewards(payload).values())),
+            )
+            inserted.append({"id": cur.lastrowid, "created_at": created_at})
+    quest_dedup.remember(_path(), written)
+    return inserted
+
+
+def reserve_quest_ids(count):
+    # AUTOINCREMENT never hands out an id at or below sqlite_sequence.seq,
+    # so moving it forward reserves the ids in between.
+    with _transaction() as conn:
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'quests'").fetchone()
+        start = max(seq[0] if seq else 0, conn.execute("SELECT COALESCE(MAX(id), 0) FROM quests").fetchone()[0])
+        if seq is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('quests', ?)", (start + count,))
+        else:
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'quests'", (start + count,))
+    return list(range(start + 1, start + count + 1))
+
+
+def _completed_after(rewards, completed_json, step_changes):
+    completed = set(json.loads(completed_json or "[]"))
+    for step_id, done in step_changes.items():
+        if done:
+            completed.add(step_id)
+        else:
+            completed.discard(step_id)
+    completed &= rewards.keys()
+    return sorted(completed)
+
+
+def apply_step_progress(changes):
+    if not changes:
+        return 0
+    quest_ids = list(changes)
+    with _transaction() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT id, json_extract({_QUEST_DOCUMENT}, '$.steps'), completed_step_ids
+            FROM quests
+            WHERE id IN ({','.join('?' * len(quest_ids))})
+            """,
+            quest_ids,
+        ).fetchall()
+        updates = []
+        for quest_id, steps, completed_json in rows:
+            rewards = step_rewards({"steps": json.loads(steps) if steps else None})
+            completed = _completed_after(rewards, completed_json, changes[quest_id])
+            updates.append((_dumps(completed), sum(rewards[step_id] for step_id in completed), quest_id))
+        conn.executemany("UPDATE quests SET completed_step_ids = ?, earned_sgxp = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+_IMPORT_COLUMNS = (
+    "session_id, created_at, quest_json, body_hash, body_mission, completed_step_ids, earned_sgxp, total_sgxp"
+)
+
+
+def import_quests(records):
+    stored = {id(record): quest_dedup.split_quest(record["quest"]) for record in records}
+
+    def values(record):
+        created_at = record.get("created_at")
+        created_at = _parse_ts(created_at) if created_at else datetime.now(timezone.utc)
+        row = stored[id(record)]
+        return (
+            record["session_id"], _format_ts(created_at), _dumps(row.quest_json), row.body_hash, row.body_mission,
+            _dumps(list(record["completed_step_ids"])), record["earned_sgxp"], record["total_sgxp"],
+        )
+
+    with_id = [(r["id"],) + values(r) for r in records if r.get("id") is not None]
+    without_id = [values(r) for r in records if r.get("id") is None]
+    inserted = 0
+    with _transaction() as conn:
+        written = _store_bodies(conn, stored.values())
+        if with_id:
+            # AUTOINCREMENT keeps the id sequence ahead of explicit ids.
+            inserted += conn.executemany(
+                f"INSERT INTO quests (id, {_IMPORT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO NOTHING",
+                with_id,
+            ).rowcount
+        if without_id:
+            inserted += conn.executemany(
+                f"INSERT INTO quests ({_IMPORT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                without_id,
+            ).rowcount
+    quest_dedup.remember(_path(), written)
+    return inserted
+
+
+def delete_quest(session_id, quest_id):
+    with _transaction() as conn:
+        cur = conn.execute("DELETE FROM quests WHERE id = ? AND session_id = ?", (quest_id, session_id))
+        return cur.rowcount > 0
+
+
+def delete_all_quests(session_id, chunk_size=1000):
+    return _delete_in_chunks("session_id = ?", (session_id,), chunk_size)
+
+
+def _delete_in_chunks(condition, params, chunk_size, order_by_id=False):
+    order = "ORDER BY id" if order_by_id else ""
+    deleted = 0
+    while True:
+        with _transaction() as conn:
+            count = conn.execute(
+                f"DELETE FROM quests WHERE id IN (SELECT id FROM quests WHERE {condition} {order} LIMIT ?)",
+                params + (chunk_size,),
+            ).rowcount
+        deleted += count
+        if count < chunk_size:
+            return deleted
+
+
+# ---------------------------------------------------------------------------
+# Partitions and retention
+# ---------------------------------------------------------------------------
+
+def ensure_partitions(months=()):
+    return []
+
+
+def list_partitions():
+    return []
+
+
+def partition_existing_quests():
+    raise RuntimeError("Partitioning the quests table needs PostgreSQL")
+
+
+def purge_expired_quests(cutoff, chunk_size=1000):
+    # Walks the primary key from the oldest id, where expired rows are.
+    rows = _delete_in_chunks("created_at < ?", (_format_ts(cutoff),), chunk_size, order_by_id=True)
+    return {"partitions_dropped": [], "rows_deleted": rows}
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+# The whole quest document: quest_json, or for a deduplicated quest its
+# shared body with the mission idea put back and quest_json merged over it
+# (the SQL twin of quest_dedup.join_quest).
+_QUEST_DOCUMENT = (
+    "(CASE WHEN body_hash IS NULL THEN quest_json ELSE json_patch("
+    "replace((SELECT body FROM quest_bodies WHERE hash = body_hash), '" + quest_dedup.MISSION_TOKEN + "', "
+    "COALESCE(substr(json_quote(body_mission), 2, length(json_quote(body_mission)) - 2), '')), "
+    "COALESCE(quest_json, '{}')) END)"
+)
+
+# Metadata columns merged into the quest document by _flatten_row.
+_QUEST_COLUMNS = "id, session_id, created_at, completed_step_ids, earned_sgxp, total_sgxp"
+
+# Flattened quest rendered by JSON1, for the passthrough helpers.
+_FLAT_QUEST_JSON = (
+    f"json_patch(COALESCE({_QUEST_DOCUMENT}, '{{}}'), json_object("
+    "'id', id, 'session_id', session_id, 'created_at', created_at, "
+    "'completed_step_ids', json(completed_step_ids), 'earned_sgxp', earned_sgxp, "
+    "'total_sgxp', total_sgxp))"
+)
+
+
+def _flatten_row(row):
+    quest_id, session_id, created_at, completed, earned, total, quest_json = row
+    quest_data = json.loads(quest_json) if quest_json else {}
+    quest_data.update({
+        'id': quest_id,
+        'session_id': session_id,
+        'created_at': created_at,
+        'completed_step_ids': json.loads(completed),
+        'earned_sgxp': earned,
+        'total_sgxp': total,
+    })
+    return quest_data
+
+
+def _fetch_page(columns, session_id, limit, cursor):
+    """Run the keyset page query; returns up to ``limit + 1`` rows."""
+    params = [session_id]
+    keyset = ""
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        keyset = "AND (created_at, id) < (?, ?)"
+        params.extend([_format_ts(after_created_at), after_id])
+    # Fetch one extra row to learn whether another page exists.
+    params.append(limit + 1)
+    return _connection().execute(
+        f"""
+        SELECT {columns}
+        FROM quests
+        WHERE session_id = ? {keyset}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+        """,
+        params,
+    ).fetchall()
+
+
+def _next_cursor(rows, limit, created_at_index):
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(last[created_at_index], last[0])
+
+
+def list_quests_page(session_id, limit=20, cursor=None):
+    rows = _fetch_page(f"{_QUEST_COLUMNS}, {_QUEST_DOCUMENT}", session_id, limit, cursor)
+    return [_flatten_row(row) for row in rows[:limit]], _next_cursor(rows, limit, 2)
+
+
+def list_quests_page_json(session_id, limit=20, cursor=None):
+    rows = _fetch_page(f"id, created_at, {_FLAT_QUEST_JSON}", session_id, limit, cursor)
+    return "[" + ",".join(row[2] for row in rows[:limit]) + "]", _next_cursor(rows, limit, 1)
+
+
+def get_quest_by_id(quest_id):
+    row = _connection().execute(
+        f"SELECT {_QUEST_COLUMNS}, {_QUEST_DOCUMENT} FROM quests WHERE id = ?", (quest_id,)
+    ).fetchone()
+    return _flatten_row(row) if row else None
+
+
+def get_quest_json_by_id(quest_id):
+    row = _connection().execute(f"SELECT {_FLAT_QUEST_JSON} FROM quests WHERE id = ?", (quest_id,)).fetchone()
+    return row[0] if row else None
+
+
+def get_quest_progress(quest_id):
+    row = _connection().execute(
+        f"SELECT session_id, json_extract({_QUEST_DOCUMENT}, '$.steps'), completed_step_ids FROM quests WHERE id = ?",
+        (quest_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "session_id": row[0],
+        "rewards": step_rewards({"steps": json.loads(row[1]) if row[1] else None}),
+        "completed_step_ids": json.loads(row[2]),
+    }
+
+
+# One quest as a self-contained export record, rendered to text by JSON1.
+_EXPORT_RECORD = (
+    "json_object('id', id, 'session_id', session_id, 'created_at', created_at, "
+    f"'quest', json({_QUEST_DOCUMENT}), 'completed_step_ids', json(completed_step_ids), "
+    "'earned_sgxp', earned_sgxp, 'total_sgxp', total_sgxp)"
+)
+
+
+def iter_quest_export(session_id=None, after_id=0, batch_size=1000):
+    params = [after_id]
+    session_filter = ""
+    if session_id is not None:
+        session_filter = "AND session_id = ?"
+        params.append(session_id)
+    # SQLite steps through the result lazily; fetchmany keeps memory flat.
+    cur = _connection().execute(
+        f"SELECT {_EXPORT_RECORD} FROM quests WHERE id > ? {session_filter} ORDER BY id",
+        params,
+    )
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for (record,) in rows:
+                yield record
+    finally:
+        cur.close()
+
+
+_STATS_FIELDS = ("quest_count", "completed_quests", "total_sgxp", "earned_sgxp")
+
+
+def get_session_stats(session_id):
+    row = _connection().execute(
+        "SELECT quest_count, completed_quests, total_sgxp, earned_sgxp FROM quest_session_stats WHERE session_id = ?",
+        (session_id,),
+    ).fetchone() or (0, 0, 0, 0)
+    return dict(zip(_STATS_FIELDS, (int(value) for value in row)))
+
+
+def get_global_stats(top_n=10):
+    conn = _connection()
+    row = conn.execute(
+        "SELECT quest_count, completed_quests, total_sgxp, earned_sgxp, sessions FROM quest_global_stats WHERE id = 1"
+    ).fetchone() or (0, 0, 0, 0, 0)
+    stats = dict(zip(_STATS_FIELDS, (int(value) for value in row[:4])))
+    stats["sessions"] = int(row[4])
+    help_modes = conn.execute(
+        """
+        SELECT value, quest_count FROM quest_group_counts
+        WHERE dimension = 'help_mode' AND quest_count > 0
+        ORDER BY quest_count DESC
+        """
+    ).fetchall()
+    stats["help_modes"] = {value: int(count) for value, count in help_modes}
+    codenames = conn.execute(
+        """
+        SELECT value, quest_count FROM quest_group_counts
+        WHERE dimension = 'codename' AND quest_count > 0
+        ORDER BY quest_count DESC
+        LIMIT ?
+        """,
+        (top_n,),
+    ).fetchall()
+    stats["top_codenames"] = [{"codename": value, "quest_count": int(count)} for value, count in codenames]
+    return stats
+
+
+def get_leaderboard(limit=10):
+    rows = _connection().execute(
+        """
+        SELECT session_id, quest_count, completed_quests, total_sgxp, earned_sgxp
+        FROM quest_session_stats
+        WHERE quest_count > 0
+        ORDER BY earned_sgxp DESC, session_id
+        LIMIT ?
+        """,
+        (limit,),
+    ).fetchall()
+    return [
+        dict(zip(("session_id",) + _STATS_FIELDS, (row[0],) + tuple(int(value) for value in row[1:])))
+        for row in rows
+    ]
@@ -0,0 +1,76 @@
+"""
+Pluggable JSON encoding for API responses.
+
+Flask's ``jsonify`` runs the pure-Python stdlib encoder and, on Suit Log
+pages, that re-encoding of every stored quest dominates CPU time.  This
+module picks the fastest available backend once at import:
+
+- ``orjson`` when installed (several times faster, returns bytes),
+- the stdlib ``json`` module otherwise.
+
+``JSON_PROVIDER=stdlib`` forces the fallback (handy for debugging or
+comparing output).  Datetimes are rendered as HTTP dates either way,
+matching what ``jsonify`` has always returned for ``created_at``.
+
+``json_response`` builds a Flask response from an object, and
+``raw_json_response`` wraps JSON text that is already encoded (e.g. the
+``quest_json::text`` passthrough from ``db``) without parsing it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Union
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+if os.getenv("JSON_PROVIDER", "auto").lower() == "stdlib":
+    orjson = None
+
+PROVIDER = "orjson" if orjson is not None else "stdlib"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    # PASSTHROUGH_DATETIME routes datetimes to _default so the wire format
+    # does not change with the backend.
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value: Any) -> bytes:
+        """Encode ``value`` as compact UTF-8 JSON bytes."""
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+    def dumps(value: Any) -> bytes:
+        """Encode ``value`` as compact UTF-8 JSON bytes."""
+        return _encoder.encode(value).encode("utf-8")
+
+    loads = json.loads
+
+
+def json_response(value: Any, status: int = 200) -> Response:
+    """Drop-in replacement for ``jsonify`` using the fast encoder."""
+    return Response(dumps(value), status=status, mimetype="application/json")
+
+
+def raw_json_response(body: Union[str, bytes], status: int = 200) -> Response:
+    """Wrap already-encoded JSON text in a response without re-encoding it."""
+    return Response(body, status=status, mimetype="application/json")
@@ -1,5 +1,8 @@
+import json
 import os
-from typing import Any, Dict
+import re
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 # NOTE: This version is fully offline (no RAINDROP calls).
 # It always produces a short 'OPERATION ...' codename, based on themes,
@@ -10,237 +13,310 @@ from typing import Any, Dict
 # Operation codename helpers
 # ---------------------------------------------------------------------------
 
-def _select_codename(mission_idea: str) -> str:
-    """Pick a short codename based on loose keywords in the mission idea.
-
-    Mapping:
-      - Cats / small pets / strays      -> COMFY PAWS
-      - Dogs                            -> BRAVE PAWS
-      - Plants / gardens / trees        -> GREEN ROOTS
-      - Trash / litter / recycling      -> CLEAN SWEEP
-      - Climate / planet / environment  -> GREEN GUARDIANS
-      - Bullying / inclusion / kindness -> KINDNESS SHIELD
-      - Hunger / food drives            -> FULL PLATES
-      - Homelessness / shelters         -> SAFE HAVEN
-      - School / classroom / campus     -> SCHOOL SPARK
-      - Books / reading / libraries     -> STORY SPARK
-      - Safety / traffic / danger       -> SAFE STREETS
-      - Loneliness / belonging          -> BRIGHT SMILES
-      - Anything else                   -> CITIZEN HERO
-    """
-    text = (mission_idea or "").lower()
-
-    categories = [
-        # Animals: cats / small pets / strays
+# Keyword table for _select_codename, in priority order: when a mission
+# mentions keywords from several categories, the earliest category wins.
+_CODENAME_CATEGORIES = (
+    # Animals: cats / small pets / strays
+    (
+        "COMFY PAWS",
         (
-            [
-                "cat",
-                "cats",
-                "kitten",
-                "kittens",
-                "stray",
-                "strays",
-                "pet",
-                "pets",
-                "animal shelter",
-                "shelter animals",
-            ],
-            "COMFY PAWS",
+            "cat",
+            "cats",
+            "kitten",
+            "kittens",
+            "stray",
+            "strays",
+            "pet",
+            "pets",
+            "animal shelter",
+            "shelter animals",
         ),
-        # Animals: dogs
+    ),
+    # Animals: dogs
+    (
+        "BRAVE PAWS",
         (
-            [
-                "dog",
-                "dogs",
-                "puppy",
-                "puppies",
-            ],
-            "BRAVE PAWS",
+            "dog",
+            "dogs",
+            "puppy",
+            "puppies",
         ),
-        # Plants / gardens / trees
+    ),
+    # Plants / gardens / trees
+    (
+        "GREEN ROOTS",
         (
-            [
-                "plant",
-                "plants",
-                "garden",
-                "gardens",
-                "yard",
-                "weeds",
-                "weed",
-                "forest",
-                "trees",
-                "tree",
-                "flowers",
-                "flower",
-                "bush",
-                "bushes",
-                "grass",
-                "overgrown",
-            ],
-            "GREEN ROOTS",
+            "plant",
+            "plants",
+            "garden",
+            "gardens",
+            "yard",
+            "weeds",
+            "weed",
+            "forest",
+            "trees",
+            "tree",
+            "flowers",
+            "flower",
+            "bush",
+            "bushes",
+            "grass",
+            "overgrown",
         ),
-        # Trash / litter / recycling / pollution
+    ),
+    # Trash / litter / recycling / pollution
+    (
+        "CLEAN SWEEP",
         (
-            [
-                "trash",
-                "litter",
-                "garbage",
-                "rubbish",
-                "recycle",
-                "recycling",
-                "pollution",
-                "plastic",
-                "waste",
-                "landfill",
-                "dump",
-            ],
-            "CLEAN SWEEP",
+            "trash",
+            "litter",
+            "garbage",
+            "rubbish",
+            "recycle",
+            "recycling",
+            "pollution",
+            "plastic",
+            "waste",
+            "landfill",
+            "dump",
         ),
-        # Climate / planet / environment
+    ),
+    # Climate / planet / environment
+    (
+        "GREEN GUARDIANS",
         (
-            [
-                "climate",
-                "climate change",
-                "global warming",
-                "environment",
-                "planet",
-                "earth",
-                "emissions",
-                "carbon",
-                "ice caps",
-                "polar",
-                "heat wave",
-            ],
-            "GREEN GUARDIANS",
+            "climate",
+            "climate change",
+            "global warming",
+            "environment",
+            "planet",
+            "earth",
+            "emissions",
+            "carbon",
+            "ice caps",
+            "polar",
+            "heat wave",
         ),
-        # Bullying / kindness / inclusion
+    ),
+    # Bullying / kindness / inclusion
+    (
+        "KINDNESS SHIELD",
         (
-            [
-                "bully",
-                "bullying",
-                "bullied",
-                "mean kids",
-                "teased",
-                "teasing",
-                "left out",
-                "excluded",
-                "unkind",
-                "kindness",
-                "inclusion",
-                "inclusive",
-                "respect",
-            ],
-            "KINDNESS SHIELD",
+            "bully",
+            "bullying",
+            "bullied",
+            "mean kids",
+            "teased",
+            "teasing",
+            "left out",
+            "excluded",
+            "unkind",
+            "kindness",
+            "inclusion",
+            "inclusive",
+            "respect",
         ),
-        # Hunger / food / lunches / food drives
+    ),
+    # Hunger / food / lunches / food drives
+    (
+        "FULL PLATES",
         (
-            [
-                "hunger",
-                "hungry",
-                "food drive",
-                "food bank",
-                "food pantry",
-                "pantry",
-                "lunch debt",
-                "meals",
-                "meal",
-                "groceries",
-                "school lunches",
-                "school lunch",
-                "lunch",
-                "lunches",
-            ],
-            "FULL PLATES",
+            "hunger",
+            "hungry",
+            "food drive",
+            "food bank",
+            "food pantry",
+            "pantry",
+            "lunch debt",
+            "meals",
+            "meal",
+            "groceries",
+            "school lunches",
+            "school lunch",
+            "lunch",
+            "lunches",
         ),
-        # Homelessness / housing / shelters
+    ),
+    # Homelessness / housing / shelters
+    (
+        "SAFE HAVEN",
         (
-            [
-                "homeless",
-                "homelessness",
-                "no home",
-                "no housing",
-                "unstable housing",
-                "shelter",
-                "shelters",
-            ],
-            "SAFE HAVEN",
+            "homeless",
+            "homelessness",
+            "no home",
+            "no housing",
+            "unstable housing",
+            "shelter",
+            "shelters",
         ),
-        # School / classroom / campus
+    ),
+    # School / classroom / campus
+    (
+        "SCHOOL SPARK",
         (
-            [
-                "school",
-                "schools",
-                "class",
-                "classroom",
-                "teacher",
-                "teachers",
-                "students",
-                "student",
-                "principal",
-                "campus",
-                "hallway",
-                "locker",
-                "illiteracy",
-                "homework",
-            ],
-            "SCHOOL SPARK",
+            "school",
+            "schools",
+            "class",
+            "classroom",
+            "teacher",
+            "teachers",
+            "students",
+            "student",
+            "principal",
+            "campus",
+            "hallway",
+            "locker",
+            "illiteracy",
+            "homework",
         ),
-        # Books / reading / libraries
+    ),
+    # Books / reading / libraries
+    (
+        "STORY SPARK",
         (
-            [
-                "library",
-                "libraries",
-                "book",
-                "books",
-                "reading",
-                "read more",
-                "literacy",
-            ],
-            "STORY SPARK",
+            "library",
+            "libraries",
+            "book",
+            "books",
+            "reading",
+            "read more",
+            "literacy",
         ),
-        # Safety / traffic / danger
+    ),
+    # Safety / traffic / danger
+    (
+        "SAFE STREETS",
         (
-            [
-                "safety",
-                "unsafe",
-                "dangerous",
-                "violence",
-                "crime",
-                "traffic",
-                "crosswalk",
-                "speeding",
-                "cars",
-                "drivers",
-                "street light",
-                "stop sign",
-                "danger",
-            ],
-            "SAFE STREETS",
+            "safety",
+            "unsafe",
+            "dangerous",
+            "violence",
+            "crime",
+            "traffic",
+            "crosswalk",
+            "speeding",
+            "cars",
+            "drivers",
+            "street light",
+            "stop sign",
+            "danger",
         ),
-        # Loneliness / belonging / friendship
+    ),
+    # Loneliness / belonging / friendship
+    (
+        "BRIGHT SMILES",
         (
-            [
-                "lonely",
-                "alone",
-                "isolated",
-                "no friends",
-                "shy kids",
-                "new kid",
-                "friendship",
-                "belong",
-                "belonging",
-            ],
-            "BRIGHT SMILES",
+            "lonely",
+            "alone",
+            "isolated",
+            "no friends",
+            "shy kids",
+            "new kid",
+            "friendship",
+            "belong",
+            "belonging",
         ),
-    ]
+    ),
+)
+
+# Neutral default if nothing matches
+_DEFAULT_CODENAME = "CITIZEN HERO"
+
+
+def _load_extra_categories(path: str) -> List[Tuple[str, Tuple[str, ...]]]:
+    """Load additional codename categories from a JSON data file.
+
+    The file holds a list of ``{"codename": ..., "keywords": [...]}``
+    objects.  Extra categories rank below the built-in ones, in file order.
+    """
+    with open(path, encoding="utf-8") as fh:
+        entries = json.load(fh)
+    extra = []
+    for entry in entries:
+        codename = str(entry["codename"]).strip().upper()
+        keywords = tuple(str(kw) for kw in entry["keywords"])
+        if not codename or not keywords:
+            raise ValueError(f"Codename category in {path} needs a codename and keywords")
+        extra.append((codename, keywords))
+    return extra
 
-    for keywords, codename in categories:
+
+def _compile_codename_matcher(categories):
+    """Compile the category table into one alternation regex anchored at word starts.
+
+    Returns ``(pattern, priorities, codenames)`` where ``priorities`` maps a
+    normalized keyword (group 1 of a match) to the index of the first
+    category that lists it.  A keyword may be followed by a suffix so
+    inflected forms such as "gardening" and "planting" still match.
+    Longer keywords come first in the alternation so phrases such as
+    "animal shelter" win over their single-word tails ("shelter").
+    """
+    codenames = []
+    priorities: Dict[str, int] = {}
+    for priority, (codename, keywords) in enumerate(categories):
+        codenames.append(codename)
         for kw in keywords:
-            if kw in text:
-                return codename
+            priorities.setdefault(" ".join(kw.lower().split()), priority)
+
+    alternatives = [
+        r"\s+".join(re.escape(word) for word in kw.split())
+        for kw in sorted(priorities, key=len, reverse=True)
+    ]
+    pattern = re.compile(r"\b(" + "|".join(alternatives) + r")\w*")
+    return pattern, priorities, tuple(codenames)
+
+
+def _build_codename_matcher():
+    categories = list(_CODENAME_CATEGORIES)
+    extra_path = os.getenv("CODENAME_CATEGORIES_FILE")
+    if extra_path:
+        try:
+            categories.extend(_load_extra_categories(extra_path))
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            print(f"Ignoring codename categories file {extra_path}: {exc}")
+    return _compile_codename_matcher(categories)
+
+
+_CODENAME_PATTERN, _CODENAME_PRIORITIES, _CODENAMES = _build_codename_matcher()
+
+
+def _select_codename(mission_idea: str) -> str:
+    """Pick a short codename based on loose keywords in the mission idea.
+
+    Mapping:
+      - Cats / small pets / strays      -> COMFY PAWS
+      - Dogs                            -> BRAVE PAWS
+      - Plants / gardens / trees        -> GREEN ROOTS
+      - Trash / litter / recycling      -> CLEAN SWEEP
+      - Climate / planet / environment  -> GREEN GUARDIANS
+      - Bullying / inclusion / kindness -> KINDNESS SHIELD
+      - Hunger / food drives            -> FULL PLATES
+      - Homelessness / shelters         -> SAFE HAVEN
+      - School / classroom / campus     -> SCHOOL SPARK
+      - Books / reading / libraries     -> STORY SPARK
+      - Safety / traffic / danger       -> SAFE STREETS
+      - Loneliness / belonging          -> BRIGHT SMILES
+      - Anything else                   -> CITIZEN HERO
+
+    Keywords match from the start of a word, inflections included ("plant"
+    matches "planting"), but never inside one ("cat" does not match "education").
+    The text is scanned once; if several categories match, the one listed
+    first in ``_CODENAME_CATEGORIES`` wins.  Extra categories can be added
+    without code changes via a JSON file named by ``CODENAME_CATEGORIES_FILE``.
+    """
+    text = (mission_idea or "").lower()
+
+    best = None
+    for match in _CODENAME_PATTERN.finditer(text):
+        priority = _CODENAME_PRIORITIES[" ".join(match.group(1).split())]
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
 
-    # Neutral default if nothing matches
-    return "CITIZEN HERO"
+    if best is None:
+        return _DEFAULT_CODENAME
+    return _CODENAMES[best]
 
 
 def _build_operation_name(mission_idea: str) -> str:
@@ -249,6 +325,194 @@ def _build_operation_name(mission_idea: str) -> str:
     return f"OPERATION {codename}"
 
 
+# ---------------------------------------------------------------------------
+# Quest templates
+# ---------------------------------------------------------------------------
+
+# Bundled templates: one JSON file per locale (see quest_templates/en.json).
+# Text may contain ``{mission|fallback}``, replaced by the mission idea or,
+# when it is empty, by the fallback text.  Help modes without their own
+# template use the ``"*"`` entry.  A directory named by QUEST_TEMPLATES_DIR
+# can add locales or help modes, or override bundled ones, without code
+# changes.
+_TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "quest_templates")
+DEFAULT_LOCALE = os.getenv("QUEST_TEMPLATE_LOCALE", "en")
+
+_PLACEHOLDER = re.compile(r"\{(\w+)(?:\|([^{}]*))?\}")
+_PLACEHOLDER_NAMES = ("mission",)
+
+
+def _compile_text(text: str, where: str):
+    """Compile template text for :func:`_build_quest_template`.
+
+    Text without placeholders stays a plain string.  Otherwise it becomes a
+    ``(format_string, fallback_text)`` pair: the mission idea is slotted in
+    with one ``str.format`` call, and the text used when there is no mission
+    idea is rendered once here rather than per request.
+    """
+    if not isinstance(text, str):
+        raise ValueError(f"{where}: expected a string")
+    pieces = []
+    fallback = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(text):
+        name = match.group(1)
+        if name not in _PLACEHOLDER_NAMES:
+            raise ValueError(f"{where}: unknown placeholder {{{name}}}")
+        literal = text[position:match.start()]
+        pieces.append(literal.replace("{", "{{").replace("}", "}}") + "{0}")
+        fallback.append(literal + (match.group(2) or ""))
+        position = match.end()
+    if not pieces:
+        return text
+    tail = text[position:]
+    pieces.append(tail.replace("{", "{{").replace("}", "}}"))
+    fallback.append(tail)
+    return "".join(pieces), "".join(fallback)
+
+
+def _compile_help_mode(raw: Dict[str, Any], where: str):
+    """Validate one help mode template; returns ``(summary, steps)``."""
+    if not isinstance(raw, dict):
+        raise ValueError(f"{where}: expected an object")
+    steps = raw.get("steps")
+    if not isinstance(steps, list) or not steps:
+        raise ValueError(f"{where}.steps: expected a non-empty list")
+    compiled_steps = []
+    seen_ids = set()
+    for idx, step in enumerate(steps):
+        step_where = f"{where}.steps[{idx}]"
+        if not isinstance(step, dict):
+            raise ValueError(f"{step_where}: expected an object")
+        step_id, reward = step.get("id"), step.get("sgxp_reward")
+        if not isinstance(step_id, int) or step_id in seen_ids:
+            raise ValueError(f"{step_where}.id: expected a unique integer")
+        if not isinstance(reward, int) or reward < 0:
+            raise ValueError(f"{step_where}.sgxp_reward: expected a non-negative integer")
+        seen_ids.add(step_id)
+        compiled_steps.append((
+            step_id,
+            _compile_text(step.get("title"), f"{step_where}.title"),
+            _compile_text(step.get("description"), f"{step_where}.description"),
+            reward,
+        ))
+    return _compile_text(raw.get("mission_summary"), f"{where}.mission_summary"), tuple(compiled_steps)
+
+
+def _compile_locale(raw: Dict[str, Any], where: str, base=None):
+    """Compile one locale file, layered over ``base`` (the same locale from
+    an earlier directory) when given."""
+    defaults = dict(base["defaults"]) if base else {}
+    help_modes = dict(base["help_modes"]) if base else {}
+    raw_defaults = raw.get("defaults", {})
+    if not isinstance(raw_defaults, dict):
+        raise ValueError(f"{where}.defaults: expected an object")
+    for key in ("difficulty",):
+        if key in raw_defaults:
+            defaults[key] = _compile_text(raw_defaults[key], f"{where}.defaults.{key}")
+    if "estimated_duration_days" in raw_defaults:
+        if not isinstance(raw_defaults["estimated_duration_days"], int):
+            raise ValueError(f"{where}.defaults.estimated_duration_days: expected an integer")
+        defaults["estimated_duration_days"] = raw_defaults["estimated_duration_days"]
+    for key in ("reflection_prompts", "safety_notes"):
+        if key in raw_defaults:
+            if not isinstance(raw_defaults[key], list):
+                raise ValueError(f"{where}.defaults.{key}: expected a list")
+            defaults[key] = tuple(
+                _compile_text(text, f"{where}.defaults.{key}[{i}]") for i, text in enumerate(raw_defaults[key])
+            )
+    raw_modes = raw.get("help_modes", {})
+    if not isinstance(raw_modes, dict):
+        raise ValueError(f"{where}.help_modes: expected an object")
+    for mode, template in raw_modes.items():
+        help_modes[mode] = _compile_help_mode(template, f"{where}.help_modes.{mode}")
+
+    missing = {"difficulty", "estimated_duration_days", "reflection_prompts", "safety_notes"} - defaults.keys()
+    if missing:
+        raise ValueError(f"{where}.defaults: missing {', '.join(sorted(missing))}")
+    if "*" not in help_modes:
+        raise ValueError(f'{where}.help_modes: a "*" template is required')
+    return {"defaults": MappingProxyType(defaults), "help_modes": MappingProxyType(help_modes)}
+
+
+def _build_quest_template(defaults, summary, steps):
+    """Flatten one locale/help mode into a ready-made quest plus fill slots.
+
+    ``quest`` is the complete quest for an empty mission idea (every
+    placeholder already replaced by its fallback text).  ``slots`` lists
+    where the mission idea goes otherwise, as ``(key, index, field,
+    format_string)``, so generating a quest is a few shallow copies and one
+    ``str.format`` per placeholder.
+    """
+    slots = []
+
+    def place(compiled, key, index=None, field=None):
+        if compiled.__class__ is str:
+            return compiled
+        slots.append((key, index, field, compiled[0]))
+        return compiled[1]
+
+    quest = {
+        "mission_summary": place(summary, "mission_summary"),
+        "difficulty": place(defaults["difficulty"], "difficulty"),
+        "estimated_duration_days": defaults["estimated_duration_days"],
+        "steps": tuple(
+            MappingProxyType({
+                "id": step_id,
+                "title": place(title, "steps", index, "title"),
+                "description": place(description, "steps", index, "description"),
+                "sgxp_reward": reward,
+            })
+            for index, (step_id, title, description, reward) in enumerate(steps)
+        ),
+        "reflection_prompts": tuple(
+            place(text, "reflection_prompts", index) for index, text in enumerate(defaults["reflection_prompts"])
+        ),
+        "safety_notes": tuple(
+            place(text, "safety_notes", index) for index, text in enumerate(defaults["safety_notes"])
+        ),
+    }
+    return MappingProxyType(quest), tuple(slots)
+
+
+def _load_templates(*directories: str):
+    """Load and compile every ``<locale>.json`` in ``directories``, in order.
+
+    Returns ``{locale: {help_mode: (quest, slots)}}`` (see
+    :func:`_build_quest_template`), read-only throughout.
+    """
+    compiled: Dict[str, Any] = {}
+    for directory in directories:
+        if not directory:
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(directory, filename)
+            with open(path, encoding="utf-8") as fh:
+                raw = json.load(fh)
+            if not isinstance(raw, dict):
+                raise ValueError(f"{path}: expected an object")
+            locale = raw.get("locale") or filename[:-len(".json")]
+            compiled[locale] = _compile_locale(raw, path, compiled.get(locale))
+    if DEFAULT_LOCALE not in compiled:
+        raise ValueError(f"No quest templates for default locale {DEFAULT_LOCALE!r}")
+    return MappingProxyType({
+        locale: MappingProxyType({
+            mode: _build_quest_template(entry["defaults"], summary, steps)
+            for mode, (summary, steps) in entry["help_modes"].items()
+        })
+        for locale, entry in compiled.items()
+    })
+
+
+_TEMPLATES = _load_templates(_TEMPLATES_DIR, os.getenv("QUEST_TEMPLATES_DIR"))
+
+
+def available_locales() -> Tuple[str, ...]:
+    return tuple(sorted(_TEMPLATES))
+
+
 # ---------------------------------------------------------------------------
 # Quest generation
 # ---------------------------------------------------------------------------
@@ -259,229 +523,77 @@ def generate_quest(data: Dict[str, Any]) -> Dict[str, Any]:
     This offline generator:
     - Always uses a short 'OPERATION ...' codename that does NOT echo the full
       problem paragraph.
-    - Tailors mission_summary and steps based on help_mode.
+    - Tailors mission_summary and steps based on help_mode, using the
+      precompiled template for the requested ``locale`` (default locale when
+      missing or unknown).
     """
     mission_idea = (data.get("mission_idea") or "").strip()
     help_mode = data.get("help_mode", "supplies") or "supplies"
-
-    quest_name = _build_operation_name(mission_idea)
-
-    if help_mode == "supplies":
-        mission_summary = (
-            f"Gather essential supplies to support your mission: "
-            f"{mission_idea or 'your chosen cause'}. "
-            "Over the next two weeks, you'll rally friends, family, and neighbors "
-            "to collect what's needed."
-        )
-        steps = [
-            {
-                "id": 1,
-                "title": "Find your adult ally",
-                "description": "Ask a trusted adult to help plan your supply drive.",
-                "sgxp_reward": 10,
-            },
-            {
-                "id": 2,
-                "title": "Research what’s needed",
-                "description": (
-                    "Identify the types of supplies needed to address "
-                    f"{mission_idea or 'your mission'}. Make a list with your adult ally."
-                ),
-                "sgxp_reward": 15,
-            },
-            {
-                "id": 3,
-                "title": "Spread the word",
-                "description": (
-                    "Create flyers or social media posts asking for donations "
-                    "and explaining why they matter."
-                ),
-                "sgxp_reward": 20,
-            },
-            {
-                "id": 4,
-                "title": "Collect and organize supplies",
-                "description": "Gather the supplies from donors and sort them by type.",
-                "sgxp_reward": 25,
-            },
-            {
-                "id": 5,
-                "title": "Deliver and celebrate",
-                "description": (
-                    "Deliver the collected supplies to those affected by "
-                    f"{mission_idea or 'your mission'} and thank everyone who helped."
-                ),
-                "sgxp_reward": 30,
-            },
-        ]
-    elif help_mode == "awareness":
-        mission_summary = (
-            f"Raise awareness about {mission_idea or 'an issue you care about'}. "
-            "Over the next two weeks, you’ll learn, create messages, and share them widely."
-        )
-        steps = [
-            {
-                "id": 1,
-                "title": "Learn about the issue",
-                "description": (
-                    "Read articles or watch videos to understand why "
-                    f"{mission_idea or 'this issue'} matters."
-                ),
-                "sgxp_reward": 10,
-            },
-            {
-                "id": 2,
-                "title": "Plan your message",
-                "description": (
-                    "With your adult ally, decide the key facts and stories "
-                    "you want to share."
-                ),
-                "sgxp_reward": 15,
-            },
-            {
-                "id": 3,
-                "title": "Create awareness materials",
-                "description": (
-                    "Design posters, social media posts, or presentations "
-                    "to spread the word."
-                ),
-                "sgxp_reward": 20,
-            },
-            {
-                "id": 4,
-                "title": "Share your message",
-                "description": (
-                    "Present your materials at school, community centers, or online."
-                ),
-                "sgxp_reward": 25,
-            },
-            {
-                "id": 5,
-                "title": "Gather feedback",
-                "description": (
-                    "Talk to peers about what they learned and how they feel "
-                    "about the mission."
-                ),
-                "sgxp_reward": 30,
-            },
-        ]
-    elif help_mode == "helpers":
-        mission_summary = (
-            f"Organize helpers to tackle {mission_idea or 'your mission'}. "
-            "Over the next two weeks, you’ll recruit volunteers and coordinate their efforts."
-        )
-        steps = [
-            {
-                "id": 1,
-                "title": "Identify tasks",
-                "description": (
-                    "List out what needs to be done to address "
-                    f"{mission_idea or 'your mission'}."
-                ),
-                "sgxp_reward": 10,
-            },
-            {
-                "id": 2,
-                "title": "Recruit helpers",
-                "description": (
-                    "Ask friends, classmates, and community members to join your mission."
-                ),
-                "sgxp_reward": 15,
-            },
-            {
-                "id": 3,
-                "title": "Plan the work",
-                "description": (
-                    "With your team and adult ally, schedule when and where the tasks "
-                    "will happen."
-                ),
-                "sgxp_reward": 20,
-            },
-            {
-                "id": 4,
-                "title": "Take action together",
-                "description": (
-                    "Lead your team as you carry out the tasks to make a difference."
-                ),
-                "sgxp_reward": 25,
-            },
-            {
-                "id": 5,
-                "title": "Reflect and celebrate",
-                "description": (
-                    "Thank your helpers and discuss what you accomplished together."
-                ),
-                "sgxp_reward": 30,
-            },
-        ]
-    else:
-        mission_summary = (
-            f"Make a difference by acting on {mission_idea or 'your mission idea'}. "
-            "Over the next two weeks you'll create your own mission plan."
-        )
-        steps = [
-            {
-                "id": 1,
-                "title": "Define your goal",
-                "description": (
-                    "With an adult ally, clarify what success looks like for "
-                    f"{mission_idea or 'this mission'}."
-                ),
-                "sgxp_reward": 10,
-            },
-            {
-                "id": 2,
-                "title": "Plan your approach",
-                "description": (
-                    "Decide whether you need supplies, awareness, or helpers "
-                    "and plan accordingly."
-                ),
-                "sgxp_reward": 15,
-            },
-            {
-                "id": 3,
-                "title": "Execute your plan",
-                "description": "Follow through with your actions, adjusting as needed.",
-                "sgxp_reward": 20,
-            },
-            {
-                "id": 4,
-                "title": "Document your journey",
-                "description": "Take notes or photos to capture your experience.",
-                "sgxp_reward": 25,
-            },
-            {
-                "id": 5,
-                "title": "Share your impact",
-                "description": (
-                    "Tell others what you learned and how they can help with "
-                    f"{mission_idea or 'this mission'}."
-                ),
-                "sgxp_reward": 30,
-            },
-        ]
+    templates = _TEMPLATES.get(data.get("locale") or DEFAULT_LOCALE) or _TEMPLATES[DEFAULT_LOCALE]
+    template, slots = templates.get(help_mode) or templates["*"]
 
     quest: Dict[str, Any] = {
-        "quest_name": quest_name,
-        "mission_summary": mission_summary,
-        "difficulty": "Medium",
-        "estimated_duration_days": 14,
+        "quest_name": _build_operation_name(mission_idea),
+        "mission_summary": template["mission_summary"],
+        "difficulty": template["difficulty"],
+        "estimated_duration_days": template["estimated_duration_days"],
         "help_mode": help_mode,
-        "steps": steps,
-        "reflection_prompts": [
-            f"What surprised you while working on {mission_idea or 'this mission'}?",
-            "How did teamwork or community support influence your mission?",
-            "What would you do differently next time?",
-        ],
-        "safety_notes": [
-            "Always involve a trusted adult when planning and carrying out your mission.",
-            "Respect privacy and seek permission when taking photos or sharing stories.",
-        ],
+        "steps": [step.copy() for step in template["steps"]],
+        "reflection_prompts": list(template["reflection_prompts"]),
+        "safety_notes": list(template["safety_notes"]),
     }
+    if mission_idea:
+        for key, index, field, fmt in slots:
+            if index is None:
+                quest[key] = fmt.format(mission_idea)
+            elif field is None:
+                quest[key][index] = fmt.format(mission_idea)
+            else:
+                quest[key][index][field] = fmt.format(mission_idea)
 
     return quest
 
 
+def _mission_candidates(quest: Dict[str, Any], slots) -> Iterator[str]:
+    """Mission ideas that could have filled the first slot of ``quest``."""
+    yield ""
+    if not slots:
+        return
+    key, index, field, fmt = slots[0]
+    value = quest.get(key)
+    try:
+        if index is not None:
+            value = value[index]
+        if field is not None:
+            value = value[field]
+    except (IndexError, KeyError, TypeError):
+        return
+    if not isinstance(value, str):
+        return
+    literals = [re.escape(part.replace("{{", "{").replace("}}", "}")) for part in fmt.split("{0}")]
+    for group in ("(?P<m>.+)", "(?P<m>.+?)"):
+        match = re.fullmatch(literals[0] + group + "(?P=m)".join(literals[1:]), value, re.DOTALL)
+        if match:
+            yield match.group("m")
+
+
+def match_offline_quest(quest: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """``(locale, mission_idea)`` for which :func:`generate_quest` renders
+    exactly ``quest``, or None when it did not come from a template.
+
+    Lets storage keep one copy of each template (see ``quest_dedup``).
+    """
+    help_mode = quest.get("help_mode")
+    if not isinstance(help_mode, str) or not help_mode:
+        return None
+    for locale, templates in _TEMPLATES.items():
+        _, slots = templates.get(help_mode) or templates["*"]
+        for mission_idea in _mission_candidates(quest, slots):
+            if generate_quest({"mission_idea": mission_idea, "help_mode": help_mode, "locale": locale}) == quest:
+                return locale, mission_idea
+    return None
+
+
 def generate_clarifying_questions(data: Dict[str, Any]):
     """Generate clarifying questions to help refine the mission."""
     mission_idea = (data.get("mission_idea") or "").strip()
@@ -16,6 +16,9 @@ Environment variables used:
 - ``RAINDROP_API_KEY`` – Bearer token for authenticating with
   SmartInference.
 
+Timeout, retry and circuit breaker settings are documented in
+``inference_client``.
+
 Future enhancements could include capturing the user’s nickname, age
 range and session ID for storage alongside the quest in the database,
 and integrating with Vultr’s SmartSQL via a ``DATABASE_URL``.
@@ -23,10 +26,10 @@ and integrating with Vultr’s SmartSQL via a ``DATABASE_URL``.
 
 from __future__ import annotations
 
-import os
-import requests
 from typing import Any, Dict
 
+from inference_client import generate_with_fallback
+
 
 def generate_quest(data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -34,9 +37,12 @@ def generate_quest(data: Dict[str, Any]) -> Dict[str, Any]:
     clarifying information.
 
     The function first attempts to call a Raindrop SmartInference
-    endpoint.  If the call fails or the endpoint is not configured, it
-    falls back to a rule‑based generator that incorporates the
-    clarifying details into the mission summary when possible.
+    endpoint through the shared ``inference_client``, which pools
+    connections, retries transient failures and stops calling a degraded
+    endpoint altogether once its circuit breaker opens.  If the call fails
+    or the endpoint is not configured, it falls back to a rule‑based
+    generator that incorporates the clarifying details into the mission
+    summary when possible.
 
     Parameters
     ----------
@@ -60,41 +66,16 @@ def generate_quest(data: Dict[str, Any]) -> Dict[str, Any]:
         ``difficulty``, ``estimated_duration_days``, ``help_mode``,
         ``steps``, ``reflection_prompts`` and ``safety_notes``.
     """
-    # Extract the primary and clarifying parameters
-    mission_idea: str = (data.get("mission_idea") or "").strip()
-    help_mode: str = data.get("help_mode") or "supplies"
+    return generate_with_fallback(data, _generate_offline)
+
+
+def _generate_offline(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Rule‑based quest used when SmartInference is unavailable."""
     who: str = (data.get("who") or "").strip()
     where: str = (data.get("where") or "").strip()
     outcome: str = (data.get("outcome") or "").strip()
+    help_mode: str = data.get("help_mode") or "supplies"
 
-    # Attempt to call the Raindrop SmartInference API if configured
-    api_url = os.getenv("RAINDROP_API_URL")
-    api_key = os.getenv("RAINDROP_API_KEY")
-    if api_url and api_key:
-        payload = {
-            "mission_idea": mission_idea,
-            "help_mode": help_mode,
-            "who": who,
-            "where": where,
-            "outcome": outcome,
-        }
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        }
-        try:
-            response = requests.post(api_url, json=payload, headers=headers, timeout=15)
-            # If we get a valid JSON response from SmartInference, return it
-            if response.ok:
-                quest = response.json()
-                # Basic validation: ensure required fields are present
-                if isinstance(quest, dict) and "quest_name" in quest and "steps" in quest:
-                    return quest
-        except Exception as exc:
-            # Log exception for debugging; fallback to offline generation
-            print(f"SmartInference call failed: {exc}")
-
-    # Offline rule‑based generation
     # Craft a mission summary using clarifying details when available
     if who and where and outcome:
         mission_summary = f"Help {who} by {outcome} in {where}."
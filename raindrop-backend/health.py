@@ -0,0 +1,200 @@
+"""
+Liveness, readiness and the retrying schema initialisation behind them.
+
+``GET /livez`` only says the process is serving requests.  ``GET /readyz``
+says whether it should receive traffic, from dependency checks that run on
+a background thread every ``HEALTH_CHECK_INTERVAL`` seconds: a probe reads
+the last result and never touches the database or SmartInference itself,
+however often the orchestrator polls.
+
+Checks:
+
+- ``database`` (required): a pooled connection reads the schema version,
+  which must have reached ``db.SCHEMA_VERSION``.  Skipped when storage is
+  off (``DB_BACKEND=none``).
+- ``inference`` (informational): the SmartInference circuit breaker state.
+  An open circuit does not make the app unready, since quests then come
+  from the offline templates.
+
+Schema creation no longer runs inline at import: :class:`RetryingTask`
+runs ``db.init_schema`` on a background thread, retrying with exponential
+backoff (up to ``SCHEMA_INIT_MAX_DELAY`` seconds apart) until it succeeds,
+and readiness stays false until the version check sees the result.  The
+app starts both threads on its first request, so importing it does no I/O.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import db
+import inference_client
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+SCHEMA_INIT_MAX_DELAY = float(os.getenv("SCHEMA_INIT_MAX_DELAY", "30"))
+
+# A check returns (ok, detail) or raises, which counts as a failure.
+Check = Callable[[], Tuple[bool, Dict[str, Any]]]
+
+
+class RetryingTask:
+    """Run ``fn`` on a daemon thread until it succeeds, backing off between tries."""
+
+    def __init__(self, name: str, fn: Callable[[], Any], initial_delay: float = 0.5,
+                 max_delay: float = SCHEMA_INIT_MAX_DELAY) -> None:
+        self.name = name
+        self._fn = fn
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._done = threading.Event()
+        self._attempted = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> "RetryingTask":
+        """Start (or, in a forked child, restart) the task unless it has finished."""
+        with self._lock:
+            if self._done.is_set():
+                return self
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return self
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        delay = self.initial_delay
+        while not self._done.is_set():
+            self.attempts += 1
+            try:
+                self._fn()
+            except Exception as exc:
+                self.last_error = str(exc)
+                self._attempted.set()
+                print(f"{self.name} failed (attempt {self.attempts}), retrying in {delay:.1f}s: {exc}")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+                continue
+            self.last_error = None
+            self._done.set()
+            self._attempted.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def wait_first_attempt(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the first try has finished, successfully or not; True if it succeeded."""
+        self._attempted.wait(timeout)
+        return self.done
+
+    def status(self) -> Dict[str, Any]:
+        return {"done": self.done, "attempts": self.attempts, "last_error": self.last_error}
+
+
+class HealthMonitor:
+    """Refresh dependency checks in the background and keep the last result.
+
+    :param checks: ``[(name, check, required)]``; only required checks
+        decide readiness.
+    """
+
+    def __init__(self, checks: List[Tuple[str, Check, bool]], interval: float = HEALTH_CHECK_INTERVAL) -> None:
+        self.checks = checks
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopped = threading.Event()
+        self._snapshot: Dict[str, Any] = {"ready": False, "status": "starting", "checked_at": None, "checks": {}}
+
+    def run_checks(self) -> Dict[str, Any]:
+        """Run every check once and publish the result."""
+        results = {}
+        ready = True
+        for name, check, required in self.checks:
+            started = time.perf_counter()
+            try:
+                ok, detail = check()
+            except Exception as exc:
+                ok, detail = False, {"error": str(exc)}
+            results[name] = {
+                "ok": ok,
+                "required": required,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                **detail,
+            }
+            if required and not ok:
+                ready = False
+        snapshot = {
+            "ready": ready,
+            "status": "ready" if ready else "unavailable",
+            "checked_at": time.time(),
+            "checks": results,
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The last published result (what ``/readyz`` returns)."""
+        with self._lock:
+            return self._snapshot
+
+    def start(self) -> "HealthMonitor":
+        """Start the refresh thread in this process if it is not running."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return self
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return self
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self.run_checks()
+            self._stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def database_check(schema_task: Optional[RetryingTask] = None) -> Check:
+    """Required check: the database answers and its schema is current."""
+
+    def check():
+        if not db.is_configured():
+            return True, {"backend": None}
+        detail: Dict[str, Any] = {"backend": db.backend_name(), "expected_schema_version": db.SCHEMA_VERSION}
+        if schema_task is not None:
+            detail["schema_init"] = schema_task.status()
+        version = db.get_schema_version()
+        detail["schema_version"] = version
+        pool = db.pool_stats()
+        if pool:
+            detail["pool"] = {key: pool[key] for key in ("size", "idle", "in_use", "waiting")}
+        return version is not None and version >= db.SCHEMA_VERSION, detail
+
+    return check
+
+
+def inference_check() -> Tuple[bool, Dict[str, Any]]:
+    """Informational check: SmartInference circuit state (no network call)."""
+    if inference_client.get_client() is None:
+        return True, {"configured": False}
+    breaker = inference_client.client_stats() or {}
+    return breaker.get("state") != "open", {"configured": True, **breaker}
@@ -0,0 +1,589 @@
+"""
+Shared HTTP client for Raindrop SmartInference quest generation.
+
+Calling ``requests.post`` per quest opens a new TCP/TLS connection every
+time and, when the endpoint is degraded, parks every worker on a
+15-second timeout.  ``InferenceClient`` fixes both:
+
+- One pooled ``requests.Session`` per process keeps connections alive.
+- Connect and read timeouts are separate, so an unreachable host fails
+  fast while a slow-but-working model still has time to answer.
+- Transient failures (connection errors, timeouts, 429/5xx) are retried a
+  bounded number of times with full-jitter exponential backoff.
+- A ``CircuitBreaker`` counts failed calls.  After ``failure_threshold``
+  consecutive failures it opens and callers skip the network entirely,
+  going straight to the offline rule-based generator.  Once
+  ``reset_timeout`` has passed a single probe request is let through
+  (half-open); success closes the circuit, failure re-opens it.
+
+Environment variables:
+
+- ``RAINDROP_API_URL`` / ``RAINDROP_API_KEY`` – endpoint and bearer token.
+- ``RAINDROP_CONNECT_TIMEOUT`` (default 3.05s) and
+  ``RAINDROP_READ_TIMEOUT`` (default 15s).
+- ``RAINDROP_MAX_RETRIES`` (default 2) – extra attempts per call.
+- ``RAINDROP_BREAKER_THRESHOLD`` (default 5) and
+  ``RAINDROP_BREAKER_RESET`` (default 30s).
+- ``RAINDROP_POOL_SIZE`` (default 10) – keep-alive connections per host.
+
+``InferenceClient.stream`` yields the response body as it arrives, for
+``POST /generate-quest:stream`` (see ``quest_stream``).
+
+``AsyncInferenceClient`` is the asyncio twin used by the ASGI entry point
+(``asgi_app``); it needs the optional ``httpx`` dependency.
+
+``requests`` (and ``httpx``/``asyncio`` for the async client) are imported
+when a client is first built, so processes that never call SmartInference,
+and cold starts before the first quest, do not pay for loading them.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import metrics
+import rate_limit
+
+# Status codes worth another attempt; anything else is a hard failure.
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._cooled_down():
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go out now.
+
+        In the half-open state only one probe is admitted at a time; other
+        callers keep failing fast until the probe reports back.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._cooled_down():
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def record_abandoned(self) -> None:
+        """A call ended with no verdict (its caller went away); free the probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {"state": state, "consecutive_failures": self._failures}
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+
+class InferenceClient:
+    """Pooled, retrying, circuit-broken client for the SmartInference API."""
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 15.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        pool_size: int = 10,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.api_url = api_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._requests = requests
+        self.session = requests.Session()
+        # Retries are handled here (with jitter and breaker accounting), so
+        # urllib3's own retry layer stays off.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        })
+
+    def generate(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """POST ``payload`` and return the quest dict, or None on any failure.
+
+        None means the caller should use the offline generator; it is also
+        returned immediately, without touching the network, while the
+        circuit is open.
+        """
+        if not self.breaker.allow_request():
+            metrics.record_inference("circuit_open")
+            return None
+
+        requests = self._requests
+        started = time.perf_counter()
+        outcome = "error"
+        succeeded = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                retryable = False
+                try:
+                    response = self.session.post(
+                        self.api_url,
+                        json=payload,
+                        timeout=(self.connect_timeout, self.read_timeout),
+                    )
+                    if response.ok:
+                        quest = response.json()
+                        # Basic validation: ensure required fields are present
+                        if isinstance(quest, dict) and "quest_name" in quest and "steps" in quest:
+                            succeeded = True
+                            return quest
+                        print("SmartInference returned an invalid quest payload")
+                        outcome = "error"
+                    else:
+                        retryable = response.status_code in RETRYABLE_STATUS
+                        outcome = "error"
+                        print(f"SmartInference call failed with HTTP {response.status_code}")
+                except requests.Timeout as exc:
+                    retryable = True
+                    outcome = "timeout"
+                    print(f"SmartInference call failed: {exc}")
+                except requests.RequestException as exc:
+                    # Connection errors, bodies cut short, redirect loops.
+                    retryable = True
+                    outcome = "error"
+                    print(f"SmartInference call failed: {exc}")
+                except ValueError as exc:
+                    # Body was not valid JSON.
+                    print(f"SmartInference returned malformed JSON: {exc}")
+
+                if not retryable or attempt == self.max_retries:
+                    break
+                time.sleep(self._backoff(attempt))
+            return None
+        finally:
+            # Every exit settles the breaker, or a half-open probe that
+            # raised would keep the circuit from ever closing.
+            if succeeded:
+                self.breaker.record_success()
+                metrics.record_inference("success", time.perf_counter() - started)
+            else:
+                self.breaker.record_failure()
+                metrics.record_inference(outcome, time.perf_counter() - started)
+
+    def stream(self, payload: Dict[str, Any]) -> Iterator[str]:
+        """POST ``payload`` and yield the response body as text while it arrives.
+
+        Same timeouts, retries and circuit breaker as :meth:`generate`,
+        except that a call is only retried while none of its body has been
+        yielded.  The generator's return value (``StopIteration.value``) is
+        the validated quest, or None on any failure.
+        """
+        if not self.breaker.allow_request():
+            metrics.record_inference("circuit_open")
+            return None
+
+        requests = self._requests
+        started = time.perf_counter()
+        outcome = "error"
+        succeeded = abandoned = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                retryable = False
+                outcome = "error"
+                parts = []
+                try:
+                    with self.session.post(
+                        self.api_url,
+                        json=payload,
+                        timeout=(self.connect_timeout, self.read_timeout),
+                        stream=True,
+                    ) as response:
+                        if response.ok:
+                            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+                            for raw in response.iter_content(chunk_size=None):
+                                text = decoder.decode(raw)
+                                if text:
+                                    parts.append(text)
+                                    yield text
+                            quest = json.loads("".join(parts) + decoder.decode(b"", final=True))
+                            if isinstance(quest, dict) and "quest_name" in quest and "steps" in quest:
+                                succeeded = True
+                                return quest
+                            print("SmartInference returned an invalid quest payload")
+                        else:
+                            retryable = response.status_code in RETRYABLE_STATUS
+                            print(f"SmartInference call failed with HTTP {response.status_code}")
+                except requests.Timeout as exc:
+                    retryable = True
+                    outcome = "timeout"
+                    print(f"SmartInference stream failed: {exc}")
+                except requests.RequestException as exc:
+                    # Connection errors, and connections dropped mid-body.
+                    retryable = True
+                    outcome = "error"
+                    print(f"SmartInference stream failed: {exc}")
+                except ValueError as exc:
+                    print(f"SmartInference returned malformed JSON: {exc}")
+
+                # Text already sent on cannot be taken back by a retry.
+                if not retryable or parts or attempt == self.max_retries:
+                    break
+                time.sleep(self._backoff(attempt))
+            return None
+        except GeneratorExit:
+            # Closed at a yield: the SSE client went away, not SmartInference.
+            abandoned = True
+            raise
+        finally:
+            if succeeded:
+                self.breaker.record_success()
+                metrics.record_inference("success", time.perf_counter() - started)
+            elif abandoned:
+                self.breaker.record_abandoned()
+                metrics.record_inference("cancelled", time.perf_counter() - started)
+            else:
+                self.breaker.record_failure()
+                metrics.record_inference(outcome, time.perf_counter() - started)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for retry number ``attempt``."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncInferenceClient:
+    """asyncio version of :class:`InferenceClient` built on ``httpx``.
+
+    Same timeouts, retry policy and circuit breaker semantics, but a single
+    event loop can keep hundreds of generations in flight.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 15.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        pool_size: int = 100,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        import asyncio
+        import httpx
+
+        self._asyncio = asyncio
+        self._httpx = httpx
+        self.api_url = api_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+            },
+        )
+
+    async def generate(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """POST ``payload`` and return the quest dict, or None on any failure."""
+        if not self.breaker.allow_request():
+            metrics.record_inference("circuit_open")
+            return None
+
+        httpx = self._httpx
+        started = time.perf_counter()
+        outcome = "error"
+        succeeded = abandoned = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                retryable = False
+                try:
+                    response = await self.client.post(self.api_url, json=payload)
+                    if response.is_success:
+                        quest = response.json()
+                        if isinstance(quest, dict) and "quest_name" in quest and "steps" in quest:
+                            succeeded = True
+                            return quest
+                        print("SmartInference returned an invalid quest payload")
+                        outcome = "error"
+                    else:
+                        retryable = response.status_code in RETRYABLE_STATUS
+                        outcome = "error"
+                        print(f"SmartInference call failed with HTTP {response.status_code}")
+                except httpx.TimeoutException as exc:
+                    retryable = True
+                    outcome = "timeout"
+                    print(f"SmartInference call failed: {exc!r}")
+                except httpx.HTTPError as exc:
+                    # Connection errors, bodies cut short, redirect loops.
+                    retryable = True
+                    outcome = "error"
+                    print(f"SmartInference call failed: {exc!r}")
+                except ValueError as exc:
+                    print(f"SmartInference returned malformed JSON: {exc}")
+
+                if not retryable or attempt == self.max_retries:
+                    break
+                await self._asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+            return None
+        except self._asyncio.CancelledError:
+            # The request was cancelled (client gone, shutdown), not SmartInference.
+            abandoned = True
+            raise
+        finally:
+            # Every exit settles the breaker, as in InferenceClient.generate.
+            if succeeded:
+                self.breaker.record_success()
+                metrics.record_inference("success", time.perf_counter() - started)
+            elif abandoned:
+                self.breaker.record_abandoned()
+                metrics.record_inference("cancelled", time.perf_counter() - started)
+            else:
+                self.breaker.record_failure()
+                metrics.record_inference(outcome, time.perf_counter() - started)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_client: Optional[InferenceClient] = None
+_client_config = None
+_client_lock = threading.Lock()
+_async_client: Optional[AsyncInferenceClient] = None
+_async_client_config = None
+
+
+def get_client() -> Optional[InferenceClient]:
+    """Return the shared client, or None when SmartInference is not configured.
+
+    The client is rebuilt if the endpoint or key in the environment change,
+    which keeps tests and local toggling of ``RAINDROP_API_URL`` simple.
+    """
+    global _client, _client_config
+    api_url = os.getenv("RAINDROP_API_URL")
+    api_key = os.getenv("RAINDROP_API_KEY")
+    if not (api_url and api_key):
+        return None
+    config = (api_url, api_key)
+    if _client is not None and _client_config == config:
+        return _client
+    with _client_lock:
+        if _client is None or _client_config != config:
+            if _client is not None:
+                _client.close()
+            _client = InferenceClient(
+                api_url,
+                api_key,
+                pool_size=int(os.getenv("RAINDROP_POOL_SIZE", "10")),
+                **_client_settings(),
+            )
+            _client_config = config
+    return _client
+
+
+def _client_settings() -> Dict[str, Any]:
+    return {
+        "connect_timeout": float(os.getenv("RAINDROP_CONNECT_TIMEOUT", "3.05")),
+        "read_timeout": float(os.getenv("RAINDROP_READ_TIMEOUT", "15")),
+        "max_retries": int(os.getenv("RAINDROP_MAX_RETRIES", "2")),
+        "breaker": CircuitBreaker(
+            failure_threshold=int(os.getenv("RAINDROP_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("RAINDROP_BREAKER_RESET", "30")),
+        ),
+    }
+
+
+def get_async_client() -> Optional[AsyncInferenceClient]:
+    """Return the shared async client, or None when SmartInference is not configured.
+
+    Must be called from the event loop that will use the client.
+    """
+    global _async_client, _async_client_config
+    api_url = os.getenv("RAINDROP_API_URL")
+    api_key = os.getenv("RAINDROP_API_KEY")
+    if not (api_url and api_key):
+        return None
+    config = (api_url, api_key)
+    if _async_client is None or _async_client_config != config:
+        _async_client = AsyncInferenceClient(
+            api_url,
+            api_key,
+            pool_size=int(os.getenv("RAINDROP_ASYNC_POOL_SIZE", "100")),
+            **_client_settings(),
+        )
+        _async_client_config = config
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client, _async_client_config
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_config = None
+
+
+def client_stats() -> Optional[Dict[str, Any]]:
+    """Circuit breaker state of the shared sync client, if one exists."""
+    if _client is None:
+        return None
+    return _client.breaker.stats()
+
+
+def build_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the SmartInference request body from a quest request."""
+    return {
+        "mission_idea": (data.get("mission_idea") or "").strip(),
+        "help_mode": data.get("help_mode") or "supplies",
+        "who": (data.get("who") or "").strip(),
+        "where": (data.get("where") or "").strip(),
+        "outcome": (data.get("outcome") or "").strip(),
+    }
+
+
+def upstream_slots(client: Optional[Any]) -> Optional[rate_limit.ConcurrencyLimiter]:
+    """The admission limiter to hold around a call to ``client``.
+
+    None when no call would reach SmartInference (not configured, or the
+    circuit is open) or admission control is off: offline generation costs
+    no upstream quota and is never shed.
+    """
+    if client is None or client.breaker.state == CircuitBreaker.OPEN:
+        return None
+    return rate_limit.inference_slots()
+
+
+def async_upstream_slots(client: Optional[Any]) -> Optional[rate_limit.AsyncConcurrencyLimiter]:
+    """:func:`upstream_slots` for callers on the ASGI event loop."""
+    if client is None or client.breaker.state == CircuitBreaker.OPEN:
+        return None
+    return rate_limit.async_inference_slots()
+
+
+def generate_with_fallback(
+    data: Dict[str, Any],
+    fallback: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Generate a quest via SmartInference, or with ``fallback`` when that fails.
+
+    :raises rate_limit.Overloaded: when too many SmartInference calls are
+        in flight in this worker (see ``rate_limit.inference_slots``).
+    """
+    return generate_with_source(data, fallback)[0]
+
+
+def generate_with_source(
+    data: Dict[str, Any],
+    fallback: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Tuple[Dict[str, Any], str]:
+    """:func:`generate_with_fallback`, also returning where the quest came from.
+
+    The source is ``"smartinference"``, ``"fallback"`` (SmartInference is
+    configured but failed) or ``"offline"`` (it is not configured), the same
+    labels as ``citizen_hero_quest_generations_total``.
+    """
+    client = get_client()
+    if client is not None:
+        slots = upstream_slots(client)
+        if slots is None:
+            quest = client.generate(build_payload(data))
+        else:
+            with slots.slot():
+                quest = client.generate(build_payload(data))
+        source = "smartinference" if quest is not None else "fallback"
+    else:
+        quest, source = None, "offline"
+    metrics.inc("citizen_hero_quest_generations_total", source)
+    return (quest if quest is not None else fallback(data)), source
+
+
+async def agenerate_with_fallback(
+    data: Dict[str, Any],
+    fallback: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Async :func:`generate_with_fallback` for the ASGI entry point.
+
+    :raises rate_limit.Overloaded: when too many SmartInference calls are
+        in flight in this worker (see ``rate_limit.async_inference_slots``).
+    """
+    return (await agenerate_with_source(data, fallback))[0]
+
+
+async def agenerate_with_source(
+    data: Dict[str, Any],
+    fallback: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Tuple[Dict[str, Any], str]:
+    """Async :func:`generate_with_source`."""
+    client = get_async_client()
+    if client is not None:
+        slots = async_upstream_slots(client)
+        acquired_at = await slots.acquire() if slots is not None else None
+        try:
+            quest = await client.generate(build_payload(data))
+        finally:
+            if slots is not None:
+                slots.release(acquired_at)
+        source = "smartinference" if quest is not None else "fallback"
+    else:
+        quest, source = None, "offline"
+    metrics.inc("citizen_hero_quest_generations_total", source)
+    return (quest if quest is not None else fallback(data)), source
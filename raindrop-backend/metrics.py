@@ -0,0 +1,285 @@
+"""
+Minimal Prometheus-style metrics for the Citizen Hero API.
+
+Counters and histograms live in process memory behind one lock, so an
+observation costs a dict lookup, a bisect and a few additions.  Gauges
+are collected lazily from callbacks (pool, cache, circuit breaker) only
+when ``/metrics`` is scraped.
+
+Multi-worker deployments (e.g. ``gunicorn -w 2``) set ``METRICS_DIR`` to a
+directory shared by the workers.  Each worker then snapshots its own
+counters and histograms to ``metrics-<pid>.json`` in that directory (at
+most every ``METRICS_FLUSH_INTERVAL`` seconds, and on every scrape), and
+whichever worker answers ``/metrics`` merges all snapshots: counters and
+histograms are summed across workers, gauges are reported per ``pid``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Latency buckets in seconds, tuned for 1ms DB reads up to 15s inference calls.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+_lock = threading.Lock()
+# name -> {"type", "help", "labels", "buckets"?}
+_metadata: Dict[str, Dict[str, Any]] = {}
+# name -> {label_values_tuple: value}
+_counters: Dict[str, Dict[Tuple[str, ...], float]] = {}
+# name -> {label_values_tuple: [bucket_counts..., sum, count]}
+_histograms: Dict[str, Dict[Tuple[str, ...], List[float]]] = {}
+_gauge_callbacks: List[Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]] = []
+_last_flush = 0.0
+
+
+def counter(name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+    """Declare a counter so it shows up with HELP/TYPE lines."""
+    _metadata[name] = {"type": "counter", "help": help_text, "labels": labels}
+    _counters.setdefault(name, {})
+
+
+def histogram(name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> None:
+    """Declare a histogram with the given bucket upper bounds."""
+    _metadata[name] = {"type": "histogram", "help": help_text, "labels": labels, "buckets": tuple(buckets)}
+    _histograms.setdefault(name, {})
+
+
+def inc(name: str, *label_values: str, amount: float = 1.0) -> None:
+    with _lock:
+        series = _counters[name]
+        series[label_values] = series.get(label_values, 0.0) + amount
+
+
+def observe(name: str, value: float, *label_values: str) -> None:
+    buckets = _metadata[name]["buckets"]
+    index = bisect_left(buckets, value)
+    with _lock:
+        series = _histograms[name]
+        state = series.get(label_values)
+        if state is None:
+            # One slot per bucket, then +Inf, sum and count.
+            state = series[label_values] = [0.0] * (len(buckets) + 3)
+        state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+
+@contextmanager
+def timer(name: str, *label_values: str):
+    """Observe the wall time of a ``with`` block into histogram ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, *label_values)
+
+
+def register_gauges(callback: Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]) -> None:
+    """Register a callback yielding ``(name, help, labels, value)`` at scrape time."""
+    _gauge_callbacks.append(callback)
+
+
+# ---------------------------------------------------------------------------
+# Well-known metrics
+# ---------------------------------------------------------------------------
+
+counter("citizen_hero_http_requests_total", "HTTP requests handled.", ("route", "method", "status"))
+histogram("citizen_hero_http_request_duration_seconds", "HTTP request latency.", ("route", "method", "status"))
+histogram("citizen_hero_db_call_duration_seconds", "Time spent in db.py helpers.", ("function", "outcome"))
+counter("citizen_hero_inference_requests_total",
+        "SmartInference calls by outcome (success, timeout, error, circuit_open).", ("outcome",))
+histogram("citizen_hero_inference_duration_seconds", "SmartInference call latency, retries included.", ("outcome",))
+counter("citizen_hero_quest_generations_total",
+        "Quests generated by source (smartinference, fallback, offline).", ("source",))
+
+
+def timed_db(func):
+    """Decorator recording a db helper's latency and whether it raised."""
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            observe("citizen_hero_db_call_duration_seconds", time.perf_counter() - started, name, outcome)
+
+    return wrapper
+
+
+def record_inference(outcome: str, seconds: float = None) -> None:
+    inc("citizen_hero_inference_requests_total", outcome)
+    if seconds is not None:
+        observe("citizen_hero_inference_duration_seconds", seconds, outcome)
+
+
+def record_request(route: str, method: str, status: int, seconds: float) -> None:
+    status_text = str(status)
+    inc("citizen_hero_http_requests_total", route, method, status_text)
+    observe("citizen_hero_http_request_duration_seconds", seconds, route, method, status_text)
+    if METRICS_DIR:
+        maybe_flush()
+
+
+# ---------------------------------------------------------------------------
+# Multi-process snapshots
+# ---------------------------------------------------------------------------
+
+def _snapshot() -> Dict[str, Any]:
+    with _lock:
+        counters = {name: [[list(k), v] for k, v in series.items()] for name, series in _counters.items()}
+        histograms = {name: [[list(k), list(v)] for k, v in series.items()] for name, series in _histograms.items()}
+    return {"pid": os.getpid(), "counters": counters, "histograms": histograms, "gauges": _collect_gauges()}
+
+
+def _collect_gauges() -> List[List[Any]]:
+    gauges = []
+    for callback in _gauge_callbacks:
+        try:
+            for name, help_text, labels, value in callback():
+                if value is not None:
+                    gauges.append([name, help_text, labels, float(value)])
+        except Exception as exc:
+            print(f"Metrics gauge callback failed: {exc}")
+    return gauges
+
+
+def flush() -> None:
+    """Write this worker's snapshot into ``METRICS_DIR`` (atomic rename)."""
+    global _last_flush
+    if not METRICS_DIR:
+        return
+    _last_flush = time.monotonic()
+    path = os.path.join(METRICS_DIR, f"metrics-{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(_snapshot(), fh)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        print(f"Metrics snapshot failed: {exc}")
+
+
+def maybe_flush() -> None:
+    if time.monotonic() - _last_flush >= METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def _load_snapshots() -> List[Dict[str, Any]]:
+    if not METRICS_DIR:
+        return [_snapshot()]
+    flush()
+    snapshots = []
+    # Gauges from workers that stopped reporting are stale; counters are kept.
+    stale_before = time.time() - max(60.0, METRICS_FLUSH_INTERVAL * 4)
+    for filename in os.listdir(METRICS_DIR):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        path = os.path.join(METRICS_DIR, filename)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                snapshot = json.load(fh)
+            if os.path.getmtime(path) < stale_before:
+                snapshot["gauges"] = []
+        except (OSError, ValueError):
+            continue
+        snapshots.append(snapshot)
+    return snapshots
+
+
+# ---------------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render() -> str:
+    """Render all metrics (merged across workers) in Prometheus text format."""
+    snapshots = _load_snapshots()
+    counters: Dict[str, Dict[Tuple[str, ...], float]] = {}
+    histograms: Dict[str, Dict[Tuple[str, ...], List[float]]] = {}
+    gauges: Dict[str, Tuple[str, List[Tuple[Dict[str, str], float]]]] = {}
+    multi = len(snapshots) > 1 or bool(METRICS_DIR)
+
+    for snapshot in snapshots:
+        for name, series in snapshot["counters"].items():
+            merged = counters.setdefault(name, {})
+            for labels, value in series:
+                key = tuple(labels)
+                merged[key] = merged.get(key, 0.0) + value
+        for name, series in snapshot["histograms"].items():
+            merged = histograms.setdefault(name, {})
+            for labels, values in series:
+                key = tuple(labels)
+                if key in merged and len(merged[key]) == len(values):
+                    merged[key] = [a + b for a, b in zip(merged[key], values)]
+                else:
+                    merged[key] = list(values)
+        for name, help_text, labels, value in snapshot["gauges"]:
+            if multi:
+                labels = dict(labels, pid=str(snapshot["pid"]))
+            gauges.setdefault(name, (help_text, []))[1].append((labels, value))
+
+    lines = []
+    for name, meta in _metadata.items():
+        lines.append(f"# HELP {name} {meta['help']}")
+        lines.append(f"# TYPE {name} {meta['type']}")
+        if meta["type"] == "counter":
+            for labels, value in sorted(counters.get(name, {}).items()):
+                lines.append(f"{name}{_format_labels(meta['labels'], labels)} {_format_value(value)}")
+        else:
+            buckets = meta["buckets"]
+            for labels, state in sorted(histograms.get(name, {}).items()):
+                cumulative = 0.0
+                for bound, count in zip(buckets + (float("inf"),), state[:-2]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(meta['labels'], labels, (('le', le),))} "
+                        f"{_format_value(cumulative)}"
+                    )
+                lines.append(f"{name}_sum{_format_labels(meta['labels'], labels)} {_format_value(state[-2])}")
+                lines.append(f"{name}_count{_format_labels(meta['labels'], labels)} {_format_value(state[-1])}")
+
+    for name, (help_text, samples) in sorted(gauges.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            names = sorted(labels)
+            lines.append(f"{name}{_format_labels(names, [labels[n] for n in names])} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Clear all recorded samples (used by tests)."""
+    with _lock:
+        for series in _counters.values():
+            series.clear()
+        for series in _histograms.values():
+            series.clear()
@@ -0,0 +1,257 @@
+"""
+Response cache for quest generation.
+
+Classrooms routinely send the same mission from thirty browsers at once,
+and every one of them used to pay a full SmartInference round trip (or at
+least a template build).  ``QuestCache`` stores generated quests keyed on
+a normalized form of the request so near-identical payloads share one
+generation:
+
+- ``mission_idea``, ``who``, ``where`` and ``outcome`` are lower-cased,
+  stripped of punctuation and whitespace-collapsed.
+- ``help_mode`` is kept verbatim as its own key component, so a quest is
+  never served for a different help mode than it was generated for.
+
+Only SmartInference and offline-template quests are cached (see
+``CACHED_SOURCES``).  A fallback quest means SmartInference is configured
+but failing; caching it would keep serving the template for the whole TTL
+after SmartInference recovers.
+
+The in-process tier is an LRU with a TTL.  Setting
+``QUEST_CACHE_SQLITE_PATH`` adds a shared SQLite tier so every worker on
+the host benefits from a quest generated by any of them.
+
+Environment variables:
+
+- ``QUEST_CACHE_SIZE`` (default 1024) – LRU entries; 0 disables caching.
+- ``QUEST_CACHE_TTL`` (default 300) – seconds before an entry expires.
+- ``QUEST_CACHE_SQLITE_PATH`` – optional path of the shared SQLite tier.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Request fields that change the generated quest, besides help_mode.
+KEY_FIELDS = ("mission_idea", "who", "where", "outcome")
+
+# ``inference_client.generate_with_source`` sources whose quests are cached.
+CACHED_SOURCES = frozenset({"smartinference", "offline"})
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(value: Any) -> str:
+    """Lower-case ``value``, drop punctuation and collapse whitespace."""
+    text = _PUNCTUATION.sub("", str(value or "").lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(data: Dict[str, Any]) -> str:
+    """Return the cache key for a quest request.
+
+    ``help_mode`` is resolved exactly as the generators resolve it (falling
+    back to "supplies") and is deliberately not normalized; so is the
+    template ``locale``.
+    """
+    help_mode = data.get("help_mode") or "supplies"
+    parts = [str(help_mode)] + [normalize_text(data.get(field)) for field in KEY_FIELDS]
+    # Only appended when set, so keys for requests without a locale (and
+    # entries already in a shared SQLite tier) are unchanged.
+    if data.get("locale"):
+        parts.append(str(data["locale"]))
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheTier:
+    """Shared cache tier stored in a SQLite file, one connection per thread."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS quest_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT value FROM quest_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO quest_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+
+    def purge_expired(self) -> int:
+        with self._connection() as conn:
+            return conn.execute(
+                "DELETE FROM quest_cache WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+
+
+class QuestCache:
+    """LRU + TTL cache of generated quests with an optional shared tier.
+
+    Values are stored as JSON text and decoded on every hit, so callers
+    always get their own copy and can annotate it freely.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, shared: Optional[SQLiteCacheTier] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return json.loads(value)
+                del self._entries[key]
+                self._counters["expired"] += 1
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except sqlite3.Error as exc:
+                print(f"Shared quest cache read failed: {exc}")
+                value = None
+            if value is not None:
+                self._store_local(key, value)
+                with self._lock:
+                    self._counters["shared_hits"] += 1
+                return json.loads(value)
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def set(self, key: str, quest: Dict[str, Any]) -> None:
+        value = json.dumps(quest, ensure_ascii=False)
+        self._store_local(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, self.ttl)
+            except sqlite3.Error as exc:
+                print(f"Shared quest cache write failed: {exc}")
+
+    def get_or_generate(
+        self,
+        data: Dict[str, Any],
+        generate: Callable[[Dict[str, Any]], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Return a cached quest for ``data`` or generate and cache one."""
+        key = cache_key(data)
+        quest = self.get(key)
+        if quest is None:
+            quest = generate(data)
+            self.set(key, quest)
+        return quest
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot.update({
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "shared": self.shared is not None,
+            })
+        lookups = snapshot["hits"] + snapshot["shared_hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = round((snapshot["hits"] + snapshot["shared_hits"]) / lookups, 4) if lookups else 0.0
+        return snapshot
+
+    def _store_local(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+
+_cache: Optional[QuestCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[QuestCache]:
+    """Return the process-wide quest cache, or None if caching is disabled."""
+    global _cache
+    maxsize = int(os.getenv("QUEST_CACHE_SIZE", "1024"))
+    if maxsize <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared_path = os.getenv("QUEST_CACHE_SQLITE_PATH")
+                shared = None
+                if shared_path:
+                    try:
+                        shared = SQLiteCacheTier(shared_path)
+                    except sqlite3.Error as exc:
+                        print(f"Shared quest cache disabled: {exc}")
+                _cache = QuestCache(
+                    maxsize=maxsize,
+                    ttl=float(os.getenv("QUEST_CACHE_TTL", "300")),
+                    shared=shared,
+                )
+    return _cache
+
+
+def get_or_generate(
+    data: Dict[str, Any],
+    generate: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Serve ``data`` from the shared cache when enabled, else just generate."""
+    cache = get_cache()
+    if cache is None:
+        return generate(data)
+    return cache.get_or_generate(data, generate)
+
+
+def cache_stats() -> Optional[Dict[str, Any]]:
+    """Return cache statistics, or None if caching is disabled."""
+    cache = get_cache()
+    return cache.stats() if cache is not None else None
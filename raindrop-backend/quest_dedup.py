@@ -0,0 +1,120 @@
+"""
+Content-addressed storage of shared quest bodies (``QUEST_DEDUP=1``).
+
+Offline quests from ``generate_quest`` are the same template for every
+mission of a help mode, with only the mission idea slotted into a few
+strings.  With dedup on, such a quest is stored as:
+
+- a body in ``quest_bodies``: the quest minus ``ROW_FIELDS``, the mission
+  idea replaced by ``MISSION_TOKEN``, as compact JSON keyed by its SHA-256
+  and shared by every quest rendered from that template;
+- on the quest row: ``quest_json`` holding only ``ROW_FIELDS`` (which the
+  stats triggers read), plus ``body_hash`` and ``body_mission``.
+
+Both backends reassemble the quest inside the query (``quest_document``),
+so reads, exports, step progress and the JSON passthrough all see the full
+quest whether or not it was deduplicated, and whatever ``QUEST_DEDUP`` is
+now.  SmartInference quests, and any quest whose split would not
+reassemble exactly, are stored whole as before.  Bodies are never deleted:
+there is one per template version.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+MISSION_TOKEN = "{{mission_idea}}"
+ROW_FIELDS = ("quest_name", "help_mode")
+
+# Postgres: bodies, the row columns, and the function reads use in place of
+# quest_json (db_async creates them too, as the async mode may run alone).
+POSTGRES_DDL = """
+CREATE TABLE IF NOT EXISTS quest_bodies (
+    hash TEXT PRIMARY KEY,
+    body TEXT NOT NULL
+);
+ALTER TABLE quests
+    ADD COLUMN IF NOT EXISTS body_hash TEXT,
+    ADD COLUMN IF NOT EXISTS body_mission TEXT;
+
+CREATE OR REPLACE FUNCTION quest_document(p_quest_json JSONB, p_body_hash TEXT, p_mission TEXT)
+RETURNS JSONB AS $$
+    SELECT CASE WHEN p_body_hash IS NULL THEN p_quest_json ELSE (
+        SELECT replace(b.body, '{{mission_idea}}',
+                       COALESCE(substr(to_jsonb(p_mission)::text, 2, length(to_jsonb(p_mission)::text) - 2), ''))::jsonb
+        FROM quest_bodies AS b WHERE b.hash = p_body_hash
+    ) || COALESCE(p_quest_json, '{}'::jsonb) END
+$$ LANGUAGE sql STABLE;
+"""
+
+# Bodies already written, per database (SQLite path or Postgres URL).
+_known_hashes: Dict[str, set] = {}
+_lock = threading.Lock()
+
+
+class StoredQuest(NamedTuple):
+    """How one quest is written: ``body`` is None when stored whole."""
+
+    quest_json: Dict[str, Any]
+    body_hash: Optional[str] = None
+    body_mission: Optional[str] = None
+    body: Optional[str] = None
+
+
+def enabled() -> bool:
+    # Read per call so tests (and tools) can switch it.
+    return os.getenv("QUEST_DEDUP", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def join_quest(body: str, row_fields: Dict[str, Any], mission: Optional[str]) -> Dict[str, Any]:
+    """Reassemble a quest in Python, exactly as ``quest_document`` does in SQL."""
+    if mission is not None:
+        body = body.replace(MISSION_TOKEN, json.dumps(mission, ensure_ascii=False)[1:-1])
+    quest = json.loads(body)
+    quest.update(row_fields)
+    return quest
+
+
+def split_quest(quest: Dict[str, Any]) -> StoredQuest:
+    """Split ``quest`` into a shared body and row fields when dedup is on
+    and it was rendered from an offline template; else store it whole."""
+    if not enabled():
+        return StoredQuest(quest)
+    # Loaded on first use: it compiles the quest templates.
+    import generate_quest
+
+    match = generate_quest.match_offline_quest(quest)
+    if match is None:
+        return StoredQuest(quest)
+    locale, mission = match
+    template = generate_quest.generate_quest({
+        "mission_idea": MISSION_TOKEN if mission else "",
+        "help_mode": quest["help_mode"],
+        "locale": locale,
+    })
+    body = json.dumps(
+        {key: value for key, value in template.items() if key not in ROW_FIELDS},
+        ensure_ascii=False, separators=(",", ":"), sort_keys=True,
+    )
+    row_fields = {key: quest[key] for key in ROW_FIELDS if key in quest}
+    mission = mission or None
+    if join_quest(body, row_fields, mission) != quest:
+        return StoredQuest(quest)
+    return StoredQuest(row_fields, hashlib.sha256(body.encode("utf-8")).hexdigest(), mission, body)
+
+
+def new_bodies(database: str, stored: Iterable[StoredQuest]) -> Dict[str, str]:
+    """``{hash: body}`` for bodies this process has not written to ``database``."""
+    with _lock:
+        known = _known_hashes.get(database, ())
+        return {s.body_hash: s.body for s in stored if s.body_hash and s.body_hash not in known}
+
+
+def remember(database: str, hashes: Iterable[str]) -> None:
+    """Record bodies as written, once their transaction has committed."""
+    with _lock:
+        _known_hashes.setdefault(database, set()).update(hashes)
@@ -0,0 +1,197 @@
+"""
+Bulk export and import of quests as NDJSON (one JSON record per line).
+
+Each record carries everything needed to restore a quest::
+
+    {"id": 42, "session_id": "...", "created_at": "2024-03-05T14:30:00+00:00",
+     "quest": {...quest_json...}, "completed_step_ids": [1, 2],
+     "earned_sgxp": 25, "total_sgxp": 100}
+
+Export streams rows from a server-side cursor (``db.iter_quest_export``),
+so memory stays flat at any table size.  Import sends ``execute_values``
+batches (``db.import_quests``), one transaction per batch, and can record a
+checkpoint after every committed batch so an interrupted run resumes where
+it stopped.  Records keep their ids; ids that already exist are skipped.
+
+Command line (from ``raindrop-backend/``; uses the configured ``db`` backend)::
+
+    python quest_io.py export > quests.ndjson
+    python quest_io.py export --session-id <client id> -o hero.ndjson
+    python quest_io.py import quests.ndjson --checkpoint quests.ckpt
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+import db
+import quest_read_cache
+
+IMPORT_BATCH_SIZE = int(os.getenv("QUEST_IMPORT_BATCH_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("QUEST_EXPORT_BATCH_SIZE", "1000"))
+
+
+def iter_ndjson(session_id: Optional[str] = None, after_id: int = 0,
+                batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Yield export records as newline-terminated UTF-8 lines."""
+    for record in db.iter_quest_export(session_id=session_id, after_id=after_id, batch_size=batch_size):
+        yield record.encode("utf-8") + b"\n"
+
+
+def export_ndjson(out, session_id: Optional[str] = None, after_id: int = 0,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Write export records to the binary file ``out``; returns the count."""
+    count = 0
+    for line in iter_ndjson(session_id=session_id, after_id=after_id, batch_size=batch_size):
+        out.write(line)
+        count += 1
+    return count
+
+
+def parse_record(line: str) -> Dict[str, Any]:
+    """
+    Turn one NDJSON line into a record for ``db.import_quests``.
+
+    ``total_sgxp`` and ``earned_sgxp`` are recomputed from the quest's steps
+    when missing, using the same rules as the HUD (``db.step_rewards``).
+
+    :raises ValueError: if the line is not a JSON object with a quest.
+    """
+    raw = json.loads(line)
+    if not isinstance(raw, dict) or not isinstance(raw.get("quest"), dict):
+        raise ValueError("expected an object with a 'quest' object")
+    quest = raw["quest"]
+    rewards = db.step_rewards(quest)
+    completed = sorted({step_id for step_id in raw.get("completed_step_ids") or [] if step_id in rewards})
+    quest_id = raw.get("id")
+    if quest_id is not None and (not isinstance(quest_id, int) or quest_id < 1):
+        raise ValueError(f"invalid id {quest_id!r}")
+    return {
+        "id": quest_id,
+        "session_id": raw.get("session_id"),
+        "created_at": raw.get("created_at"),
+        "quest": quest,
+        "completed_step_ids": completed,
+        "earned_sgxp": raw.get("earned_sgxp", sum(rewards[step_id] for step_id in completed)),
+        "total_sgxp": raw.get("total_sgxp", sum(rewards.values())),
+    }
+
+
+def _read_checkpoint(path: Optional[str]) -> Dict[str, int]:
+    if not path or not os.path.exists(path):
+        return {"lines": 0, "inserted": 0}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _write_checkpoint(path: Optional[str], state: Dict[str, int]) -> None:
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+    os.replace(tmp_path, path)
+
+
+def import_ndjson(
+    lines: Iterable[str],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    import_batch: Optional[Callable[[list], int]] = None,
+) -> Dict[str, int]:
+    """
+    Import NDJSON records in batches of ``batch_size``.
+
+    With ``checkpoint_path``, the number of input lines committed so far is
+    saved after every batch and those lines are skipped on the next run, so
+    pass the same input file again to resume.  ``progress`` is called with
+    the running totals after each batch.
+
+    :returns: ``{"lines", "inserted", "resumed_from"}``
+    :raises ValueError: on a malformed line (earlier batches stay committed).
+    """
+    import_batch = import_batch or db.import_quests
+    state = _read_checkpoint(checkpoint_path)
+    resumed_from = state["lines"]
+    batch = []
+    line_no = 0
+
+    def commit():
+        state["inserted"] += import_batch(batch)
+        quest_read_cache.invalidate_sessions(r["session_id"] for r in batch if r["session_id"] is not None)
+        state["lines"] = line_no
+        batch.clear()
+        _write_checkpoint(checkpoint_path, state)
+        if progress is not None:
+            progress(dict(state))
+
+    for line_no, line in enumerate(lines, start=1):
+        if line_no <= resumed_from:
+            continue
+        if not line.strip():
+            continue
+        try:
+            batch.append(parse_record(line))
+        except ValueError as exc:
+            raise ValueError(f"line {line_no}: {exc}") from exc
+        if len(batch) >= batch_size:
+            commit()
+    if batch:
+        commit()
+    return {"lines": max(line_no, resumed_from), "inserted": state["inserted"], "resumed_from": resumed_from}
+
+
+def main(argv=None) -> int:
+    # Only the command line needs argparse; keep it off the app's import path.
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or import Citizen Hero quests as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="stream quests to NDJSON")
+    export_cmd.add_argument("-o", "--output", help="output file (default: stdout)")
+    export_cmd.add_argument("--session-id", help="only export this session's quests")
+    export_cmd.add_argument("--after-id", type=int, default=0, help="resume after this quest id")
+
+    import_cmd = commands.add_parser("import", help="bulk insert quests from NDJSON")
+    import_cmd.add_argument("input", help="NDJSON file produced by export ('-' for stdin)")
+    import_cmd.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_cmd.add_argument("--checkpoint", help="file recording progress, for resuming")
+
+    args = parser.parse_args(argv)
+    started = time.monotonic()
+
+    if args.command == "export":
+        if args.output:
+            with open(args.output, "wb") as out:
+                count = export_ndjson(out, session_id=args.session_id, after_id=args.after_id)
+        else:
+            count = export_ndjson(sys.stdout.buffer, session_id=args.session_id, after_id=args.after_id)
+        print(f"Exported {count} quests in {time.monotonic() - started:.1f}s", file=sys.stderr)
+        return 0
+
+    def report(state):
+        elapsed = time.monotonic() - started
+        print(f"  {state['lines']} lines read, {state['inserted']} inserted ({elapsed:.1f}s)", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        result = import_ndjson(source, batch_size=args.batch_size, checkpoint_path=args.checkpoint, progress=report)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(
+        f"Imported {result['inserted']} quests from {result['lines']} lines"
+        f" (resumed after line {result['resumed_from']})",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
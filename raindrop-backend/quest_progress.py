@@ -0,0 +1,227 @@
+"""
+Server-side quest step progress with coalesced writes.
+
+``PATCH /quests/<id>/steps/<step_id>`` used to be a pure browser concern.
+Writing every checkbox toggle straight to Postgres would turn a few rapid
+clicks into as many row updates, so toggles are applied to an in-memory
+view of the quest and answered immediately, and a background thread
+flushes everything that changed every ``PROGRESS_FLUSH_INTERVAL`` seconds
+as one batched transaction (``db.apply_step_progress``).  Only the last
+state of each step within a flush window is written.
+
+The flush sends per-step toggles rather than whole sets, and the database
+applies them on top of the stored row, so workers flushing concurrently do
+not overwrite each other's steps.  Readers call :meth:`ProgressTracker.flush`
+first when this worker still holds unflushed toggles for the quests being
+read, so a client always sees its own writes.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import db
+import quest_read_cache
+
+PROGRESS_FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "0.5"))
+# Flush early once this many quests have unflushed toggles.
+PROGRESS_MAX_PENDING = int(os.getenv("PROGRESS_MAX_PENDING", "500"))
+
+
+class _QuestView:
+    __slots__ = ("session_id", "rewards", "completed", "changes")
+
+    def __init__(self, session_id: str, rewards: Dict[int, int], completed) -> None:
+        self.session_id = session_id
+        self.rewards = rewards
+        self.completed = set(completed) & rewards.keys()
+        # step_id -> completed, last toggle wins until the next flush
+        self.changes: Dict[int, bool] = {}
+
+    def progress(self, quest_id: int) -> Dict[str, Any]:
+        return {
+            "id": quest_id,
+            "completed_step_ids": sorted(self.completed),
+            "earned_sgxp": sum(self.rewards[step_id] for step_id in self.completed),
+            "total_sgxp": sum(self.rewards.values()),
+        }
+
+
+class ProgressTracker:
+    """Buffer step toggles per quest and write them back in batches.
+
+    :param load: ``load(quest_id)`` returning ``{"session_id", "rewards",
+        "completed_step_ids"}`` or None (see ``db.get_quest_progress``).
+    :param apply: ``apply({quest_id: {step_id: completed}})`` persisting one
+        batch (see ``db.apply_step_progress``).
+    :param on_flush: optional ``on_flush(session_ids)`` called after a batch
+        is written, with the sessions whose quests it changed.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[int], Optional[Dict[str, Any]]],
+        apply: Callable[[Dict[int, Dict[int, bool]]], Any],
+        flush_interval: float = PROGRESS_FLUSH_INTERVAL,
+        max_pending: int = PROGRESS_MAX_PENDING,
+        on_flush: Optional[Callable[[set], Any]] = None,
+    ) -> None:
+        self._load = load
+        self._apply = apply
+        self._on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, _QuestView] = {}
+        self._flushing: Dict[int, _QuestView] = {}
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"toggles": 0, "flushes": 0, "quests_written": 0, "failed_flushes": 0}
+
+    def toggle(self, session_id: str, quest_id: int, step_id: int, completed: bool) -> Optional[Dict[str, Any]]:
+        """Record one step toggle and return the quest's resulting progress.
+
+        Returns None if the quest does not exist or belongs to another
+        session.
+
+        :raises LookupError: if the quest has no step ``step_id``.
+        """
+        while True:
+            view = self._view(quest_id)
+            if view is None or view.session_id != session_id:
+                return None
+            if step_id not in view.rewards:
+                raise LookupError(f"Quest {quest_id} has no step {step_id}")
+            with self._lock:
+                # A flush may have taken the view since it was looked up.
+                if self._pending.get(quest_id) is not view:
+                    continue
+                if completed:
+                    view.completed.add(step_id)
+                else:
+                    view.completed.discard(step_id)
+                view.changes[step_id] = completed
+                self._counters["toggles"] += 1
+                progress = view.progress(quest_id)
+                backlog = len(self._pending)
+                break
+        self._ensure_thread()
+        if backlog >= self.max_pending:
+            self._wakeup.set()
+        return progress
+
+    def _view(self, quest_id: int) -> Optional[_QuestView]:
+        with self._lock:
+            view = self._pending.get(quest_id)
+            if view is not None:
+                return view
+            # A batch holding this quest may still be on its way to the
+            # database; start from its state instead of the stale row.
+            base = self._flushing.get(quest_id)
+        if base is None:
+            loaded = self._load(quest_id)
+            if loaded is None:
+                return None
+            view = _QuestView(loaded["session_id"], loaded["rewards"], loaded["completed_step_ids"])
+        else:
+            view = _QuestView(base.session_id, base.rewards, base.completed)
+        with self._lock:
+            return self._pending.setdefault(quest_id, view)
+
+    def has_pending(self, session_id: Optional[str] = None, quest_id: Optional[int] = None) -> bool:
+        """True if toggles for this session (or quest) are not yet in the database."""
+        with self._lock:
+            if quest_id is not None:
+                return quest_id in self._pending or quest_id in self._flushing
+            views = list(self._pending.values()) + list(self._flushing.values())
+        return any(session_id is None or view.session_id == session_id for view in views)
+
+    def flush(self) -> int:
+        """Write all buffered toggles now; returns the number of quests flushed."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            changes = {quest_id: dict(view.changes) for quest_id, view in batch.items() if view.changes}
+            try:
+                if changes:
+                    self._apply(changes)
+            except Exception as exc:
+                print(f"Progress flush failed, will retry: {exc}")
+                with self._lock:
+                    self._counters["failed_flushes"] += 1
+                    # Keep the batch; toggles made since the swap take precedence.
+                    for quest_id, view in batch.items():
+                        newer = self._pending.get(quest_id)
+                        if newer is not None:
+                            newer.changes = {**view.changes, **newer.changes}
+                        else:
+                            self._pending[quest_id] = view
+                return 0
+            finally:
+                with self._lock:
+                    self._flushing = {}
+            if changes:
+                with self._lock:
+                    self._counters["flushes"] += 1
+                    self._counters["quests_written"] += len(changes)
+                if self._on_flush is not None:
+                    self._on_flush({batch[quest_id].session_id for quest_id in changes})
+            return len(changes)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="quest-progress-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the background flusher after writing what is buffered."""
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters, pending=len(self._pending))
+
+
+_tracker: Optional[ProgressTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker() -> ProgressTracker:
+    """Process-wide tracker backed by ``db`` (created on first use)."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                # Readers on other workers may have cached the pre-flush rows.
+                _tracker = ProgressTracker(
+                    db.get_quest_progress, db.apply_step_progress, on_flush=quest_read_cache.invalidate_sessions
+                )
+                atexit.register(_tracker.close)
+    return _tracker
+
+
+def progress_stats() -> Optional[Dict[str, int]]:
+    """Counters for the metrics endpoint, or None before the first toggle."""
+    return _tracker.stats() if _tracker is not None else None
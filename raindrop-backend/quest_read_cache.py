@@ -0,0 +1,407 @@
+"""
+Read-through cache for ``GET /quests`` pages and ``GET /quests/<id>``.
+
+Stored quests only change when they are deleted, when their steps are
+toggled, or (for Suit Log pages) when the session generates a new quest, so
+the HUD's constant refreshes can be answered from memory.  Rather than
+tracking which cached pages contain which quests, every session has a
+*version token* and every cached response remembers the token it was read
+under:
+
+- any write for a session calls :func:`invalidate`, which gives the session
+  a new random token; every cached page and quest of that session becomes
+  stale at once and is refilled on the next read;
+- the token is read *before* the database, so a read racing a write is
+  stored under the old token and never served;
+- the token plus the request key is the response's ``ETag``, so a client
+  revalidating an unchanged Suit Log gets ``304 Not Modified`` without a
+  database query or even a cache entry.
+
+Tokens are random rather than counters, so ETags issued before a restart
+are never mistaken for current ones.
+
+The in-process tier is an LRU with a TTL.  Each worker has its own tokens,
+so with several workers a write made through one of them only reaches the
+others' caches when their entries expire.  Setting
+``QUEST_READ_CACHE_SQLITE_PATH`` moves tokens and entries into a SQLite file
+shared by every worker on the host, which makes invalidation exact.
+
+Environment variables:
+
+- ``QUEST_READ_CACHE_SIZE`` (default 2048) – LRU entries; 0 disables the
+  cache and ETags.
+- ``QUEST_READ_CACHE_TTL`` (default 30) – seconds before an entry expires.
+- ``QUEST_READ_CACHE_SQLITE_PATH`` – optional path of the shared tier.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class CachedResponse:
+    """One response body plus what is needed to validate it.
+
+    ``etag`` is None for a response that could not be tied to a version.
+    """
+
+    __slots__ = ("session_id", "token", "body", "next_cursor", "etag")
+
+    def __init__(self, session_id: str, token: Optional[str], body: bytes, next_cursor: Optional[str],
+                 etag: Optional[str]) -> None:
+        self.session_id = session_id
+        self.token = token
+        self.body = body
+        self.next_cursor = next_cursor
+        self.etag = etag
+
+
+def page_key(session_id: str, limit: int, cursor: Optional[str]) -> str:
+    return f"page|{session_id}|{limit}|{cursor or ''}"
+
+
+def quest_key(quest_id: int) -> str:
+    return f"quest|{quest_id}"
+
+
+def make_etag(token: str, key: str) -> str:
+    """ETag value (unquoted; sent as a weak ETag) for ``key`` read under ``token``."""
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return f"{token}-{digest}"
+
+
+def _new_token() -> str:
+    return secrets.token_hex(8)
+
+
+class SQLiteReadTier:
+    """Shared version tokens and responses in a SQLite file, one connection per thread."""
+
+    # Expired entries are deleted every this many writes.
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS read_cache_versions (
+                    session_id TEXT PRIMARY KEY,
+                    token TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS read_cache_entries (
+                    key TEXT PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    token TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    next_cursor TEXT,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self, session_id: str) -> str:
+        conn = self._connection()
+        row = conn.execute("SELECT token FROM read_cache_versions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is not None:
+            return row[0]
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO read_cache_versions (session_id, token) VALUES (?, ?)",
+                (session_id, _new_token()),
+            )
+        # Another worker may have won the insert; everyone uses its token.
+        return conn.execute("SELECT token FROM read_cache_versions WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def invalidate(self, session_id: str) -> str:
+        token = _new_token()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO read_cache_versions (session_id, token) VALUES (?, ?)",
+                (session_id, token),
+            )
+        return token
+
+    def invalidate_all(self) -> None:
+        with self._connection() as conn:
+            # A fresh random token per session, as invalidate() would give.
+            conn.execute("UPDATE read_cache_versions SET token = lower(hex(randomblob(8)))")
+
+    def get(self, key: str) -> Optional[Tuple[str, str, bytes, Optional[str]]]:
+        return self._connection().execute(
+            "SELECT session_id, token, body, next_cursor FROM read_cache_entries WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+
+    def set(self, key: str, entry: CachedResponse, ttl: float) -> None:
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO read_cache_entries (key, session_id, token, body, next_cursor, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.session_id, entry.token, entry.body, entry.next_cursor, now + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM read_cache_entries WHERE expires_at <= ?", (now,))
+
+
+class QuestReadCache:
+    """Version-validated LRU of encoded quest responses, with an optional shared tier."""
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 30.0, shared: Optional[SQLiteReadTier] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._versions: "OrderedDict[str, str]" = OrderedDict()
+        # quest id -> session id; a quest never changes owner.
+        self._owners: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "shared_hits": 0, "misses": 0, "stale": 0, "not_modified": 0, "invalidations": 0}
+
+    def version(self, session_id: str) -> str:
+        """Current version token of ``session_id`` (created on first use)."""
+        if self.shared is not None:
+            try:
+                return self.shared.version(session_id)
+            except sqlite3.Error as exc:
+                print(f"Shared read cache version lookup failed: {exc}")
+                # Never validate against a token that might be out of date.
+                return _new_token()
+        with self._lock:
+            token = self._versions.get(session_id)
+            if token is None:
+                token = self._versions[session_id] = _new_token()
+                # Forgetting a token only costs that session a cache miss.
+                while len(self._versions) > self.maxsize:
+                    self._versions.popitem(last=False)
+            else:
+                self._versions.move_to_end(session_id)
+            return token
+
+    def invalidate(self, session_id: str) -> None:
+        """Make every cached response of ``session_id`` stale."""
+        if self.shared is not None:
+            try:
+                self.shared.invalidate(session_id)
+            except sqlite3.Error as exc:
+                print(f"Shared read cache invalidation failed: {exc}")
+        with self._lock:
+            self._versions[session_id] = _new_token()
+            self._versions.move_to_end(session_id)
+            while len(self._versions) > self.maxsize:
+                self._versions.popitem(last=False)
+            self._counters["invalidations"] += 1
+
+    def invalidate_all(self) -> None:
+        """Make every cached response stale (writes that touch unknown sessions)."""
+        if self.shared is not None:
+            try:
+                self.shared.invalidate_all()
+            except sqlite3.Error as exc:
+                print(f"Shared read cache invalidation failed: {exc}")
+        with self._lock:
+            self._versions.clear()
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def get(self, key: str, token: Optional[str] = None) -> Optional[CachedResponse]:
+        """Return the cached response for ``key`` if it is still current.
+
+        ``token`` is the caller's already-read version of the session the
+        key belongs to; without it (single quests, whose session is only
+        known from the entry) the entry's own session is looked up.
+        """
+        now = time.monotonic()
+        entry = None
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                entry, expires_at = cached
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+                    entry = None
+        shared_hit = False
+        if entry is None and self.shared is not None:
+            try:
+                row = self.shared.get(key)
+            except sqlite3.Error as exc:
+                print(f"Shared read cache read failed: {exc}")
+                row = None
+            if row is not None:
+                session_id, entry_token, body, next_cursor = row
+                entry = CachedResponse(session_id, entry_token, bytes(body), next_cursor, make_etag(entry_token, key))
+                shared_hit = True
+        if entry is not None:
+            current = token if token is not None else self.version(entry.session_id)
+            if entry.token == current:
+                if shared_hit:
+                    self._store_local(key, entry)
+                with self._lock:
+                    self._counters["shared_hits" if shared_hit else "hits"] += 1
+                return entry
+            with self._lock:
+                self._counters["stale"] += 1
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def fetch_page(self, session_id: str, token: str, limit: int, cursor: Optional[str],
+                   load: Callable[[], Tuple[bytes, Optional[str]]]) -> CachedResponse:
+        """Serve a Suit Log page, calling ``load() -> (body, next_cursor)`` on a miss.
+
+        ``token`` must have been read with :meth:`version` before the call.
+        """
+        key = page_key(session_id, limit, cursor)
+        entry = self.get(key, token)
+        if entry is None:
+            body, next_cursor = load()
+            entry = self.put(key, session_id, token, body, next_cursor)
+        return entry
+
+    def fetch_quest(self, quest_id: int, load: Callable[[], Optional[Tuple[bytes, str]]]) -> Optional[CachedResponse]:
+        """Serve one quest, calling ``load() -> (body, session_id)`` or None on a miss.
+
+        The owner's token has to be read before the database, so a quest
+        whose owner is not known yet is returned uncached (and without an
+        ETag); from then on it is cached like a page.
+        """
+        key = quest_key(quest_id)
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            owner = self._owners.get(quest_id)
+        token = self.version(owner) if owner is not None else None
+        loaded = load()
+        if loaded is None:
+            return None
+        body, session_id = loaded
+        session_id = session_id or ""
+        if token is None or session_id != owner:
+            with self._lock:
+                self._owners[quest_id] = session_id
+                while len(self._owners) > self.maxsize:
+                    self._owners.popitem(last=False)
+            return CachedResponse(session_id, None, body, None, None)
+        return self.put(key, session_id, token, body)
+
+    def put(self, key: str, session_id: str, token: str, body: bytes,
+            next_cursor: Optional[str] = None) -> CachedResponse:
+        """Cache ``body`` as read under ``token``; returns the entry (with its ETag)."""
+        entry = CachedResponse(session_id, token, body, next_cursor, make_etag(token, key))
+        self._store_local(key, entry)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, entry, self.ttl)
+            except sqlite3.Error as exc:
+                print(f"Shared read cache write failed: {exc}")
+        return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._counters["not_modified"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._owners.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot.update({
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "shared": self.shared is not None,
+            })
+        lookups = snapshot["hits"] + snapshot["shared_hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = round((snapshot["hits"] + snapshot["shared_hits"]) / lookups, 4) if lookups else 0.0
+        return snapshot
+
+    def _store_local(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = (entry, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_cache: Optional[QuestReadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[QuestReadCache]:
+    """Return the process-wide read cache, or None if it is disabled."""
+    global _cache
+    maxsize = int(os.getenv("QUEST_READ_CACHE_SIZE", "2048"))
+    if maxsize <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared_path = os.getenv("QUEST_READ_CACHE_SQLITE_PATH")
+                shared = None
+                if shared_path:
+                    try:
+                        shared = SQLiteReadTier(shared_path)
+                    except sqlite3.Error as exc:
+                        print(f"Shared read cache disabled: {exc}")
+                _cache = QuestReadCache(
+                    maxsize=maxsize,
+                    ttl=float(os.getenv("QUEST_READ_CACHE_TTL", "30")),
+                    shared=shared,
+                )
+    return _cache
+
+
+def invalidate(session_id: str) -> None:
+    """Drop every cached response of ``session_id`` (no-op when disabled)."""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(session_id)
+
+
+def invalidate_sessions(session_ids: Iterable[str]) -> None:
+    for session_id in set(session_ids):
+        invalidate(session_id)
+
+
+def invalidate_all() -> None:
+    """Drop every cached response, e.g. after a retention purge (no-op when disabled)."""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate_all()
+
+
+def cache_stats() -> Optional[Dict[str, object]]:
+    """Return read cache statistics, or None if it is disabled."""
+    cache = get_cache()
+    return cache.stats() if cache is not None else None
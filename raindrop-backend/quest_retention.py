@@ -0,0 +1,86 @@
+"""
+Partition maintenance and retention for the quests table.
+
+On Postgres, ``quests`` is range partitioned by month on ``created_at``.
+Run ``purge`` daily (cron, a scheduled job): it creates the partitions for
+the coming ``QUEST_PARTITIONS_AHEAD`` months, then removes quests older than
+``QUEST_RETENTION_MONTHS`` whole months by dropping their partitions, which
+takes no row locks and leaves nothing for vacuum.  Rows that share a
+partition with newer ones (the converted legacy table) and every expired
+row on SQLite are deleted ``QUEST_DELETE_CHUNK_SIZE`` at a time instead.
+A purge that removed anything invalidates the quest read cache, so
+workers sharing ``QUEST_READ_CACHE_SQLITE_PATH`` stop serving the purged
+quests at once.
+
+Command line (from ``raindrop-backend/``; uses the configured ``db`` backend)::
+
+    python quest_retention.py partitions
+    python quest_retention.py purge                # QUEST_RETENTION_MONTHS
+    python quest_retention.py purge --months 12
+    python quest_retention.py migrate              # partition an existing table
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+import db
+import quest_read_cache
+
+
+def _format_bound(value) -> str:
+    return "-" if value is None else f"{value:%Y-%m-%d}"
+
+
+def main(argv=None) -> int:
+    # Only the command line needs argparse; keep it off the app's import path.
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the partitions and retention of Citizen Hero quests")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("partitions", help="create upcoming partitions and list them all")
+    purge_cmd = commands.add_parser("purge", help="drop or delete quests past the retention period")
+    purge_cmd.add_argument("--months", type=int, default=None,
+                           help="whole months to keep besides the current one (default: QUEST_RETENTION_MONTHS)")
+    purge_cmd.add_argument("--chunk-size", type=int, default=None,
+                           help="rows per delete transaction (default: QUEST_DELETE_CHUNK_SIZE)")
+    commands.add_parser("migrate", help="convert an existing unpartitioned Postgres quests table")
+
+    args = parser.parse_args(argv)
+    started = time.monotonic()
+
+    if args.command == "partitions":
+        db.ensure_quest_partitions()
+        partitions = db.list_quest_partitions()
+        for partition in partitions:
+            print(f"{partition['name']}\t{_format_bound(partition['start'])}\t"
+                  f"{_format_bound(partition['end'])}\t~{partition['rows']} rows")
+        if not partitions:
+            print("quests is not partitioned", file=sys.stderr)
+        return 0
+
+    if args.command == "migrate":
+        created = db.partition_quests_table()
+        print(f"Created {len(created)} monthly partitions in {time.monotonic() - started:.1f}s", file=sys.stderr)
+        return 0
+
+    result = db.purge_expired_quests(retention_months=args.months, chunk_size=args.chunk_size)
+    if result["partitions_dropped"] or result["rows_deleted"]:
+        # Purged quests may sit in any session's cached Suit Log.
+        quest_read_cache.invalidate_all()
+    if result["cutoff"] is None:
+        print("Retention is off (QUEST_RETENTION_MONTHS=0); nothing purged", file=sys.stderr)
+        return 0
+    print(
+        f"Purged quests created before {result['cutoff']:%Y-%m-%d}: "
+        f"{len(result['partitions_dropped'])} partitions dropped, {result['rows_deleted']} rows deleted"
+        f" ({time.monotonic() - started:.1f}s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
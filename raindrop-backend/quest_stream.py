@@ -0,0 +1,190 @@
+"""
+Incremental quest generation for ``POST /generate-quest:stream``.
+
+A SmartInference quest is one JSON object that takes seconds to arrive in
+full.  ``QuestStreamParser`` reads the body as it streams in and reports
+each top-level field the moment its value is complete, and each entry of
+``steps`` as soon as that step's object closes, so the HUD can show the
+quest name and mission summary while the rest is still being generated.
+
+:func:`generate_events` turns one request into Server-Sent Events:
+
+- ``quest_name`` and ``mission_summary`` (JSON strings) and one ``step``
+  event per step, as they are parsed;
+- ``reset`` if SmartInference fails after content was already sent, before
+  the offline quest is sent in its place;
+- finally ``("quest", quest)``, the complete validated quest, for the app
+  to persist and send as ``done``.
+
+Cached quests and offline quests are sent as the same events straight
+away.  The parser scans each character once, keeping the text it has seen
+so values can be decoded with ``json.loads`` as they complete.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import fast_json
+import inference_client
+import metrics
+import quest_cache
+
+Event = Tuple[str, Any]
+
+# Top-level fields sent as their own event; the rest arrive with ``done``.
+STREAMED_FIELDS = ("quest_name", "mission_summary")
+
+_WHITESPACE = " \t\r\n"
+
+
+class QuestStreamParser:
+    """Push parser for one quest object: ``feed`` text, get completed events."""
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key: Optional[str] = None
+        self._expect_value = False
+        self._value_start: Optional[int] = None
+        self._step_start: Optional[int] = None
+        self.failed = False
+
+    def feed(self, chunk: str) -> List[Event]:
+        """Add ``chunk`` and return the ``(event, value)`` pairs it completed.
+
+        Malformed input stops the parser (``failed``) instead of raising;
+        whether the quest as a whole is usable is decided once it is complete.
+        """
+        self._text += chunk
+        if self.failed:
+            return []
+        events: List[Event] = []
+        try:
+            self._scan(events)
+        except ValueError:
+            self.failed = True
+        self._pos = len(self._text)
+        return events
+
+    def _scan(self, events: List[Event]) -> None:
+        text = self._text
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._expect_value:
+                            self._complete(pos + 1, events)
+                        else:
+                            self._key = json.loads(text[self._value_start:pos + 1])
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and (self._value_start is None or not self._expect_value):
+                    self._value_start = pos
+            elif char in "{[":
+                if self._depth == 1 and self._expect_value:
+                    self._value_start = pos
+                elif self._depth == 2 and char == "{" and self._key == "steps":
+                    self._step_start = pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._step_start is not None:
+                    events.append(("step", json.loads(text[self._step_start:pos + 1])))
+                    self._step_start = None
+                elif self._depth == 1 and self._expect_value:
+                    self._complete(pos + 1, events)
+                elif self._depth == 0 and self._expect_value and self._value_start is not None:
+                    self._complete(pos, events)
+            elif self._depth == 1:
+                if char == ":":
+                    self._expect_value = True
+                    self._value_start = None
+                elif char == ",":
+                    if self._expect_value and self._value_start is not None:
+                        # A number, true, false or null ends at the comma.
+                        self._complete(pos, events)
+                    self._key, self._expect_value, self._value_start = None, False, None
+                elif char not in _WHITESPACE and self._expect_value and self._value_start is None:
+                    self._value_start = pos
+
+    def _complete(self, end: int, events: List[Event]) -> None:
+        """The current top-level value ends just before ``end``."""
+        if self._key in STREAMED_FIELDS:
+            events.append((self._key, json.loads(self._text[self._value_start:end])))
+        self._expect_value = False
+        self._value_start = None
+
+
+def quest_events(quest: Dict[str, Any]) -> Iterator[Event]:
+    """The events for a quest that is already complete."""
+    for field in STREAMED_FIELDS:
+        if field in quest:
+            yield field, quest[field]
+    for step in quest.get("steps") or []:
+        yield "step", step
+
+
+def generate_events(
+    data: Dict[str, Any],
+    fallback: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Iterator[Event]:
+    """Stream the quest for ``data``; the last event is ``("quest", quest)``.
+
+    Mirrors ``inference_client.generate_with_source`` (same metrics, fallback
+    and caching rules) and shares the generation cache with ``/generate-quest``.
+    """
+    cache = quest_cache.get_cache()
+    key = quest_cache.cache_key(data)
+    quest = cache.get(key) if cache is not None else None
+    if quest is not None:
+        yield from quest_events(quest)
+        yield "quest", quest
+        return
+
+    client = inference_client.get_client()
+    sent = False
+    if client is not None:
+        parser = QuestStreamParser()
+        chunks = client.stream(inference_client.build_payload(data))
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as done:
+                quest = done.value
+                break
+            for event in parser.feed(chunk):
+                sent = True
+                yield event
+        source = "smartinference" if quest is not None else "fallback"
+        if quest is not None and not sent:
+            # Valid, but not in a shape the parser could follow.
+            yield from quest_events(quest)
+    else:
+        source = "offline"
+    metrics.inc("citizen_hero_quest_generations_total", source)
+
+    if quest is None:
+        if sent:
+            yield "reset", None
+        quest = fallback(data)
+        yield from quest_events(quest)
+    if cache is not None and source in quest_cache.CACHED_SOURCES:
+        cache.set(key, quest)
+    yield "quest", quest
+
+
+def format_event(event: str, value: Any) -> bytes:
+    """One SSE message; JSON data never contains a raw newline."""
+    return b"event: " + event.encode("ascii") + b"\ndata: " + fast_json.dumps(value) + b"\n\n"
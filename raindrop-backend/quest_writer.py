@@ -0,0 +1,350 @@
+"""
+Write-behind persistence for generated quests (``QUEST_WRITE_BEHIND=1``).
+
+By default ``POST /generate-quest`` waits for its own INSERT and commit.
+In write-behind mode the quest gets an id from a block reserved up front
+(``db.reserve_quest_ids``, ``QUEST_ID_PREFETCH`` at a time) and the
+response goes out at once; a background thread writes the queued quests
+with one multi-row insert (``db.import_quests``) every
+``QUEST_WRITE_FLUSH_INTERVAL`` seconds, or as soon as
+``QUEST_WRITE_BATCH_SIZE`` are waiting.
+
+Durability comes from a local spill file: every quest is appended and
+fsynced to ``QUEST_SPILL_DIR`` before it is acknowledged, and a spill
+segment is deleted only once all of its quests are in the database.  A
+worker that starts finds segments left behind by a crashed one (their
+owner no longer holds the segment's lock) and queues them again.  Inserts
+keep the reserved ids and skip ids that already exist, so replaying a
+segment that was partly written is harmless.
+
+Other workers see a quest once it is flushed; this worker's readers call
+:meth:`QuestWriter.flush` first when they would miss a queued quest, as
+they do for step toggles (``quest_progress``).
+"""
+
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+import db
+import metrics
+import quest_read_cache
+
+QUEST_WRITE_BEHIND = os.getenv("QUEST_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+QUEST_WRITE_BATCH_SIZE = int(os.getenv("QUEST_WRITE_BATCH_SIZE", "100"))
+QUEST_WRITE_FLUSH_INTERVAL = float(os.getenv("QUEST_WRITE_FLUSH_INTERVAL", "0.25"))
+# Beyond this many unwritten quests (the database is down) new quests are
+# written synchronously again, so the queue cannot grow without bound.
+QUEST_WRITE_MAX_PENDING = int(os.getenv("QUEST_WRITE_MAX_PENDING", "10000"))
+QUEST_ID_PREFETCH = int(os.getenv("QUEST_ID_PREFETCH", "50"))
+QUEST_SPILL_DIR = os.getenv(
+    "QUEST_SPILL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "quest_spill")
+)
+
+metrics.histogram("citizen_hero_quest_write_flush_duration_seconds",
+                  "Write-behind quest flush latency.", ("outcome",))
+
+
+class QuestWriter:
+    """Queue quests with reserved ids and insert them in batches.
+
+    :param reserve: ``reserve(count)`` returning that many unused ids (see
+        ``db.reserve_quest_ids``).
+    :param write: ``write(records)`` inserting records in the
+        ``db.import_quests`` format, skipping ids that already exist.
+    :param spill_dir: directory for this process's spill segments.
+    :param on_flush: optional ``on_flush(session_ids)`` called after a batch
+        is written, with the sessions it added quests to.
+    """
+
+    def __init__(
+        self,
+        reserve: Callable[[int], List[int]],
+        write: Callable[[List[Dict[str, Any]]], Any],
+        spill_dir: str = QUEST_SPILL_DIR,
+        batch_size: int = QUEST_WRITE_BATCH_SIZE,
+        flush_interval: float = QUEST_WRITE_FLUSH_INTERVAL,
+        id_prefetch: int = QUEST_ID_PREFETCH,
+        max_pending: int = QUEST_WRITE_MAX_PENDING,
+        on_flush: Optional[Callable[[set], Any]] = None,
+    ) -> None:
+        self._reserve = reserve
+        self._write = write
+        self._on_flush = on_flush
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.id_prefetch = id_prefetch
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._counters = {"submitted": 0, "flushes": 0, "quests_written": 0, "failed_flushes": 0,
+                          "recovered": 0, "rejected": 0}
+        self._last_flush_ms = 0.0
+        self._ids: List[int] = []
+        # quest id -> record, queued and being written
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._flushing: Dict[int, Dict[str, Any]] = {}
+        self._sealed: List[str] = []
+        self._segment = 0
+        self._spill = None
+        self._lock_file = None
+
+    # -- spill segments -----------------------------------------------------
+
+    def _reset_for_process(self) -> None:
+        """(Re)initialise per-process state; a forked child starts empty."""
+        for inherited in (self._spill, self._lock_file):
+            if inherited is not None:
+                inherited.close()
+        self._pid = os.getpid()
+        self._ids, self._pending, self._flushing, self._sealed = [], {}, {}, []
+        self._segment = 0
+        self._thread = None
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._lock_file = open(os.path.join(self.spill_dir, f"quests-{self._pid}.lock"), "a")
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        # Segments with our pid are from an earlier process that had it
+        # (containers often restart as the same pid): number past them.
+        leftovers = self._segments(self._pid)
+        self._segment = max((int(path.rsplit(".", 2)[1]) for path in leftovers), default=0)
+        self._open_segment()
+        self._adopt(self._pid, leftovers)
+        self._adopt_orphans()
+
+    def _segment_path(self, pid: int, number: int) -> str:
+        return os.path.join(self.spill_dir, f"quests-{pid}.{number}.ndjson")
+
+    def _segments(self, pid) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.spill_dir, f"quests-{pid}.*.ndjson")))
+
+    def _open_segment(self) -> None:
+        self._segment += 1
+        self._spill = open(self._segment_path(self._pid, self._segment), "a", encoding="utf-8")
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        self._spill.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+        self._spill.flush()
+        os.fsync(self._spill.fileno())
+
+    def _adopt_orphans(self) -> None:
+        """Queue the quests from spill segments of processes that are gone."""
+        for lock_path in glob.glob(os.path.join(self.spill_dir, "quests-*.lock")):
+            pid = os.path.basename(lock_path)[len("quests-"):-len(".lock")]
+            if pid == str(self._pid):
+                continue
+            with open(lock_path, "a") as owner_lock:
+                if fcntl is not None:
+                    # Held by its owner while that process is alive.
+                    try:
+                        fcntl.flock(owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                # Without advisory locks (Windows) one process per spill
+                # directory is assumed.
+                self._adopt(pid, self._segments(pid))
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass  # adopted by another worker at the same time
+
+    def _adopt(self, pid, segments: List[str]) -> None:
+        records = []
+        for path in segments:
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        pass  # torn final line from the crash; it was never acknowledged
+        # Into our own spill first, so the records survive another crash.
+        if records:
+            self._append(records)
+            for record in records:
+                self._pending[record["id"]] = record
+            self._counters["recovered"] += len(records)
+            print(f"Recovered {len(records)} unwritten quests from {len(segments)} spill segment(s) of pid {pid}")
+        for path in segments:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # adopted by another worker at the same time
+
+    def start(self) -> "QuestWriter":
+        """Open this process's spill file, adopting orphaned ones (idempotent)."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset_for_process()
+            if self._pending:
+                self._ensure_thread()
+        return self
+
+    # -- API ----------------------------------------------------------------
+
+    def submit(self, session_id: str, quest: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Queue a quest and return ``{"id", "created_at"}`` once it is spilled.
+
+        Returns None when the queue is full; the caller should then write
+        the quest itself.
+
+        :raises Exception: whatever ``reserve`` raises when no id is left
+            and the database cannot hand out more.
+        """
+        self.start()
+        with self._lock:
+            if len(self._pending) + len(self._flushing) >= self.max_pending:
+                self._counters["rejected"] += 1
+                return None
+            if not self._ids:
+                # Under the lock, so a burst reserves one block, not one each.
+                self._ids = list(self._reserve(self.id_prefetch))
+            quest_id = self._ids.pop(0)
+            created_at = datetime.now(timezone.utc)
+            record = {
+                "id": quest_id,
+                "session_id": session_id,
+                "created_at": created_at.isoformat(),
+                "quest": quest,
+                "completed_step_ids": [],
+                "earned_sgxp": 0,
+                "total_sgxp": sum(db.step_rewards(quest).values()),
+            }
+            self._append([record])
+            self._pending[quest_id] = record
+            self._counters["submitted"] += 1
+            backlog = len(self._pending)
+        self._ensure_thread()
+        if backlog >= self.batch_size:
+            self._wakeup.set()
+        return {"id": quest_id, "created_at": created_at}
+
+    def has_pending(self, session_id: Optional[str] = None, quest_id: Optional[int] = None) -> bool:
+        """True if quests for this session (or this quest) are not yet in the database."""
+        if self._pid != os.getpid():
+            return False
+        with self._lock:
+            if quest_id is not None:
+                return quest_id in self._pending or quest_id in self._flushing
+            records = list(self._pending.values()) + list(self._flushing.values())
+        return any(session_id is None or record["session_id"] == session_id for record in records)
+
+    def flush(self) -> int:
+        """Write all queued quests now; returns the number written."""
+        if self._pid != os.getpid():
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+                # New quests go to a fresh segment; the sealed ones can go
+                # once everything queued before this point is written.
+                self._spill.close()
+                self._sealed.append(self._spill.name)
+                sealed = list(self._sealed)
+                self._open_segment()
+            records = sorted(batch.values(), key=lambda record: record["id"])
+            started = time.perf_counter()
+            try:
+                for start in range(0, len(records), self.batch_size):
+                    self._write(records[start:start + self.batch_size])
+            except Exception as exc:
+                metrics.observe("citizen_hero_quest_write_flush_duration_seconds",
+                                time.perf_counter() - started, "error")
+                print(f"Quest write-behind flush failed, will retry: {exc}")
+                with self._lock:
+                    self._counters["failed_flushes"] += 1
+                    # Still in the sealed segments, which stay until a retry succeeds.
+                    self._pending = {**batch, **self._pending}
+                    self._flushing = {}
+                return 0
+            elapsed = time.perf_counter() - started
+            metrics.observe("citizen_hero_quest_write_flush_duration_seconds", elapsed, "ok")
+            with self._lock:
+                self._flushing = {}
+                self._sealed = [path for path in self._sealed if path not in sealed]
+                self._counters["flushes"] += 1
+                self._counters["quests_written"] += len(records)
+                self._last_flush_ms = round(elapsed * 1000, 2)
+            for path in sealed:
+                os.remove(path)
+            if self._on_flush is not None:
+                self._on_flush({record["session_id"] for record in records})
+            return len(records)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="quest-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the background flusher after writing what is queued.
+
+        Quests that still cannot be written stay in the spill file for the
+        next start.
+        """
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, pending=len(self._pending) + len(self._flushing),
+                        reserved_ids=len(self._ids), last_flush_ms=self._last_flush_ms)
+
+
+_writer: Optional[QuestWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> Optional[QuestWriter]:
+    """Process-wide writer backed by ``db``, or None unless write-behind is on."""
+    global _writer
+    if not QUEST_WRITE_BEHIND or not db.is_configured():
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = QuestWriter(
+                    db.reserve_quest_ids, db.import_quests, on_flush=quest_read_cache.invalidate_sessions
+                )
+                atexit.register(_writer.close)
+    return _writer.start()
+
+
+def writer_stats() -> Optional[Dict[str, Any]]:
+    """Counters for the metrics endpoint, or None before the first queued quest."""
+    return _writer.stats() if _writer is not None else None
@@ -0,0 +1,404 @@
+"""
+Per-client rate limits and admission control for expensive endpoints.
+
+Two independent guards:
+
+- ``RateLimiter`` is a token bucket per client: each bucket holds up to
+  ``burst`` tokens and refills at ``per_minute`` tokens a minute; a request
+  spends one token (a batch spends one per mission) and is answered 429
+  with ``Retry-After`` when its bucket is empty.  Buckets live in process
+  memory (an LRU of ``RATE_LIMIT_MAX_CLIENTS`` clients) or, when
+  ``RATE_LIMIT_SQLITE_PATH`` is set, in a SQLite file every worker on the
+  host shares, so ``gunicorn -w 4`` does not hand each client four budgets.
+- ``ConcurrencyLimiter`` bounds SmartInference calls in flight in this
+  worker (``INFERENCE_MAX_CONCURRENCY``).  Up to ``INFERENCE_MAX_QUEUE``
+  more wait at most ``INFERENCE_QUEUE_TIMEOUT`` seconds for a slot; beyond
+  that the request is shed at once with 503 and a ``Retry-After`` estimated
+  from recent call times, instead of queueing on SmartInference quota and
+  database connections.  Offline generation takes no slot.
+  ``AsyncConcurrencyLimiter`` is the same guard for the ASGI app, with
+  callers queued on its event loop.
+
+Scopes and their environment variables:
+
+- ``generate`` (``/generate-quest``, its stream and batch variants):
+  ``RATE_LIMIT_GENERATE_PER_MINUTE`` (default 60) and
+  ``RATE_LIMIT_GENERATE_BURST`` (default 60, at least a full batch).
+- ``delete`` (``DELETE /quests`` and ``/quests/<id>``):
+  ``RATE_LIMIT_DELETE_PER_MINUTE`` (default 60) and
+  ``RATE_LIMIT_DELETE_BURST`` (default 20).
+
+A rate of 0 turns that scope off, as does ``INFERENCE_MAX_CONCURRENCY=0``
+for admission control.  If the shared SQLite file cannot be used, requests
+are let through rather than failed.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+SCOPE_DEFAULTS = {
+    "generate": (60.0, 60.0),
+    "delete": (60.0, 20.0),
+}
+
+
+class Overloaded(Exception):
+    """Raised when admission control sheds a request."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+def _retry_after(missing: float, rate: float) -> int:
+    return max(1, math.ceil(missing / rate))
+
+
+class MemoryBucketStore:
+    """Buckets in process memory, least recently used evicted first.
+
+    An evicted client simply starts again with a full bucket.
+    """
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> Tuple[bool, int]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else _retry_after(cost - tokens, rate)
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file shared by the workers on one host."""
+
+    # Delete buckets idle long enough to be full again every this many takes.
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+                """
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> Tuple[bool, int]:
+        # Wall clock: the file is shared between processes.
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*(row or (burst, now)), now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                """
+                INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+                """,
+                (key, tokens, now),
+            )
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - burst / rate,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return allowed, 0 if allowed else _retry_after(cost - tokens, rate)
+
+
+class RateLimiter:
+    """Token bucket per key: ``per_minute`` refill rate, ``burst`` capacity."""
+
+    def __init__(self, scope: str, per_minute: float, burst: float, store=None) -> None:
+        self.scope = scope
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.store = store or MemoryBucketStore()
+        self._lock = threading.Lock()
+        self._counters = {"allowed": 0, "limited": 0, "store_errors": 0}
+
+    def take(self, key: str, cost: float = 1) -> Tuple[bool, int]:
+        """Spend ``cost`` tokens from ``key``'s bucket.
+
+        :returns: ``(allowed, retry_after_seconds)``; requests costing more
+            than ``burst`` are never allowed.
+        """
+        try:
+            allowed, retry_after = self.store.take(f"{self.scope}|{key}", cost, self.rate, self.burst)
+        except sqlite3.Error as exc:
+            print(f"Shared rate limit store failed, allowing request: {exc}")
+            with self._lock:
+                self._counters["store_errors"] += 1
+            return True, 0
+        with self._lock:
+            self._counters["allowed" if allowed else "limited"] += 1
+        return allowed, retry_after
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` holders at once; a bounded queue; shed the rest."""
+
+    def __init__(self, limit: int, max_queue: int = 0, queue_timeout: float = 5.0) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        # Moving average of how long a slot is held, for Retry-After.
+        self._avg_hold = 1.0
+        self._counters = {"admitted": 0, "queued": 0, "shed": 0}
+
+    def _estimate_retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_hold * (self._waiting + 1) / self.limit))
+
+    def acquire(self) -> float:
+        """Take a slot, waiting in the queue if there is room.
+
+        :returns: The time the slot was taken, for :meth:`release`.
+        :raises Overloaded: if the queue is full or the wait timed out.
+        """
+        with self._cond:
+            if self._in_flight >= self.limit:
+                if self._waiting >= self.max_queue:
+                    self._counters["shed"] += 1
+                    raise Overloaded(self._estimate_retry_after())
+                self._counters["queued"] += 1
+                self._waiting += 1
+                try:
+                    admitted = self._cond.wait_for(lambda: self._in_flight < self.limit, self.queue_timeout)
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    self._counters["shed"] += 1
+                    raise Overloaded(self._estimate_retry_after())
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+        return time.monotonic()
+
+    def release(self, acquired_at: float) -> None:
+        held = time.monotonic() - acquired_at
+        with self._cond:
+            self._in_flight -= 1
+            self._avg_hold += 0.2 * (held - self._avg_hold)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """``with limiter.slot():`` around the expensive work."""
+        acquired_at = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(acquired_at)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return dict(self._counters, in_flight=self._in_flight, waiting=self._waiting,
+                        limit=self.limit, avg_hold_seconds=round(self._avg_hold, 3))
+
+
+class AsyncConcurrencyLimiter:
+    """:class:`ConcurrencyLimiter` for the ASGI event loop.
+
+    Queued callers wait on the loop rather than on a worker thread, and a
+    caller cancelled while queued (client gone, shutdown) takes no slot
+    with it.  Not thread-safe: use it from one event loop.
+    """
+
+    def __init__(self, limit: int, max_queue: int = 0, queue_timeout: float = 5.0) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        # Futures of queued callers, oldest first; a release hands its
+        # slot straight to the first one still waiting.
+        self._waiters: deque = deque()
+        self._avg_hold = 1.0
+        self._counters = {"admitted": 0, "queued": 0, "shed": 0}
+
+    def _estimate_retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_hold * (len(self._waiters) + 1) / self.limit))
+
+    async def acquire(self) -> float:
+        """Take a slot, waiting in the queue if there is room.
+
+        :returns: The time the slot was taken, for :meth:`release`.
+        :raises Overloaded: if the queue is full or the wait timed out.
+        """
+        import asyncio
+
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self._counters["shed"] += 1
+                raise Overloaded(self._estimate_retry_after())
+            self._counters["queued"] += 1
+            loop = asyncio.get_running_loop()
+            # Resolved True by _hand_off, or False once queue_timeout passes.
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            timer = loop.call_later(self.queue_timeout, self._expire, waiter)
+            try:
+                admitted = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled() and waiter.result():
+                    # Handed a slot just as the caller was cancelled: pass it on.
+                    self._hand_off()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+            finally:
+                timer.cancel()
+            if not admitted:
+                self._counters["shed"] += 1
+                raise Overloaded(self._estimate_retry_after())
+        self._counters["admitted"] += 1
+        return time.monotonic()
+
+    def release(self, acquired_at: float) -> None:
+        held = time.monotonic() - acquired_at
+        self._avg_hold += 0.2 * (held - self._avg_hold)
+        self._hand_off()
+
+    def _hand_off(self) -> None:
+        """Give a freed slot to the oldest waiter, or return it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self._in_flight -= 1
+
+    def _expire(self, waiter) -> None:
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            waiter.set_result(False)
+
+    def stats(self) -> Dict[str, float]:
+        return dict(self._counters, in_flight=self._in_flight, waiting=len(self._waiters),
+                    limit=self.limit, avg_hold_seconds=round(self._avg_hold, 3))
+
+
+_limiters: Dict[str, Optional[RateLimiter]] = {}
+_store = None
+_inference_slots: Optional[ConcurrencyLimiter] = None
+_async_inference_slots: Optional[AsyncConcurrencyLimiter] = None
+_lock = threading.Lock()
+
+
+def _shared_store():
+    global _store
+    if _store is None:
+        path = os.getenv("RATE_LIMIT_SQLITE_PATH")
+        if path:
+            try:
+                _store = SQLiteBucketStore(path)
+            except sqlite3.Error as exc:
+                print(f"Shared rate limit store disabled: {exc}")
+        if _store is None:
+            _store = MemoryBucketStore(int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000")))
+    return _store
+
+
+def get_limiter(scope: str) -> Optional[RateLimiter]:
+    """The process-wide limiter for ``scope``, or None when it is turned off."""
+    if scope not in _limiters:
+        with _lock:
+            if scope not in _limiters:
+                default_rate, default_burst = SCOPE_DEFAULTS[scope]
+                prefix = f"RATE_LIMIT_{scope.upper()}"
+                per_minute = float(os.getenv(f"{prefix}_PER_MINUTE", default_rate))
+                burst = float(os.getenv(f"{prefix}_BURST", default_burst))
+                _limiters[scope] = RateLimiter(scope, per_minute, burst, _shared_store()) if per_minute > 0 else None
+    return _limiters[scope]
+
+
+def _inference_slot_settings() -> Tuple[int, int, float]:
+    return (
+        int(os.getenv("INFERENCE_MAX_CONCURRENCY", "16")),
+        int(os.getenv("INFERENCE_MAX_QUEUE", "32")),
+        float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "5")),
+    )
+
+
+def inference_slots() -> Optional[ConcurrencyLimiter]:
+    """The worker's SmartInference call limiter, or None when it is turned off."""
+    global _inference_slots
+    limit, max_queue, queue_timeout = _inference_slot_settings()
+    if limit <= 0:
+        return None
+    if _inference_slots is None:
+        with _lock:
+            if _inference_slots is None:
+                _inference_slots = ConcurrencyLimiter(limit, max_queue=max_queue, queue_timeout=queue_timeout)
+    return _inference_slots
+
+
+def async_inference_slots() -> Optional[AsyncConcurrencyLimiter]:
+    """:func:`inference_slots` for the ASGI app's event loop (same settings)."""
+    global _async_inference_slots
+    limit, max_queue, queue_timeout = _inference_slot_settings()
+    if limit <= 0:
+        return None
+    if _async_inference_slots is None:
+        _async_inference_slots = AsyncConcurrencyLimiter(limit, max_queue=max_queue, queue_timeout=queue_timeout)
+    return _async_inference_slots
+
+
+def limiter_stats() -> Dict[str, Dict[str, float]]:
+    """Counters for the metrics endpoint."""
+    stats = {scope: limiter.stats() for scope, limiter in list(_limiters.items()) if limiter is not None}
+    if _inference_slots is not None:
+        stats["inference"] = _inference_slots.stats()
+    if _async_inference_slots is not None:
+        stats["inference_async"] = _async_inference_slots.stats()
+    return stats
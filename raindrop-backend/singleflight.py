@@ -0,0 +1,75 @@
+"""
+Request coalescing ("single flight") for duplicate concurrent work.
+
+When a burst of clients submits the same mission at the same moment, only
+the first caller (the leader) runs the generation; everyone who arrives
+while it is in flight waits for that call and receives its result.  The
+leader runs in its own request thread, so it sees no extra latency.
+Once the call finishes the key is released, and later callers start a
+fresh flight (or, for quests, hit the generation cache).
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` once per key across concurrent callers.
+
+        Returns ``(result, shared)`` where ``shared`` is True for callers
+        that piggy-backed on another caller's execution.  Exceptions raised
+        by ``fn`` propagate to the leader and every waiter.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._counters["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._counters["leaders"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["in_flight"] = len(self._calls)
+        return snapshot
@@ -0,0 +1,259 @@
+"""
+In-memory, precompressed delivery of the static frontend.
+
+``send_from_directory`` re-reads ``frontend/`` on every page view and sends
+it uncompressed with no useful cache headers.  ``StaticAssets`` instead
+builds every file once:
+
+- each asset gets a content hash, a strong ``ETag`` and a fingerprinted
+  name (``new_script.js`` -> ``new_script.<hash>.js``);
+- references to assets in HTML files (``src="config.js"``) are rewritten
+  to the fingerprinted names, so the HTML is the only thing browsers have
+  to revalidate;
+- every body is precompressed with gzip and, when the ``brotli`` package
+  is installed, brotli; a compressed copy is only kept if it is smaller.
+
+The build happens on the first request rather than at import, so a cold
+start that is only probed (``/livez``) never reads or compresses the
+frontend.  Requests are answered from memory with content negotiation on
+``Accept-Encoding`` (``Vary: Accept-Encoding``, one ETag per encoding) and
+``304 Not Modified`` for a matching ``If-None-Match``.  Fingerprinted names
+are cached by browsers for a year as ``immutable``; plain names (the HTML,
+and old links to unfingerprinted files) use ``no-cache``.
+
+With ``reload=True`` (local development by default, see
+``STATIC_ASSETS_RELOAD``) the files are rebuilt whenever one changes on
+disk.
+
+The same build can be written out for a static host::
+
+    python static_assets.py build ../frontend dist/
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import Response, abort, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Browsers may keep fingerprinted files forever: their name changes with them.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Hex digits of the content hash used in fingerprinted names.
+FINGERPRINT_LENGTH = 10
+
+# Preference order when a client accepts several encodings equally.
+_ENCODINGS = ("br", "gzip")
+_ETAG_SUFFIX = {"br": "-br", "gzip": "-gz", "identity": ""}
+_COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|xml)|image/svg)")
+_REFERENCE = re.compile(r'(\b(?:src|href)\s*=\s*["\'])(\.?/?)([^"\'?#]+)')
+
+
+class Asset:
+    """One built file: its bodies by encoding and its validators."""
+
+    __slots__ = ("name", "content_type", "digest", "bodies")
+
+    def __init__(self, name: str, content_type: str, data: bytes) -> None:
+        self.name = name
+        self.content_type = content_type
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.bodies = {"identity": data}
+        if _COMPRESSIBLE.match(content_type):
+            for encoding, body in _compress(data).items():
+                if len(body) < len(data):
+                    self.bodies[encoding] = body
+
+    @property
+    def fingerprinted_name(self) -> str:
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.digest[:FINGERPRINT_LENGTH]}{ext}"
+
+    def etag(self, encoding: str) -> str:
+        return self.digest[:32] + _ETAG_SUFFIX[encoding]
+
+
+def _compress(data: bytes) -> Dict[str, bytes]:
+    bodies = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(data, quality=11)
+    return bodies
+
+
+def _content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def rewrite_references(html: str, urls: Dict[str, str]) -> str:
+    """Point ``src``/``href`` attributes at fingerprinted asset names."""
+
+    def replace(match):
+        prefix, leading, target = match.groups()
+        return prefix + leading + urls.get(target, target)
+
+    return _REFERENCE.sub(replace, html)
+
+
+def build(root: str) -> Tuple[Dict[str, Asset], Dict[str, str]]:
+    """Build every file under ``root``.
+
+    :returns: ``(assets, urls)``; ``assets`` maps a plain name to its
+        :class:`Asset`, ``urls`` maps it to its fingerprinted name (HTML
+        files keep their plain names).
+    """
+    sources = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            with open(path, "rb") as fh:
+                sources[name] = fh.read()
+
+    assets, urls = {}, {}
+    for name, data in sources.items():
+        if not name.endswith(".html"):
+            asset = assets[name] = Asset(name, _content_type(name), data)
+            urls[name] = asset.fingerprinted_name
+    # HTML last, so it can reference everything else by fingerprint.
+    for name, data in sources.items():
+        if name.endswith(".html"):
+            html = rewrite_references(data.decode("utf-8"), urls)
+            assets[name] = Asset(name, _content_type(name), html.encode("utf-8"))
+            urls[name] = name
+    return assets, urls
+
+
+def _signature(root: str) -> Tuple:
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            if not filename.startswith("."):
+                stat = os.stat(os.path.join(dirpath, filename))
+                entries.append((dirpath, filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries))
+
+
+class StaticAssets:
+    """Serve a built frontend directory from memory."""
+
+    def __init__(self, root: str, index: str = "index.html", reload: bool = False) -> None:
+        self.root = root
+        self.index = index
+        self.reload = reload
+        self._lock = threading.Lock()
+        self._signature = None
+        self._routes: Optional[Dict[str, Tuple[Asset, bool]]] = None
+        self._urls: Dict[str, str] = {}
+
+    @property
+    def urls(self) -> Dict[str, str]:
+        """Plain name -> fingerprinted name (builds on first use)."""
+        self._ensure_built()
+        return self._urls
+
+    def _build(self) -> None:
+        signature = _signature(self.root) if self.reload else None
+        assets, urls = build(self.root)
+        routes = {}
+        for name, asset in assets.items():
+            routes[name] = (asset, False)
+            if urls[name] != name:
+                routes[urls[name]] = (asset, True)
+        self._routes, self._urls, self._signature = routes, urls, signature
+
+    def _stale(self) -> bool:
+        return self._routes is None or (self.reload and _signature(self.root) != self._signature)
+
+    def _ensure_built(self) -> None:
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self._build()
+
+    def lookup(self, path: str) -> Optional[Tuple[Asset, bool]]:
+        """``(asset, immutable)`` for a request path, or None."""
+        self._ensure_built()
+        return self._routes.get(path or self.index)
+
+    def serve(self, path: str = "") -> Response:
+        """Answer the current request for ``path`` (404 if it is not an asset)."""
+        found = self.lookup(path)
+        if found is None:
+            abort(404)
+        asset, immutable = found
+        encoding = _negotiate(asset)
+        etag = asset.etag(encoding)
+        if request.if_none_match.contains_weak(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(asset.bodies[encoding], content_type=asset.content_type)
+            if encoding != "identity":
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+
+def _negotiate(asset: Asset) -> str:
+    accepted = request.accept_encodings
+    best, best_quality = "identity", 0.0
+    for encoding in _ENCODINGS:
+        quality = accepted[encoding]
+        if encoding in asset.bodies and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def write_build(root: str, out: str) -> int:
+    """Write fingerprinted files, their .gz/.br copies and the rewritten HTML to ``out``."""
+    assets, urls = build(root)
+    count = 0
+    for name, asset in assets.items():
+        for target in {name, urls[name]}:
+            path = os.path.join(out, *target.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for encoding, body in asset.bodies.items():
+                suffix = {"identity": "", "gzip": ".gz", "br": ".br"}[encoding]
+                with open(path + suffix, "wb") as fh:
+                    fh.write(body)
+                count += 1
+    return count
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the Citizen Hero frontend")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="write the built frontend to a directory")
+    build_cmd.add_argument("root", help="frontend source directory")
+    build_cmd.add_argument("out", help="output directory")
+    args = parser.parse_args(argv)
+    count = write_build(args.root, args.out)
+    print(f"Wrote {count} files to {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""
+Reproducible latency/throughput benchmark for the quest API.
+
+Drives the Flask app either in-process (``--transport inprocess``, Flask
+test client) or over a real socket (``--transport socket``, threaded
+Werkzeug server on a free port) and reports, per scenario:
+
+- requests/s and p50/p95/p99 latency,
+- DB helper calls per request (broken down by ``db`` function),
+- SmartInference calls per request.
+
+Dependencies are local and deterministic:
+
+- Persistence uses a SQLite stand-in for the ``db`` helpers unless
+  ``--database-url`` points at a real (local) Postgres.
+- SmartInference is ``stub_inference.py`` with configurable latency and
+  error rate; ``--inference-latency -1`` disables it so the offline
+  generator is measured instead.
+
+Results are written as JSON (``--output``).  Passing ``--baseline`` with
+an earlier result file compares throughput and p95 latency per scenario
+and exits non-zero if any regresses by more than ``--max-regression``.
+
+Example::
+
+    python scripts/bench_quest_api.py --requests 500 --concurrency 16 \\
+        --inference-latency 0.05 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "raindrop-backend"))
+sys.path.insert(0, BACKEND_DIR)
+
+from stub_inference import StubInferenceServer  # noqa: E402
+
+DB_FUNCTIONS = ("insert_quest", "list_quests_page", "get_quest_by_id", "delete_quest", "delete_all_quests")
+
+
+# ---------------------------------------------------------------------------
+# SQLite stand-in for the Postgres helpers
+# ---------------------------------------------------------------------------
+
+class SQLiteStandIn:
+    """Implements the ``db`` helper API on a temporary SQLite file."""
+
+    def __init__(self):
+        import db
+
+        self._db = db
+        fd, self.path = tempfile.mkstemp(suffix=".db", prefix="bench-quests-")
+        os.close(fd)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                """
+                CREATE TABLE quests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT,
+                    created_at TEXT,
+                    quest_json TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX quests_session_created_id_idx ON quests (session_id, created_at DESC, id DESC)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def init_schema(self):
+        pass
+
+    def insert_quest(self, session_id, quest_payload):
+        created_at = datetime.now(timezone.utc)
+        with self._conn() as conn:
+            cur = conn.execute(
+                "INSERT INTO quests (session_id, created_at, quest_json) VALUES (?, ?, ?)",
+                (session_id, created_at.isoformat(), json.dumps(quest_payload)),
+            )
+        return {"id": cur.lastrowid, "created_at": created_at}
+
+    def _row(self, row):
+        quest = json.loads(row[3])
+        quest.update({"id": row[0], "session_id": row[1], "created_at": row[2]})
+        return quest
+
+    def list_quests_page(self, session_id, limit=20, cursor=None):
+        sql = "SELECT id, session_id, created_at, quest_json FROM quests WHERE session_id = ?"
+        params = [session_id]
+        if cursor:
+            created_at, quest_id = self._db.decode_cursor(cursor)
+            sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            params += [created_at.isoformat(), created_at.isoformat(), quest_id]
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self._conn().execute(sql, params + [limit + 1]).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._db.encode_cursor(datetime.fromisoformat(rows[-1][2]), rows[-1][0])
+        return [self._row(row) for row in rows], next_cursor
+
+    def get_quest_by_id(self, quest_id):
+        row = self._conn().execute(
+            "SELECT id, session_id, created_at, quest_json FROM quests WHERE id = ?", (quest_id,)
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def delete_quest(self, session_id, quest_id):
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM quests WHERE id = ? AND session_id = ?", (quest_id, session_id)).rowcount > 0
+
+    def delete_all_quests(self, session_id):
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM quests WHERE session_id = ?", (session_id,)).rowcount
+
+
+def instrument_db(db_module, backend=None):
+    """Route ``db`` helpers to ``backend`` (if given) and count every call."""
+    counts = Counter()
+    lock = threading.Lock()
+    for name in DB_FUNCTIONS:
+        target = getattr(backend, name) if backend is not None else getattr(db_module, name)
+
+        def wrapper(*args, _target=target, _name=name, **kwargs):
+            with lock:
+                counts[_name] += 1
+            return _target(*args, **kwargs)
+
+        setattr(db_module, name, wrapper)
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+class InProcessTransport:
+    def __init__(self, app):
+        self._local = threading.local()
+        self._app = app
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        return client
+
+    def request(self, method, path, body=None):
+        resp = self._client().open(path, method=method, json=body)
+        return resp.status_code, resp.get_data()
+
+
+class SocketTransport:
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def _conn(self):
+        import http.client
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=60)
+        return conn
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        try:
+            conn = self._conn()
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            payload = resp.read()
+        except OSError:
+            self._local.conn = None
+            return 0, b""
+        if resp.getheader("Connection", "").lower() == "close":
+            conn.close()
+            self._local.conn = None
+        return resp.status, payload
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _scenarios(args):
+    sessions = [f"bench-session-{i}" for i in range(args.sessions)]
+    repeat_every = max(1, int(round(1 / args.repeat_ratio))) if args.repeat_ratio > 0 else 0
+
+    def generate(i):
+        # Every repeat_every-th request reuses a classroom-style shared mission.
+        mission = "clean up the school yard" if repeat_every and i % repeat_every == 0 else f"mission {i}"
+        return "POST", "/generate-quest", {
+            "mission_idea": mission,
+            "help_mode": ("supplies", "awareness", "helpers")[i % 3],
+            "client_id": sessions[i % len(sessions)],
+        }
+
+    def list_quests(i):
+        return "GET", f"/quests?client_id={sessions[i % len(sessions)]}", None
+
+    def clarify(i):
+        return "POST", "/clarify-mission", {"mission_idea": f"mission {i}", "help_mode": "helpers"}
+
+    return [("generate-quest", generate), ("list-quests", list_quests), ("clarify-mission", clarify)]
+
+
+def run_scenario(transport, make_request, total, concurrency, db_counts, stub):
+    db_before = Counter(db_counts)
+    inference_before = stub.calls if stub else 0
+
+    def one(i):
+        method, path, body = make_request(i)
+        started = time.perf_counter()
+        status, _ = transport.request(method, path, body)
+        return time.perf_counter() - started, 200 <= status < 300
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, ok in results if ok)
+    db_delta = Counter(db_counts)
+    db_delta.subtract(db_before)
+    return {
+        "requests": total,
+        "errors": sum(1 for _, ok in results if not ok),
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 3),
+            "p95": round(_percentile(latencies, 95) * 1000, 3),
+            "p99": round(_percentile(latencies, 99) * 1000, 3),
+        },
+        "db_calls_per_request": {
+            name: round(count / total, 3) for name, count in sorted(db_delta.items()) if count
+        },
+        "inference_calls_per_request": round(((stub.calls if stub else 0) - inference_before) / total, 3),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Return a list of human-readable regressions against ``baseline``."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous["requests_per_second"] and (
+            current["requests_per_second"] < previous["requests_per_second"] * (1 - max_regression)
+        ):
+            regressions.append(
+                f"{name}: throughput {current['requests_per_second']} < baseline {previous['requests_per_second']}"
+            )
+        if previous["latency_ms"]["p95"] and (
+            current["latency_ms"]["p95"] > previous["latency_ms"]["p95"] * (1 + max_regression)
+        ):
+            regressions.append(
+                f"{name}: p95 {current['latency_ms']['p95']}ms > baseline {previous['latency_ms']['p95']}ms"
+            )
+    return regressions
+
+
+def run(args):
+    stub = None
+    if args.inference_latency >= 0:
+        stub = StubInferenceServer(latency=args.inference_latency, error_rate=args.inference_error_rate).start()
+        os.environ["RAINDROP_API_URL"] = stub.url
+        os.environ["RAINDROP_API_KEY"] = "bench"
+    else:
+        os.environ.pop("RAINDROP_API_URL", None)
+        os.environ.pop("RAINDROP_API_KEY", None)
+    os.environ["QUEST_CACHE_SIZE"] = str(args.cache_size)
+
+    standin = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        # Any value works: the SQLite stand-in replaces the helpers that read it.
+        os.environ["DATABASE_URL"] = "sqlite-standin"
+
+    import db
+
+    if not args.database_url:
+        standin = SQLiteStandIn()
+        db.init_schema = standin.init_schema
+    db_counts = instrument_db(db, standin)
+
+    from app import app, schema_init
+
+    if schema_init is not None:
+        schema_init.wait(30)
+
+    transport = SocketTransport(app) if args.transport == "socket" else InProcessTransport(app)
+    try:
+        results = {
+            "transport": args.transport,
+            "config": {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "inference_latency": args.inference_latency,
+                "inference_error_rate": args.inference_error_rate,
+                "repeat_ratio": args.repeat_ratio,
+                "cache_size": args.cache_size,
+                "database": "postgres" if args.database_url else "sqlite-standin",
+            },
+            "scenarios": {},
+        }
+        for name, make_request in _scenarios(args):
+            if args.only and name not in args.only:
+                continue
+            results["scenarios"][name] = run_scenario(
+                transport, make_request, args.requests, args.concurrency, db_counts, stub
+            )
+        return results
+    finally:
+        if isinstance(transport, SocketTransport):
+            transport.close()
+        if stub:
+            stub.stop()
+        if standin:
+            standin.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the Citizen Hero quest API")
+    parser.add_argument("--transport", choices=("inprocess", "socket"), default="inprocess")
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=10, help="distinct client_ids")
+    parser.add_argument("--inference-latency", type=float, default=0.02,
+                        help="stub SmartInference latency in seconds; -1 uses the offline generator")
+    parser.add_argument("--inference-error-rate", type=float, default=0.0)
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="fraction of generate requests that reuse one shared mission")
+    parser.add_argument("--cache-size", type=int, default=0, help="QUEST_CACHE_SIZE for the run (0 = off)")
+    parser.add_argument("--database-url", help="benchmark against this Postgres instead of the SQLite stand-in")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Measure Citizen Hero cold start: import cost and time to first response.
+
+Each run starts a fresh interpreter that imports ``app`` and sends one
+``GET /healthz`` followed by one ``POST /generate-quest`` through the Flask
+test client (no sockets, so only application start-up is measured).  It
+reports, in milliseconds since the interpreter started:
+
+- ``import_ms`` – ``import app`` finished;
+- ``healthz_ms`` / ``generate_ms`` – first response of each endpoint;
+- ``interpreter_ms`` – the whole child process, as seen by the parent;
+
+plus the heavyweight modules that were already loaded when ``/healthz``
+answered (there should be none).  ``--importtime`` prints the slowest
+imports from ``python -X importtime``.
+
+    python scripts/cold_start.py --runs 5
+    python scripts/cold_start.py --runs 1 --importtime 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "raindrop-backend"))
+
+# Modules that must only load when a request actually needs them.
+HEAVY_MODULES = ("psycopg2", "requests", "asyncio", "httpx", "asyncpg", "brotli", "db_postgres", "db_sqlite")
+
+
+def child() -> None:
+    started = time.perf_counter()
+    sys.path.insert(0, BACKEND_DIR)
+    from app import app
+
+    imported = time.perf_counter()
+    client = app.test_client()
+    assert client.get("/healthz").status_code == 200
+    healthz = time.perf_counter()
+    heavy = sorted(name for name in HEAVY_MODULES if name in sys.modules)
+    resp = client.post("/generate-quest", json={"mission_idea": "plant a community garden", "help_mode": "helpers"})
+    assert resp.status_code == 200
+    generated = time.perf_counter()
+    print(json.dumps({
+        "import_ms": round((imported - started) * 1000, 1),
+        "healthz_ms": round((healthz - started) * 1000, 1),
+        "generate_ms": round((generated - started) * 1000, 1),
+        "heavy_modules_at_healthz": heavy,
+    }))
+
+
+def measure_once(env=None) -> dict:
+    """Run one cold start in a fresh interpreter and return its timings."""
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["interpreter_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def slowest_imports(limit: int, env=None) -> list:
+    """``(cumulative_us, module)`` for the slowest imports of ``app``."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold start of the Citizen Hero API")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child()
+        return 0
+
+    runs = [measure_once() for _ in range(args.runs)]
+    report = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("import_ms", "healthz_ms", "generate_ms", "interpreter_ms")
+    }
+    report["runs"] = args.runs
+    report["heavy_modules_at_healthz"] = runs[-1]["heavy_modules_at_healthz"]
+    if args.importtime:
+        report["slowest_imports_ms"] = {name: round(us / 1000, 1) for us, name in slowest_imports(args.importtime)}
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Side-by-side throughput comparison of the WSGI (Gunicorn + Flask) and
+ASGI (Uvicorn + asgi_app) serving modes.
+
+Both servers are started as subprocesses against the same stub
+SmartInference endpoint (``stub_inference.py``) with a fixed upstream
+latency, and are driven with the same number of concurrent clients
+posting unique missions to ``/generate-quest``.  The generation cache is
+disabled so every request really waits on inference.
+
+Usage (from the repository root, after installing
+``raindrop-backend/requirements-async.txt`` and ``gunicorn``)::
+
+    python scripts/compare_wsgi_asgi.py --concurrency 200 --requests 2000 \\
+        --latency 0.5 --wsgi-workers 2
+
+Prints one JSON object per mode (requests/s and latency percentiles).
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_inference import StubInferenceServer  # noqa: E402
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "raindrop-backend"))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def drive(base_url, total, concurrency):
+    """POST ``total`` unique missions with ``concurrency`` client threads."""
+
+    def one(i):
+        body = json.dumps({"mission_idea": f"benchmark mission {i}", "help_mode": "helpers"}).encode()
+        req = urllib.request.Request(
+            f"{base_url}/generate-quest", data=body, headers={"Content-Type": "application/json"}
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                resp.read()
+                ok = resp.status == 200
+        except OSError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, ok in results if ok)
+    return {
+        "requests": total,
+        "errors": sum(1 for _, ok in results if not ok),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def run_mode(name, command, port, env, args):
+    proc = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        _wait_for(f"{base_url}/healthz")
+        drive(base_url, min(args.requests, args.concurrency), args.concurrency)  # warm-up
+        result = drive(base_url, args.requests, args.concurrency)
+        result["mode"] = name
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare WSGI and ASGI throughput for /generate-quest")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub SmartInference latency in seconds")
+    parser.add_argument("--wsgi-workers", type=int, default=2, help="Gunicorn sync workers (production uses 2)")
+    args = parser.parse_args()
+
+    stub = StubInferenceServer(latency=args.latency).start()
+    env = dict(
+        os.environ,
+        RAINDROP_API_URL=stub.url,
+        RAINDROP_API_KEY="stub",
+        QUEST_CACHE_SIZE="0",
+        RAINDROP_READ_TIMEOUT=str(max(15.0, args.latency * 4)),
+    )
+    env.pop("DATABASE_URL", None)
+    # The ASGI app has no SQLite backend; keep both sides storage-free.
+    env["DB_BACKEND"] = "none"
+
+    try:
+        wsgi_port = _free_port()
+        wsgi = run_mode(
+            "wsgi",
+            [sys.executable, "-m", "gunicorn", "-w", str(args.wsgi_workers), "-b", f"127.0.0.1:{wsgi_port}", "app:app"],
+            wsgi_port,
+            env,
+            args,
+        )
+        print(json.dumps(wsgi))
+
+        asgi_port = _free_port()
+        asgi = run_mode(
+            "asgi",
+            [sys.executable, "-m", "uvicorn", "asgi_app:app", "--port", str(asgi_port), "--log-level", "warning"],
+            asgi_port,
+            env,
+            args,
+        )
+        print(json.dumps(asgi))
+    finally:
+        stub.stop()
+
+    if wsgi["requests_per_second"]:
+        print(json.dumps({"asgi_speedup": round(asgi["requests_per_second"] / wsgi["requests_per_second"], 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Stub Raindrop SmartInference server for local benchmarking.
+
+Answers every POST with a valid quest after a configurable delay, and
+fails a configurable fraction of requests with HTTP 503, so the API can be
+load tested without a real model behind it.  With ``--stream`` the delay
+is spread over a chunked body instead, the way a model emits tokens, which
+is what ``POST /generate-quest:stream`` is built for.
+
+Usage::
+
+    python scripts/stub_inference.py --port 8099 --latency 0.5 --error-rate 0.05
+
+then point the backend at it with
+``RAINDROP_API_URL=http://127.0.0.1:8099/generate RAINDROP_API_KEY=stub``.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _quest_for(payload):
+    mission = payload.get("mission_idea") or "your mission"
+    return {
+        "quest_name": "OPERATION STUB",
+        "mission_summary": f"Benchmark quest for {mission}.",
+        "difficulty": "Easy",
+        "estimated_duration_days": 14,
+        "help_mode": payload.get("help_mode") or "supplies",
+        "steps": [
+            {"id": i, "title": f"Step {i}", "description": f"Do part {i} of {mission}.", "sgxp_reward": 5 + 5 * i}
+            for i in range(1, 6)
+        ],
+        "reflection_prompts": ["What did you learn?"],
+        "safety_notes": ["Always involve a trusted adult."],
+    }
+
+
+class StubInferenceServer:
+    """Threaded stub server; ``calls`` counts requests received."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, stream=False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stream = stream
+        self.calls = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.calls += 1
+                if stub.latency and not stub.stream:
+                    time.sleep(stub.latency)
+                if random.random() < stub.error_rate:
+                    status, body = 503, {"error": "stub failure"}
+                else:
+                    status, body = 200, _quest_for(payload)
+                data = json.dumps(body).encode("utf-8")
+                if stub.stream and status == 200:
+                    self._send_chunked(data)
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunked(self, data, piece=24):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [data[i:i + piece] for i in range(0, len(data), piece)]
+                for chunk in pieces:
+                    time.sleep(stub.latency / len(pieces))
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/generate"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to wait before answering")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--stream", action="store_true", help="spread --latency over a chunked response body")
+    args = parser.parse_args()
+    stub = StubInferenceServer(args.host, args.port, args.latency, args.error_rate, args.stream)
+    print(f"Stub SmartInference listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
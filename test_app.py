@@ -1,10 +1,11 @@
+import json
 import os
 import sys
 
 # Add raindrop-backend to the Python path so we can import the Flask app
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
 
-from app import app  # type: ignore
+from app import app, schema_init  # type: ignore
 
 
 def test_generate_and_get_quests():
@@ -32,3 +33,138 @@ def test_generate_and_get_quests():
     assert single['id'] == quest_id
     # Ensure the details match what was returned on creation
     assert single['quest_name'] == created['quest_name']
+
+
+def test_stats_endpoints_without_database(monkeypatch):
+    """Aggregate endpoints answer with empty totals when no DB is configured."""
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    client = app.test_client()
+    assert client.get('/stats/session').get_json()['earned_sgxp'] == 0
+    overall = client.get('/stats/global').get_json()
+    assert overall['sessions'] == 0 and overall['help_modes'] == {}
+    assert client.get('/leaderboard').get_json() == []
+    assert client.get('/quests/7').status_code == 404
+
+
+def test_generate_quests_batch_keeps_order_and_item_errors(monkeypatch):
+    """Batch generation returns one result per mission, in request order."""
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    client = app.test_client()
+    resp = client.post('/generate-quests:batch', json={'missions': [
+        {'mission_idea': 'plant a community garden', 'help_mode': 'helpers'},
+        'not a mission',
+        {'mission_idea': 'collect books for the library', 'help_mode': 'supplies'},
+    ]})
+    assert resp.status_code == 200
+    results = resp.get_json()['results']
+    assert [r['index'] for r in results] == [0, 1, 2]
+    assert results[0]['quest']['quest_name'] == 'OPERATION GREEN ROOTS'
+    assert 'error' in results[1]
+    assert results[2]['quest']['help_mode'] == 'supplies'
+    assert client.post('/generate-quests:batch', json={'missions': []}).status_code == 400
+
+
+def test_suit_log_revalidation_and_invalidation(monkeypatch, tmp_path):
+    """Unchanged Suit Logs answer 304; deleting a quest changes the ETag."""
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'quests.sqlite3'))
+    import db  # type: ignore
+    db.init_schema()
+    client = app.test_client()
+    query = '/quests?client_id=etag-hero'
+    created = client.post('/generate-quest', json={'mission_idea': 'fix the park bench', 'client_id': 'etag-hero'})
+    first = client.get(query)
+    etag = first.headers['ETag']
+    assert [q['id'] for q in first.get_json()] == [created.get_json()['id']]
+    assert client.get(query, headers={'If-None-Match': etag}).status_code == 304
+    assert client.delete(f"/quests/{created.get_json()['id']}?client_id=etag-hero").status_code == 204
+    after = client.get(query, headers={'If-None-Match': etag})
+    assert after.status_code == 200 and after.get_json() == []
+
+
+def test_liveness_and_readiness_probes():
+    """Liveness is unconditional; readiness reflects the background checks."""
+    client = app.test_client()
+    assert client.get('/livez').get_json() == {'status': 'ok'}
+    assert schema_init.wait(10)
+    from app import readiness  # type: ignore
+    readiness.run_checks()
+    resp = client.get('/readyz')
+    assert resp.status_code == 200
+    assert resp.get_json()['checks']['database']['schema_version'] >= 1
+
+
+def test_write_behind_quests_are_readable_before_the_flush(monkeypatch, tmp_path):
+    """A queued quest is spilled, then flushed by the first read that needs it."""
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'quests.sqlite3'))
+    import db  # type: ignore
+    import quest_writer  # type: ignore
+    db.init_schema()
+    writer = quest_writer.QuestWriter(db.reserve_quest_ids, db.import_quests,
+                                      spill_dir=str(tmp_path / 'spill'), flush_interval=60)
+    monkeypatch.setattr(quest_writer, 'QUEST_WRITE_BEHIND', True)
+    monkeypatch.setattr(quest_writer, '_writer', writer)
+    client = app.test_client()
+    created = client.post('/generate-quest', json={'mission_idea': 'paint a mural', 'client_id': 'wb-hero'}).get_json()
+    assert writer.has_pending(quest_id=created['id'])
+    assert db.get_quest_by_id(created['id']) is None
+    assert [q['id'] for q in client.get('/quests?client_id=wb-hero').get_json()] == [created['id']]
+    assert not writer.has_pending()
+    toggled = client.patch(f"/quests/{created['id']}/steps/1?client_id=wb-hero", json={'completed': True})
+    assert toggled.status_code == 200
+    writer.close()
+
+
+def test_generate_quest_stream_sends_events_then_the_stored_quest(monkeypatch):
+    """The SSE variant sends the name, summary and steps, then ``done`` with an id."""
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    for name in ('RAINDROP_API_URL', 'RAINDROP_API_KEY'):
+        monkeypatch.delenv(name, raising=False)
+    client = app.test_client()
+    resp = client.post('/generate-quest:stream', json={'mission_idea': 'clean the beach', 'help_mode': 'helpers'})
+    assert resp.mimetype == 'text/event-stream'
+    events = [block.split('\n') for block in resp.get_data(as_text=True).split('\n\n') if block]
+    names = [lines[0][len('event: '):] for lines in events]
+    assert names[:2] == ['quest_name', 'mission_summary'] and names[-1] == 'done'
+    done = json.loads(events[-1][1][len('data: '):])
+    assert names.count('step') == len(done['steps']) and done['id'] == 0
+
+
+def test_generation_is_rate_limited_per_client(monkeypatch):
+    """A client over its budget gets 429 with Retry-After; others are unaffected."""
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    import rate_limit  # type: ignore
+    monkeypatch.setitem(rate_limit._limiters, 'generate', rate_limit.RateLimiter('generate', per_minute=1, burst=1))
+    client = app.test_client()
+    assert client.post('/generate-quest', json={'mission_idea': 'x', 'client_id': 'eager'}).status_code == 200
+    limited = client.post('/generate-quest', json={'mission_idea': 'x', 'client_id': 'eager'})
+    assert limited.status_code == 429 and limited.headers['Retry-After'] == '60'
+    assert client.post('/generate-quest', json={'mission_idea': 'x', 'client_id': 'calm'}).status_code == 200
+
+
+def test_generation_is_shed_when_inference_is_saturated(monkeypatch):
+    """With every inference slot taken and no queue, SmartInference generation answers 503."""
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    monkeypatch.setenv('QUEST_CACHE_SIZE', '0')
+    import rate_limit  # type: ignore
+    slots = rate_limit.ConcurrencyLimiter(limit=1, max_queue=0)
+    monkeypatch.setattr(rate_limit, '_inference_slots', slots)
+    held = slots.acquire()
+    client = app.test_client()
+    # Offline generation touches no upstream quota and is never shed.
+    for name in ('RAINDROP_API_URL', 'RAINDROP_API_KEY'):
+        monkeypatch.delenv(name, raising=False)
+    assert client.post('/generate-quest', json={'mission_idea': 'busy', 'client_id': 'offline'}).status_code == 200
+
+    # Nothing listens on port 9, so an admitted call fails fast and falls back.
+    monkeypatch.setenv('RAINDROP_API_URL', 'http://127.0.0.1:9/generate')
+    monkeypatch.setenv('RAINDROP_API_KEY', 'shed-key')
+    monkeypatch.setenv('RAINDROP_MAX_RETRIES', '0')
+    shed = client.post('/generate-quest', json={'mission_idea': 'busy', 'client_id': 'shed'})
+    assert shed.status_code == 503 and int(shed.headers['Retry-After']) >= 1
+    assert client.post('/generate-quest:stream', json={'mission_idea': 'busy'}).status_code == 503
+    slots.release(held)
+    assert client.post('/generate-quest', json={'mission_idea': 'busy', 'client_id': 'shed'}).status_code == 200
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add raindrop-backend to the Python path so we can import the ASGI app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+from asgi_app import app  # type: ignore
+
+
+@pytest.fixture(autouse=True)
+def _fresh_progress_tracker(monkeypatch):
+    """Step toggles buffered by other test modules belong to other databases."""
+    import quest_progress  # type: ignore
+    monkeypatch.setattr(quest_progress, '_tracker', None)
+
+
+def _call(method, path, body=None, headers=None, query=b''):
+    """Drive the ASGI app directly and return (status, headers, body).
+
+    Streamed bodies are joined; only JSON responses are decoded.
+    """
+    raw = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        'client': ('203.0.113.7', 50000),
+    }
+    sent = []
+    requested = []
+
+    async def receive():
+        if not requested:
+            requested.append(True)
+            return {'type': 'http.request', 'body': raw, 'more_body': False}
+        # The client stays connected until the response is complete.
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, *chunks = sent
+    payload = b''.join(chunk['body'] for chunk in chunks)
+    response_headers = {k.decode(): v.decode() for k, v in start['headers']}
+    if response_headers.get('content-type') == 'application/json':
+        payload = json.loads(payload) if payload else None
+    return start['status'], response_headers, payload
+
+
+def test_asgi_routes_match_flask_contracts(monkeypatch):
+    """The async entry point answers the same routes with the same JSON shapes."""
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    monkeypatch.delenv('RAINDROP_API_URL', raising=False)
+
+    assert _call('GET', '/healthz')[2] == {'status': 'ok'}
+
+    status, _, data = _call('POST', '/clarify-mission', {'mission_idea': 'help', 'help_mode': 'helpers'})
+    assert status == 200
+    assert 'How many helpers do you think you need?' in data['questions']
+
+    status, headers, quest = _call(
+        'POST', '/generate-quest', {'mission_idea': 'plant a community garden', 'help_mode': 'helpers'}
+    )
+    assert status == 200
+    assert quest['id'] == 0
+    assert quest['quest_name'] == 'OPERATION GREEN ROOTS'
+    assert len(quest['steps']) == 5
+    assert headers['set-cookie'].startswith('session_id=')
+
+    assert _call('GET', '/quests')[2] == []
+    assert _call('DELETE', '/quests')[2] == {'deleted': 0}
+    assert _call('DELETE', '/quests/7')[0] == 204
+    assert _call('GET', '/quests/7')[0] == 404
+    assert _call('GET', '/nope')[0] == 404
+    assert _call('PUT', '/healthz')[0] == 405
+
+
+def test_asgi_persists_quests_with_the_sqlite_backend(monkeypatch, tmp_path):
+    """Without Postgres, quests are stored in SQLite exactly as the Flask app does."""
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.delenv('DB_BACKEND', raising=False)
+    monkeypatch.delenv('RAINDROP_API_URL', raising=False)
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'asgi.sqlite3'))
+    import db  # type: ignore
+    db.init_schema()
+    cookie = {'Cookie': 'session_id=asgi-sqlite'}
+
+    status, _, quest = _call('POST', '/generate-quest', {'mission_idea': 'book drive'}, headers=cookie)
+    assert status == 200 and quest['id'] > 0
+    status, _, listed = _call('GET', '/quests', headers=cookie)
+    assert [q['id'] for q in listed] == [quest['id']] and listed[0]['total_sgxp'] > 0
+    assert _call('GET', f"/quests/{quest['id']}")[2]['completed_step_ids'] == []
+    assert _call('DELETE', f"/quests/{quest['id']}", headers=cookie)[0] == 204
+    assert _call('GET', f"/quests/{quest['id']}")[0] == 404
+
+
+def test_asgi_cors_reflects_origin():
+    """Credentialed CORS behaves like flask_cors(supports_credentials=True)."""
+    status, headers, _ = _call(
+        'OPTIONS',
+        '/generate-quest',
+        headers={
+            'Origin': 'https://hud.example',
+            'Access-Control-Request-Method': 'POST',
+            'Access-Control-Request-Headers': 'content-type',
+        },
+    )
+    assert status == 200
+    assert headers['access-control-allow-origin'] == 'https://hud.example'
+    assert headers['access-control-allow-credentials'] == 'true'
+    assert headers['access-control-allow-headers'] == 'content-type'
+
+
+def test_async_insert_creates_a_missing_partition_and_retries(monkeypatch):
+    """An insert into a month with no partition creates it and is retried once."""
+    import db  # type: ignore
+    import db_async  # type: ignore
+
+    class NoPartition(Exception):
+        sqlstate = '23514'
+
+    class FakePool:
+        calls = 0
+
+        async def fetchrow(self, query, *args):
+            self.calls += 1
+            if self.calls == 1:
+                raise NoPartition('no partition of relation "quests" found for row')
+            return {'id': 7, 'created_at': 'now'}
+
+    pool = FakePool()
+
+    async def get_pool():
+        return pool
+
+    ensured = []
+    monkeypatch.setattr(db_async, 'get_pool', get_pool)
+    monkeypatch.setattr(db, 'ensure_quest_partitions', lambda: ensured.append(True))
+    assert asyncio.run(db_async.insert_quest('s', {'steps': []}))['id'] == 7
+    assert ensured == [True] and pool.calls == 2
+
+
+def test_async_rows_carry_progress_like_the_flask_read_path(monkeypatch):
+    """Async inserts fix total_sgxp and reads return the same progress fields as db."""
+    import datetime
+
+    import db_async  # type: ignore
+
+    inserted = []
+    row = {'id': 3, 'session_id': 's', 'created_at': datetime.datetime(2026, 1, 2, tzinfo=datetime.timezone.utc),
+           'completed_step_ids': [1], 'earned_sgxp': 10, 'total_sgxp': 30,
+           'quest_json': {'quest_name': 'Q', 'steps': []}}
+
+    class FakePool:
+        async def fetchrow(self, query, *args):
+            if query.lstrip().startswith('INSERT'):
+                inserted.append(args)
+                return {'id': 3, 'created_at': row['created_at']}
+            assert 'completed_step_ids' in query and 'total_sgxp' in query
+            return row
+
+    async def get_pool():
+        return FakePool()
+
+    monkeypatch.setattr(db_async, 'get_pool', get_pool)
+    quest = {'quest_name': 'Q', 'steps': [{'id': 1, 'sgxp_reward': 10}, {'id': 2, 'sgxp_reward': 20}]}
+    asyncio.run(db_async.insert_quest('s', quest))
+    assert inserted[0][2] == 30
+    stored = asyncio.run(db_async.get_quest_by_id(3))
+    assert stored['completed_step_ids'] == [1] and stored['earned_sgxp'] == 10 and stored['total_sgxp'] == 30
+
+
+def test_shared_quest_cache_is_used_off_the_event_loop(monkeypatch, tmp_path):
+    """With the SQLite cache tier, cache reads and writes run on worker threads."""
+    import threading
+
+    import asgi_app  # type: ignore
+    import quest_cache  # type: ignore
+
+    cache = quest_cache.QuestCache(shared=quest_cache.SQLiteCacheTier(str(tmp_path / 'cache.sqlite3')))
+    monkeypatch.setattr(quest_cache, '_cache', cache)
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    monkeypatch.delenv('RAINDROP_API_URL', raising=False)
+    threads = []
+    for name in ('get', 'set'):
+        original = getattr(cache.shared, name)
+
+        def record(*args, original=original):
+            threads.append(threading.current_thread() is threading.main_thread())
+            return original(*args)
+
+        monkeypatch.setattr(cache.shared, name, record)
+    assert _call('POST', '/generate-quest', {'mission_idea': 'shared tier'})[0] == 200
+    assert threads and not any(threads)
+
+
+def test_asgi_and_flask_serve_the_same_routes():
+    """Every Flask API route is served by the ASGI app with the same methods."""
+    import asgi_app  # type: ignore
+    from app import app as flask_app  # type: ignore
+
+    flask_routes = {}
+    for rule in flask_app.url_map.iter_rules():
+        if rule.endpoint == 'static' or rule.rule in asgi_app.FLASK_ONLY_ROUTES:
+            continue
+        flask_routes.setdefault(rule.rule, set()).update(rule.methods - {'HEAD', 'OPTIONS'})
+    asgi_routes = {rule: set(handlers) for rule, handlers in asgi_app.ROUTES}
+    assert asgi_routes == flask_routes
+
+
+def test_asgi_serves_progress_stats_and_leaderboard(monkeypatch, tmp_path):
+    """Step toggles, stats and the leaderboard match the Flask responses."""
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.delenv('DB_BACKEND', raising=False)
+    monkeypatch.delenv('RAINDROP_API_URL', raising=False)
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'asgi-stats.sqlite3'))
+    import db  # type: ignore
+    db.init_schema()
+    cookie = {'Cookie': 'session_id=asgi-stats'}
+
+    quest = _call('POST', '/generate-quest', {'mission_idea': 'clean the park'}, headers=cookie)[2]
+    step = quest['steps'][0]
+    status, _, progress = _call('PATCH', f"/quests/{quest['id']}/steps/{step['id']}", {'completed': True}, headers=cookie)
+    assert status == 200 and progress['completed_step_ids'] == [step['id']]
+    assert _call('PATCH', f"/quests/{quest['id']}/steps/999", {'completed': True}, headers=cookie)[0] == 404
+    assert _call('PATCH', f"/quests/{quest['id']}/steps/{step['id']}", {'completed': 'yes'})[0] == 400
+
+    assert _call('GET', f"/quests/{quest['id']}")[2]['completed_step_ids'] == [step['id']]
+    stats = _call('GET', '/stats/session', headers=cookie)[2]
+    assert stats['quest_count'] == 1 and stats['earned_sgxp'] == step['sgxp_reward']
+    assert _call('GET', '/stats/global')[2]['quest_count'] >= 1
+    board = _call('GET', '/leaderboard', headers=cookie)[2]
+    assert board[0]['rank'] == 1 and board[0]['you'] is True and 'session_id' not in board[0]
+    assert _call('GET', '/leaderboard', query=b'limit=x')[0] == 400
+
+
+def test_asgi_batch_and_stream_generation(monkeypatch):
+    """Batch results keep request order; the stream ends with the stored quest."""
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    monkeypatch.delenv('RAINDROP_API_URL', raising=False)
+
+    status, _, data = _call('POST', '/generate-quests:batch', {'missions': [{'mission_idea': 'a'}, 'bad']})
+    assert status == 200
+    assert data['results'][0]['index'] == 0 and data['results'][0]['quest']['id'] == 0
+    assert data['results'][1] == {'index': 1, 'error': 'Mission must be a JSON object'}
+    assert _call('POST', '/generate-quests:batch', {'missions': []})[0] == 400
+
+    status, headers, body = _call('POST', '/generate-quest:stream', {'mission_idea': 'plant trees'})
+    assert status == 200 and headers['content-type'].startswith('text/event-stream')
+    assert headers['x-accel-buffering'] == 'no' and headers['set-cookie'].startswith('session_id=')
+    events = [block.split('\n') for block in body.decode().strip().split('\n\n')]
+    names = [lines[0][len('event: '):] for lines in events]
+    assert names[:2] == ['quest_name', 'mission_summary'] and names[-1] == 'done'
+    done = json.loads(events[-1][1][len('data: '):])
+    assert names.count('step') == len(done['steps']) and done['id'] == 0
+
+
+def test_asgi_probes_and_rate_limits(monkeypatch):
+    """Liveness, readiness and per-client 429s behave as in the Flask app."""
+    import rate_limit  # type: ignore
+
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    monkeypatch.delenv('RAINDROP_API_URL', raising=False)
+    assert _call('GET', '/livez')[2] == {'status': 'ok'}
+    status, _, snapshot = _call('GET', '/readyz')
+    assert status in (200, 503) and 'checks' in snapshot
+    assert _call('GET', '/stats/quest-cache')[2]['single_flight']['in_flight'] == 0
+
+    monkeypatch.setitem(rate_limit._limiters, 'generate', rate_limit.RateLimiter('generate', per_minute=1, burst=1))
+    assert _call('POST', '/generate-quest', {'mission_idea': 'x', 'client_id': 'eager'})[0] == 200
+    status, headers, _ = _call('POST', '/generate-quest', {'mission_idea': 'x', 'client_id': 'eager'})
+    assert status == 429 and headers['retry-after'] == '60'
+    assert _call('POST', '/generate-quest', {'mission_idea': 'x', 'client_id': 'calm'})[0] == 200
+
+
+def test_asgi_writes_invalidate_the_flask_read_cache(monkeypatch, tmp_path):
+    """Suit Logs cached by a Flask worker go stale when the ASGI app writes."""
+    import quest_read_cache  # type: ignore
+    from app import app as flask_app  # type: ignore
+
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.delenv('RAINDROP_API_URL', raising=False)
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'asgi-reads.sqlite3'))
+    shared = quest_read_cache.SQLiteReadTier(str(tmp_path / 'read-cache.sqlite3'))
+    monkeypatch.setattr(quest_read_cache, '_cache', quest_read_cache.QuestReadCache(shared=shared))
+    import db  # type: ignore
+    db.init_schema()
+    flask = flask_app.test_client()
+    query = '/quests?client_id=asgi-reads'
+
+    def revalidate(etag):
+        return flask.get(query, headers={'If-None-Match': etag})
+
+    etag = flask.get(query).headers['ETag']
+    quest = _call('POST', '/generate-quest', {'mission_idea': 'paint a mural', 'client_id': 'asgi-reads'})[2]
+    page = revalidate(etag)
+    assert page.status_code == 200 and [q['id'] for q in page.get_json()] == [quest['id']]
+
+    step_id = quest['steps'][0]['id']
+    assert _call('PATCH', f"/quests/{quest['id']}/steps/{step_id}", {'completed': True, 'client_id': 'asgi-reads'})[0] == 200
+    page = revalidate(page.headers['ETag'])
+    assert page.status_code == 200 and page.get_json()[0]['completed_step_ids'] == [step_id]
+
+    assert _call('DELETE', f"/quests/{quest['id']}", query=b'client_id=asgi-reads')[0] == 204
+    page = revalidate(page.headers['ETag'])
+    assert page.status_code == 200 and page.get_json() == []
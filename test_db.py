@@ -0,0 +1,41 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add raindrop-backend to the Python path so we can import the DB helpers
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import pytest
+
+import db  # type: ignore
+
+
+def test_cursor_round_trip():
+    """Pagination cursors are opaque but decode back to the keyset position."""
+    created_at = datetime(2025, 11, 30, 18, 5, 1, 123456, tzinfo=timezone.utc)
+    cursor = db.encode_cursor(created_at, 42)
+    assert '|' not in cursor
+    assert db.decode_cursor(cursor) == (created_at, 42)
+
+
+def test_malformed_cursor_is_rejected():
+    """Garbage cursors raise ValueError so the API can answer 400."""
+    for bad in ['not-a-cursor', '!!!', db.encode_cursor('yesterday', 1)]:
+        with pytest.raises(ValueError):
+            db.decode_cursor(bad)
+
+
+def test_step_rewards_match_hud_defaults():
+    """Server-side SGXP totals use the same step defaults as the HUD."""
+    quest = {'steps': [{'id': 1, 'sgxp_reward': 15}, {'title': 'no id'}, {'id': 9, 'sgxp_reward': 'x'}]}
+    assert db.step_rewards(quest) == {1: 15, 2: 10, 9: 10}
+    assert db.step_rewards({}) == {}
+
+
+def test_retention_cutoff_counts_whole_months():
+    """Retention keeps the current month plus N whole months before it, in UTC."""
+    now = datetime(2026, 1, 17, 9, 30, tzinfo=timezone.utc)
+    assert db.month_start(now) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert db.add_months(db.month_start(now), -1) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert db.add_months(datetime(2025, 12, 1, tzinfo=timezone.utc), 1) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert db.retention_cutoff(12, now=now) == datetime(2025, 1, 1, tzinfo=timezone.utc)
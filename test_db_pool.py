@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import time
+
+# Add raindrop-backend to the Python path so we can import the pool
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout  # type: ignore
+
+
+class FakeConnection:
+    """Stand-in for a DB-API connection that records how it was used."""
+
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+def _make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(connect, check=lambda conn: conn.healthy, **kwargs)
+    return pool, created
+
+
+def test_connections_are_reused():
+    """A returned connection should be handed out again instead of reconnecting."""
+    pool, created = _make_pool(minconn=1, maxconn=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats['checkouts'] == 2
+    assert stats['idle'] == 1
+    assert stats['in_use'] == 0
+
+
+def test_checkout_times_out_when_exhausted():
+    """Callers wait for a free slot and give up after the checkout timeout."""
+    pool, _ = _make_pool(minconn=0, maxconn=1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()['timeouts'] == 1
+
+    # Returning the connection from another thread wakes up a waiter.
+    releaser = threading.Timer(0.05, pool.putconn, args=(conn,))
+    releaser.start()
+    again = pool.getconn(timeout=2)
+    assert again is conn
+    releaser.join()
+
+
+def test_dead_connections_are_replaced():
+    """Closed or unhealthy idle connections are recycled on checkout."""
+    pool, created = _make_pool(minconn=1, maxconn=2, check_after=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.healthy = False
+    replacement = pool.getconn()
+    assert replacement is not conn
+    assert conn.closed
+    pool.putconn(replacement)
+    replacement.close()
+    third = pool.getconn()
+    assert third is not replacement
+    assert len(created) == 3
+    assert pool.stats()['failed_checks'] == 2
+
+
+def test_old_connections_are_recycled():
+    """Connections past max_lifetime are closed rather than reused."""
+    pool, created = _make_pool(minconn=1, maxconn=1, max_lifetime=0.01)
+    conn = pool.getconn()
+    time.sleep(0.02)
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.getconn() is not conn
+    assert pool.stats()['recycled'] == 1
+
+
+def test_pool_never_exceeds_max_under_contention():
+    """Concurrent checkouts never open more than maxconn connections."""
+    pool, created = _make_pool(minconn=0, maxconn=3, timeout=5)
+
+    def worker():
+        for _ in range(20):
+            with pool.connection():
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) <= 3
+    assert pool.stats()['checkouts'] == 160
+
+
+def test_idle_connections_are_closed_outside_the_lock():
+    """Pruning idle connections never holds the pool lock while closing them."""
+    pool, created = _make_pool(minconn=0, maxconn=2, max_idle=0)
+    lock_free_during_close = []
+
+    def close(conn):
+        acquired = pool._cond.acquire(blocking=False)
+        if acquired:
+            pool._cond.release()
+        lock_free_during_close.append(acquired)
+        conn.closed = True
+
+    first, second = pool.getconn(), pool.getconn()
+    for conn in (first, second):
+        conn.close = lambda conn=conn: close(conn)
+    pool.putconn(first)
+    pool.putconn(second)
+    assert first.closed and lock_free_during_close and all(lock_free_during_close)
+    assert pool.stats()['closed'] >= 1
@@ -0,0 +1,32 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add raindrop-backend to the Python path so we can import fast_json
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import fast_json  # type: ignore
+from app import app  # type: ignore
+
+
+def test_dumps_matches_stdlib_and_http_dates():
+    """Encoded output parses to the stdlib result and keeps HTTP-date timestamps."""
+    payload = {
+        'quest_name': 'OPERATION GREEN ROOTS',
+        'steps': [{'id': 1, 'text': 'café ☕'}],
+        'created_at': datetime(2024, 3, 5, 14, 30, tzinfo=timezone.utc),
+    }
+    decoded = json.loads(fast_json.dumps(payload))
+    assert decoded['steps'] == payload['steps']
+    assert decoded['created_at'] == 'Tue, 05 Mar 2024 14:30:00 GMT'
+    assert fast_json.loads(fast_json.dumps([1, 'a'])) == [1, 'a']
+
+
+def test_raw_json_response_passes_text_through():
+    """Pre-encoded JSON text is sent as-is with a JSON content type."""
+    with app.app_context():
+        resp = fast_json.raw_json_response('[{"id":1}]')
+        assert resp.mimetype == 'application/json'
+        assert resp.get_data(as_text=True) == '[{"id":1}]'
+        assert fast_json.json_response({'error': 'x'}, 404).status_code == 404
@@ -35,3 +35,112 @@ def test_generate_quest_fallback():
     first_step = quest['steps'][0]
     # Each step should include a reward field
     assert 'sgxp_reward' in first_step or 'reward' in first_step
+
+
+def test_select_codename_matches_words_by_priority():
+    """Codenames come from keywords at word starts, honoring category order."""
+    import generate_quest as offline_generator  # type: ignore
+
+    select = offline_generator._select_codename
+    assert select('Adopt a kitten from the animal shelter') == 'COMFY PAWS'
+    assert select('Walk the dogs at the homeless shelter') == 'BRAVE PAWS'
+    assert select('Start a food drive for school lunches') == 'FULL PLATES'
+    # "cat" inside "education" must not count as a cat mission.
+    assert select('Better education for everyone') == 'CITIZEN HERO'
+    assert select('  IcE   CaPs are melting ') == 'GREEN GUARDIANS'
+    # Inflected forms count as their keyword.
+    assert select('Gardening at the senior center') == 'GREEN ROOTS'
+    assert select('Planting saplings along the river') == 'GREEN ROOTS'
+    assert select('Organize two food drives') == 'FULL PLATES'
+    assert select('Make art from recycled bottles') == 'CLEAN SWEEP'
+    assert select('') == 'CITIZEN HERO'
+
+
+def test_extra_codename_categories_from_file(tmp_path):
+    """Extra categories load from JSON and rank below the built-in ones."""
+    import json
+
+    import generate_quest as offline_generator  # type: ignore
+
+    path = tmp_path / 'categories.json'
+    path.write_text(json.dumps([{'codename': 'Ocean Guardians', 'keywords': ['reef', 'beach']}]))
+    categories = list(offline_generator._CODENAME_CATEGORIES)
+    categories.extend(offline_generator._load_extra_categories(str(path)))
+    pattern, priorities, codenames = offline_generator._compile_codename_matcher(categories)
+
+    matches = [priorities[m.group(1)] for m in pattern.finditer('clean the reefs and the beach trash')]
+    assert codenames[min(matches)] == 'CLEAN SWEEP'
+    matches = [priorities[m.group(1)] for m in pattern.finditer('protect the coral reef')]
+    assert codenames[min(matches)] == 'OCEAN GUARDIANS'
+
+
+def test_templates_override_and_localize(tmp_path, monkeypatch):
+    """Extra template files add locales and help modes without code changes."""
+    import importlib
+    import json
+
+    (tmp_path / 'es.json').write_text(json.dumps({
+        'locale': 'es',
+        'defaults': {
+            'difficulty': 'Media',
+            'estimated_duration_days': 14,
+            'reflection_prompts': ['¿Qué aprendiste con {mission|esta misión}?'],
+            'safety_notes': ['Trabaja siempre con un adulto de confianza.'],
+        },
+        'help_modes': {'*': {
+            'mission_summary': 'Actúa sobre {mission|tu misión}.',
+            'steps': [{'id': 1, 'title': 'Empieza', 'description': 'Plan para {mission|tu misión}.', 'sgxp_reward': 10}],
+        }},
+    }), encoding='utf-8')
+    (tmp_path / 'en.json').write_text(json.dumps({'help_modes': {'mentors': {
+        'mission_summary': 'Find mentors for {mission}.',
+        'steps': [{'id': 1, 'title': 'Ask around', 'description': 'Ask two adults.', 'sgxp_reward': 12}],
+    }}}), encoding='utf-8')
+    monkeypatch.setenv('QUEST_TEMPLATES_DIR', str(tmp_path))
+    import generate_quest as offline_generator  # type: ignore
+    try:
+        reloaded = importlib.reload(offline_generator)
+        spanish = reloaded.generate_quest({'mission_idea': '', 'help_mode': 'awareness', 'locale': 'es'})
+        assert spanish['mission_summary'] == 'Actúa sobre tu misión.'
+        assert spanish['reflection_prompts'] == ['¿Qué aprendiste con esta misión?']
+        mentors = reloaded.generate_quest({'mission_idea': 'tutoring', 'help_mode': 'mentors'})
+        assert mentors['mission_summary'] == 'Find mentors for tutoring.'
+        assert mentors['steps'][0]['sgxp_reward'] == 12
+        # Bundled English modes are still there alongside the override.
+        assert len(reloaded.generate_quest({'help_mode': 'helpers'})['steps']) == 5
+    finally:
+        monkeypatch.delenv('QUEST_TEMPLATES_DIR')
+        importlib.reload(offline_generator)
+
+
+def test_invalid_template_is_rejected_at_load():
+    """Template errors surface at startup, not on the request path."""
+    import pytest
+
+    import generate_quest as offline_generator  # type: ignore
+
+    with pytest.raises(ValueError):
+        offline_generator._compile_text('Hi {name}', 'x')
+    with pytest.raises(ValueError):
+        offline_generator._compile_help_mode({'mission_summary': 'x', 'steps': []}, 'x')
+
+
+def test_offline_quests_split_into_one_shared_body(monkeypatch):
+    """Offline quests of one help mode share a body that rejoins them exactly."""
+    import generate_quest as offline_generator  # type: ignore
+    import quest_dedup  # type: ignore
+
+    monkeypatch.setenv('QUEST_DEDUP', '1')
+    first = offline_generator.generate_quest({'mission_idea': 'plant a "garden"', 'help_mode': 'helpers'})
+    second = offline_generator.generate_quest({'mission_idea': 'book drive', 'help_mode': 'helpers'})
+    assert offline_generator.match_offline_quest(first) == ('en', 'plant a "garden"')
+    split_first, split_second = quest_dedup.split_quest(first), quest_dedup.split_quest(second)
+    assert split_first.body_hash == split_second.body_hash
+    assert set(split_first.quest_json) == set(quest_dedup.ROW_FIELDS)
+    assert quest_dedup.join_quest(split_first.body, split_first.quest_json, split_first.body_mission) == first
+
+    edited = dict(first, mission_summary='Something else entirely.')
+    assert offline_generator.match_offline_quest(edited) is None
+    assert quest_dedup.split_quest(edited).body_hash is None
+    monkeypatch.setenv('QUEST_DEDUP', '0')
+    assert quest_dedup.split_quest(first).quest_json is first
@@ -0,0 +1,46 @@
+import os
+import sys
+
+# Add raindrop-backend to the Python path so we can import the health checks
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+from health import HealthMonitor, RetryingTask  # type: ignore
+
+
+def test_readiness_follows_required_checks_only():
+    """Optional checks are reported but do not make the app unready."""
+    state = {'db': False}
+
+    def database():
+        if not state['db']:
+            raise ConnectionError('connection refused')
+        return True, {'schema_version': 1}
+
+    monitor = HealthMonitor([
+        ('database', database, True),
+        ('inference', lambda: (False, {'state': 'open'}), False),
+    ])
+    assert monitor.snapshot()['status'] == 'starting'
+    snapshot = monitor.run_checks()
+    assert snapshot['ready'] is False
+    assert snapshot['checks']['database']['error'] == 'connection refused'
+    state['db'] = True
+    snapshot = monitor.run_checks()
+    assert snapshot['ready'] is True and snapshot['checks']['inference']['ok'] is False
+    assert monitor.snapshot() is snapshot
+
+
+def test_retrying_task_runs_until_success():
+    """The startup task keeps retrying with backoff and then stops."""
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError('database starting up')
+
+    task = RetryingTask('schema-init', flaky, initial_delay=0.01, max_delay=0.02).start()
+    assert task.wait(5)
+    assert task.status() == {'done': True, 'attempts': 3, 'last_error': None}
+    task.start()
+    assert len(calls) == 3
@@ -0,0 +1,268 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add raindrop-backend to the Python path so we can import the client
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import pytest
+
+import inference_client  # type: ignore
+from inference_client import CircuitBreaker, InferenceClient  # type: ignore
+
+QUEST = {
+    'quest_name': 'OPERATION STUB',
+    'mission_summary': 'Served by the stub SmartInference server.',
+    'steps': [{'id': 1, 'title': 'Probe', 'description': 'Say hi.', 'sgxp_reward': 10}],
+}
+
+
+class StubInference:
+    """Local HTTP server that replays a scripted list of responses.
+
+    Each entry in ``script`` is a status code, or ``('sleep', seconds)`` to
+    stall before answering 200.  Once the script runs out it keeps
+    answering 200 with a valid quest.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                stub.requests.append({
+                    'body': json.loads(self.rfile.read(length) or b'{}'),
+                    'auth': self.headers.get('Authorization'),
+                })
+                action = stub.script.pop(0) if stub.script else 200
+                if isinstance(action, tuple):
+                    time.sleep(action[1])
+                    action = 200
+                body = json.dumps(QUEST if action == 200 else {'error': 'boom'}).encode()
+                self.send_response(action)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/generate'
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True
+        )
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubInference()
+    yield server
+    server.close()
+
+
+def _client(stub, **kwargs):
+    kwargs.setdefault('backoff_base', 0.001)
+    kwargs.setdefault('backoff_max', 0.002)
+    return InferenceClient(stub.url, 'test-key', **kwargs)
+
+
+def test_success_uses_bearer_token(stub):
+    """A healthy endpoint returns the quest and sees our API key."""
+    client = _client(stub)
+    assert client.generate({'mission_idea': 'hi'}) == QUEST
+    assert stub.requests[0]['auth'] == 'Bearer test-key'
+    assert stub.requests[0]['body'] == {'mission_idea': 'hi'}
+
+
+def test_transient_errors_are_retried(stub):
+    """5xx responses are retried within the retry budget."""
+    stub.script = [503, 502]
+    client = _client(stub, max_retries=2)
+    assert client.generate({}) == QUEST
+    assert len(stub.requests) == 3
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried(stub):
+    """4xx responses fail immediately without burning retries."""
+    stub.script = [400]
+    client = _client(stub, max_retries=3)
+    assert client.generate({}) is None
+    assert len(stub.requests) == 1
+
+
+def test_read_timeout_is_enforced(stub):
+    """A stalled endpoint is abandoned after the read timeout."""
+    stub.script = [('sleep', 0.5)]
+    client = _client(stub, read_timeout=0.1, max_retries=0)
+    started = time.monotonic()
+    assert client.generate({}) is None
+    assert time.monotonic() - started < 0.45
+
+
+def test_breaker_opens_then_half_opens(stub):
+    """Repeated failures open the circuit; after the cooldown one probe goes out."""
+    stub.script = [500, 500]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    client = _client(stub, max_retries=0, breaker=breaker)
+    assert client.generate({}) is None
+    assert client.generate({}) is None
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # While open, calls short-circuit without reaching the server.
+    assert client.generate({}) is None
+    assert len(stub.requests) == 2
+
+    time.sleep(0.15)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert client.generate({}) == QUEST
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert len(stub.requests) == 3
+
+
+def test_generate_with_fallback_uses_offline_generator(stub, monkeypatch):
+    """An open circuit sends callers straight to the offline generator."""
+    monkeypatch.setenv('RAINDROP_API_URL', stub.url)
+    monkeypatch.setenv('RAINDROP_API_KEY', 'fallback-key')
+    monkeypatch.setenv('RAINDROP_MAX_RETRIES', '0')
+    monkeypatch.setenv('RAINDROP_BREAKER_THRESHOLD', '1')
+    stub.script = [500]
+    offline = {'quest_name': 'OPERATION OFFLINE', 'steps': []}
+
+    assert inference_client.generate_with_fallback({}, lambda data: offline) == offline
+    assert inference_client.generate_with_fallback({}, lambda data: offline) == offline
+    assert len(stub.requests) == 1
+
+
+def test_fallback_quests_are_not_cached(stub, monkeypatch):
+    """Once SmartInference recovers, repeat missions get its quest, not the cached fallback."""
+    import app  # type: ignore
+    import quest_cache  # type: ignore
+    import quest_stream  # type: ignore
+
+    monkeypatch.setenv('RAINDROP_API_URL', stub.url)
+    monkeypatch.setenv('RAINDROP_API_KEY', 'cache-key')
+    monkeypatch.setenv('RAINDROP_MAX_RETRIES', '0')
+    stub.script = [500]
+    data = {'mission_idea': 'fallback cache probe', 'help_mode': 'solo'}
+    quest_cache.get_cache().clear()
+
+    assert app._generate(data)['quest_name'] != QUEST['quest_name']
+    assert app._generate(data) == QUEST
+    assert app._generate(data) == QUEST
+    assert len(stub.requests) == 2
+
+    stub.script = [500]
+    streamed = {'mission_idea': 'fallback stream probe', 'help_mode': 'solo'}
+    assert list(quest_stream.generate_events(streamed, app.generate_quest))[-1][1] != QUEST
+    assert list(quest_stream.generate_events(streamed, app.generate_quest))[-1][1] == QUEST
+    assert len(stub.requests) == 4
+
+
+def test_stream_yields_the_body_and_returns_the_quest(stub):
+    """Streaming retries failures before any body and returns the validated quest."""
+    stub.script = [503]
+    client = _client(stub)
+    chunks = client.stream({'mission_idea': 'hi'})
+    text = ''
+    while True:
+        try:
+            text += next(chunks)
+        except StopIteration as done:
+            assert done.value == QUEST
+            break
+    assert json.loads(text) == QUEST
+    assert len(stub.requests) == 2 and client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_any_request_error_falls_back_and_settles_the_probe(stub, monkeypatch):
+    """Errors like a cut-off body return None, and a failed probe re-opens the circuit."""
+    import requests
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = _client(stub, max_retries=1, breaker=breaker)
+
+    def broken_post(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError('connection broken mid-body')
+
+    monkeypatch.setattr(client.session, 'post', broken_post)
+    assert client.generate({}) is None
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.1)
+    assert client.generate({}) is None
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.1)
+    monkeypatch.undo()
+    assert client.generate({}) == QUEST
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_abandoned_stream_frees_the_half_open_probe(stub):
+    """Closing a stream mid-body settles the breaker so the next probe can go out."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = _client(stub, max_retries=0, breaker=breaker)
+    stub.script = [500]
+    assert client.generate({}) is None
+    time.sleep(0.1)
+
+    chunks = client.stream({})
+    next(chunks)
+    chunks.close()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert client.generate({}) == QUEST
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_async_client_settles_the_probe_on_cancel_and_any_httpx_error(stub, monkeypatch):
+    """A cancelled or oddly failing async probe never leaves the circuit stuck half-open."""
+    import asyncio
+
+    import httpx
+
+    from inference_client import AsyncInferenceClient  # type: ignore
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+
+    async def scenario():
+        client = AsyncInferenceClient(stub.url, 'test-key', max_retries=0, breaker=breaker)
+        try:
+            stub.script = [500]
+            assert await client.generate({}) is None
+            await asyncio.sleep(0.1)
+
+            stub.script = [('sleep', 0.5)]
+            probe = asyncio.ensure_future(client.generate({}))
+            await asyncio.sleep(0.1)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+
+            async def redirect_loop(*args, **kwargs):
+                raise httpx.TooManyRedirects('redirect loop')
+
+            monkeypatch.setattr(client.client, 'post', redirect_loop)
+            assert await client.generate({}) is None
+            assert breaker.state == CircuitBreaker.OPEN
+            monkeypatch.undo()
+            await asyncio.sleep(0.1)
+            assert await client.generate({}) == QUEST
+            assert breaker.state == CircuitBreaker.CLOSED
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+# Add raindrop-backend to the Python path so we can import the metrics module
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import metrics  # type: ignore
+
+
+def test_histogram_and_counter_exposition():
+    """Requests show up as counters and cumulative histogram buckets."""
+    metrics.reset()
+    metrics.record_request('/quests', 'GET', 200, 0.003)
+    metrics.record_request('/quests', 'GET', 200, 0.2)
+    text = metrics.render()
+    assert 'citizen_hero_http_requests_total{route="/quests",method="GET",status="200"} 2' in text
+    bucket = 'citizen_hero_http_request_duration_seconds_bucket{route="/quests",method="GET",status="200",'
+    assert bucket + 'le="0.0025"} 0' in text
+    assert bucket + 'le="0.005"} 1' in text
+    assert bucket + 'le="+Inf"} 2' in text
+
+
+def test_db_helpers_are_timed():
+    """timed_db records latency and whether the helper raised."""
+    metrics.reset()
+
+    @metrics.timed_db
+    def flaky_helper(fail):
+        if fail:
+            raise RuntimeError('db down')
+        return 'ok'
+
+    assert flaky_helper(False) == 'ok'
+    try:
+        flaky_helper(True)
+    except RuntimeError:
+        pass
+    text = metrics.render()
+    assert 'citizen_hero_db_call_duration_seconds_count{function="flaky_helper",outcome="ok"} 1' in text
+    assert 'citizen_hero_db_call_duration_seconds_count{function="flaky_helper",outcome="error"} 1' in text
+
+
+def test_worker_snapshots_are_merged(tmp_path, monkeypatch):
+    """With METRICS_DIR set, /metrics sums counters from every worker."""
+    metrics.reset()
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    metrics.inc('citizen_hero_inference_requests_total', 'success')
+    other_worker = {
+        'pid': 999999,
+        'counters': {'citizen_hero_inference_requests_total': [[['success'], 4]]},
+        'histograms': {},
+        'gauges': [['citizen_hero_db_pool_connections', 'DB pool connections by state.', {'state': 'idle'}, 3]],
+    }
+    (tmp_path / 'metrics-999999.json').write_text(json.dumps(other_worker))
+
+    text = metrics.render()
+    assert 'citizen_hero_inference_requests_total{outcome="success"} 5' in text
+    assert 'citizen_hero_db_pool_connections{pid="999999",state="idle"} 3' in text
+    assert (tmp_path / f'metrics-{os.getpid()}.json').exists()
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+
+# Add raindrop-backend to the Python path so we can import the cache
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+from quest_cache import QuestCache, SQLiteCacheTier, cache_key  # type: ignore
+
+
+def _counting_generator():
+    calls = []
+
+    def generate(data):
+        calls.append(data)
+        return {'quest_name': f"OPERATION {len(calls)}", 'help_mode': data.get('help_mode'), 'steps': []}
+
+    return generate, calls
+
+
+def test_near_identical_missions_share_a_key():
+    """Case, punctuation and spacing differences map to the same key."""
+    a = {'mission_idea': 'Clean up the PARK!!', 'help_mode': 'helpers'}
+    b = {'mission_idea': '  clean up   the park ', 'help_mode': 'helpers'}
+    assert cache_key(a) == cache_key(b)
+    assert cache_key(a) != cache_key({**a, 'where': 'downtown'})
+
+
+def test_help_modes_never_share_entries():
+    """The same mission with another help_mode is a separate cache entry."""
+    cache = QuestCache(maxsize=10, ttl=60)
+    generate, calls = _counting_generator()
+    supplies = cache.get_or_generate({'mission_idea': 'food drive', 'help_mode': 'supplies'}, generate)
+    awareness = cache.get_or_generate({'mission_idea': 'food drive', 'help_mode': 'awareness'}, generate)
+    assert len(calls) == 2
+    assert supplies['help_mode'] == 'supplies'
+    assert awareness['help_mode'] == 'awareness'
+
+
+def test_hits_return_independent_copies():
+    """Callers can mutate what they get back without corrupting the cache."""
+    cache = QuestCache(maxsize=10, ttl=60)
+    generate, calls = _counting_generator()
+    data = {'mission_idea': 'Plant trees', 'help_mode': 'helpers'}
+    first = cache.get_or_generate(data, generate)
+    first['steps'].append('mutated')
+    second = cache.get_or_generate(data, generate)
+    assert len(calls) == 1
+    assert second['steps'] == []
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_lru_bound_and_ttl():
+    """Entries are evicted past maxsize and expire after the TTL."""
+    cache = QuestCache(maxsize=2, ttl=0.05)
+    for i in range(3):
+        cache.set(str(i), {'n': i})
+    assert cache.get('0') is None
+    assert cache.get('2') == {'n': 2}
+    assert cache.stats()['evictions'] == 1
+    time.sleep(0.06)
+    assert cache.get('2') is None
+
+
+def test_shared_tier_serves_other_workers(tmp_path):
+    """A second cache backed by the same SQLite file sees the first one's quests."""
+    path = str(tmp_path / 'cache.db')
+    generate, calls = _counting_generator()
+    data = {'mission_idea': 'read to seniors', 'help_mode': 'helpers'}
+    QuestCache(ttl=60, shared=SQLiteCacheTier(path)).get_or_generate(data, generate)
+    other_worker = QuestCache(ttl=60, shared=SQLiteCacheTier(path))
+    assert other_worker.get_or_generate(data, generate)['quest_name'] == 'OPERATION 1'
+    assert len(calls) == 1
+    assert other_worker.stats()['shared_hits'] == 1
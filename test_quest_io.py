@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Add raindrop-backend to the Python path so we can import quest_io
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import quest_io  # type: ignore
+from app import app  # type: ignore
+
+QUEST = {'quest_name': 'OPERATION GREEN ROOTS', 'steps': [{'id': 1, 'sgxp_reward': 10}, {'id': 2, 'sgxp_reward': 15}]}
+
+
+def _lines(count):
+    return [
+        json.dumps({'id': i, 'session_id': 'hero', 'quest': QUEST, 'completed_step_ids': [2, 9]}) + '\n'
+        for i in range(1, count + 1)
+    ]
+
+
+def test_parse_record_fills_in_sgxp():
+    """Missing SGXP totals are recomputed and unknown step ids dropped."""
+    record = quest_io.parse_record(_lines(1)[0])
+    assert record['completed_step_ids'] == [2]
+    assert (record['earned_sgxp'], record['total_sgxp']) == (15, 25)
+    with pytest.raises(ValueError):
+        quest_io.parse_record('{"id": 1}')
+
+
+def test_import_batches_and_resumes_from_checkpoint(tmp_path):
+    """Imports run in batches and a rerun skips lines already committed."""
+    checkpoint = str(tmp_path / 'import.ckpt')
+    batches = []
+    seen = []
+
+    def failing_batch(records):
+        if len(batches) == 2:
+            raise RuntimeError('connection lost')
+        batches.append([r['id'] for r in records])
+        return len(records)
+
+    with pytest.raises(RuntimeError):
+        quest_io.import_ndjson(_lines(7), batch_size=3, checkpoint_path=checkpoint, import_batch=failing_batch)
+    assert batches == [[1, 2, 3], [4, 5, 6]]
+
+    result = quest_io.import_ndjson(
+        _lines(7), batch_size=3, checkpoint_path=checkpoint,
+        import_batch=lambda records: len(records), progress=seen.append,
+    )
+    assert result == {'lines': 7, 'inserted': 7, 'resumed_from': 6}
+    assert seen == [{'lines': 7, 'inserted': 7}]
+
+
+def test_admin_export_requires_token(monkeypatch):
+    """The export endpoint is hidden unless the admin token matches."""
+    client = app.test_client()
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert client.get('/admin/export').status_code == 404
+    monkeypatch.setenv('ADMIN_TOKEN', 's3cret')
+    assert client.get('/admin/export', headers={'Authorization': 'Bearer nope'}).status_code == 404
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setenv('DB_BACKEND', 'none')
+    resp = client.get('/admin/export', headers={'Authorization': 'Bearer s3cret'})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
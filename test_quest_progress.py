@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+# Add raindrop-backend to the Python path so we can import quest_progress
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+from quest_progress import ProgressTracker  # type: ignore
+
+
+class FakeStore:
+    """In-memory stand-in for db.get_quest_progress / db.apply_step_progress."""
+
+    def __init__(self):
+        self.rows = {7: {'session_id': 'hero', 'rewards': {1: 10, 2: 15, 3: 20}, 'completed_step_ids': [1]}}
+        self.loads = 0
+        self.batches = []
+        self.fail = False
+
+    def load(self, quest_id):
+        self.loads += 1
+        row = self.rows.get(quest_id)
+        return dict(row) if row else None
+
+    def apply(self, changes):
+        if self.fail:
+            raise RuntimeError('db down')
+        self.batches.append(changes)
+        for quest_id, steps in changes.items():
+            completed = set(self.rows[quest_id]['completed_step_ids'])
+            for step_id, done in steps.items():
+                (completed.add if done else completed.discard)(step_id)
+            self.rows[quest_id]['completed_step_ids'] = sorted(completed)
+
+
+def _tracker(store):
+    # Long interval so only explicit flushes write during the test.
+    return ProgressTracker(store.load, store.apply, flush_interval=60)
+
+
+def test_toggles_are_coalesced_into_one_write():
+    """Rapid toggles are answered from memory and flushed as one batch."""
+    store = FakeStore()
+    tracker = _tracker(store)
+
+    assert tracker.toggle('hero', 7, 2, True) == {
+        'id': 7, 'completed_step_ids': [1, 2], 'earned_sgxp': 25, 'total_sgxp': 45,
+    }
+    tracker.toggle('hero', 7, 3, True)
+    tracker.toggle('hero', 7, 3, False)
+    progress = tracker.toggle('hero', 7, 1, False)
+    assert progress['completed_step_ids'] == [2]
+    assert progress['earned_sgxp'] == 15
+    assert store.loads == 1
+    assert tracker.has_pending(session_id='hero')
+
+    assert tracker.flush() == 1
+    assert store.batches == [{7: {2: True, 3: False, 1: False}}]
+    assert store.rows[7]['completed_step_ids'] == [2]
+    assert not tracker.has_pending(quest_id=7)
+    assert tracker.stats()['toggles'] == 4
+    tracker.close()
+
+
+def test_toggle_checks_owner_and_step():
+    """Other sessions' quests look missing; unknown steps raise LookupError."""
+    store = FakeStore()
+    tracker = _tracker(store)
+    assert tracker.toggle('villain', 7, 1, True) is None
+    assert tracker.toggle('hero', 99, 1, True) is None
+    with pytest.raises(LookupError):
+        tracker.toggle('hero', 7, 42, True)
+
+
+def test_failed_flush_keeps_toggles_for_retry():
+    """A failed batch is retried with any newer toggles taking precedence."""
+    store = FakeStore()
+    tracker = _tracker(store)
+    tracker.toggle('hero', 7, 2, True)
+    tracker.toggle('hero', 7, 3, True)
+
+    store.fail = True
+    assert tracker.flush() == 0
+    tracker.toggle('hero', 7, 3, False)
+
+    store.fail = False
+    assert tracker.flush() == 1
+    assert store.batches == [{7: {2: True, 3: False}}]
+    assert store.rows[7]['completed_step_ids'] == [1, 2]
+    assert tracker.stats()['failed_flushes'] == 1
+    tracker.close()
@@ -0,0 +1,87 @@
+import os
+import sys
+
+# Add raindrop-backend to the Python path so we can import the cache
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+from quest_read_cache import QuestReadCache, SQLiteReadTier  # type: ignore
+
+
+def test_pages_are_served_until_the_session_is_invalidated():
+    """A cached page is reused until a write for its session bumps the version."""
+    cache = QuestReadCache(maxsize=8, ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return b'[%d]' % len(loads), None
+
+    token = cache.version('hero')
+    first = cache.fetch_page('hero', token, 20, None, load)
+    assert cache.fetch_page('hero', cache.version('hero'), 20, None, load).body == first.body
+    assert len(loads) == 1
+    cache.invalidate('other')
+    assert cache.fetch_page('hero', cache.version('hero'), 20, None, load).etag == first.etag
+    cache.invalidate('hero')
+    second = cache.fetch_page('hero', cache.version('hero'), 20, None, load)
+    assert second.body == b'[2]' and second.etag != first.etag
+
+
+def test_read_racing_a_write_is_never_served():
+    """A page loaded under a token that was bumped meanwhile is not reused."""
+    cache = QuestReadCache(maxsize=8, ttl=60)
+    token = cache.version('hero')
+
+    def racing_load():
+        cache.invalidate('hero')
+        return b'[]', None
+
+    cache.fetch_page('hero', token, 20, None, racing_load)
+    assert cache.get('page|hero|20|', cache.version('hero')) is None
+
+
+def test_single_quests_are_cached_once_their_owner_is_known():
+    """The first read of a quest learns its owner; later reads are cached."""
+    cache = QuestReadCache(maxsize=8, ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return b'{"id":7}', 'hero'
+
+    assert cache.fetch_quest(7, load).etag is None
+    cached = cache.fetch_quest(7, load)
+    assert cached.etag is not None
+    assert cache.fetch_quest(7, load) is not None and len(loads) == 2
+    cache.invalidate('hero')
+    assert cache.fetch_quest(7, lambda: None) is None
+
+
+def test_shared_tier_invalidates_across_workers(tmp_path):
+    """A write through one worker's cache makes another worker's entry stale."""
+    path = str(tmp_path / 'read-cache.db')
+    worker_a = QuestReadCache(maxsize=8, ttl=60, shared=SQLiteReadTier(path))
+    worker_b = QuestReadCache(maxsize=8, ttl=60, shared=SQLiteReadTier(path))
+    token = worker_a.version('hero')
+    worker_a.fetch_page('hero', token, 20, None, lambda: (b'[1]', None))
+    assert worker_b.version('hero') == token
+    assert worker_b.fetch_page('hero', token, 20, None, lambda: (b'[2]', None)).body == b'[1]'
+    assert worker_b.stats()['shared_hits'] == 1
+    worker_a.invalidate('hero')
+    fresh = worker_b.fetch_page('hero', worker_b.version('hero'), 20, None, lambda: (b'[3]', None))
+    assert fresh.body == b'[3]'
+
+
+def test_invalidate_all_reaches_every_session_and_worker(tmp_path):
+    """A purge makes every session's entries stale, in the shared tier too."""
+    path = str(tmp_path / 'read-cache.db')
+    worker_a = QuestReadCache(maxsize=8, ttl=60, shared=SQLiteReadTier(path))
+    worker_b = QuestReadCache(maxsize=8, ttl=60, shared=SQLiteReadTier(path))
+    tokens = {session: worker_a.version(session) for session in ('hero', 'sidekick')}
+    for session, token in tokens.items():
+        worker_a.fetch_page(session, token, 20, None, lambda: (b'[1]', None))
+    worker_b.invalidate_all()
+    for session, token in tokens.items():
+        current = worker_a.version(session)
+        assert current != token
+        assert worker_a.fetch_page(session, current, 20, None, lambda: (b'[]', None)).body == b'[]'
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+
+# Add raindrop-backend to the Python path so we can import the stream helpers
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import inference_client  # type: ignore
+import quest_cache  # type: ignore
+import quest_stream  # type: ignore
+from quest_stream import QuestStreamParser  # type: ignore
+
+QUEST = {
+    'quest_name': 'OPERATION "BRACES" {',
+    'mission_summary': 'Fix the fence, then [celebrate].',
+    'difficulty': 'Easy',
+    'estimated_duration_days': 14,
+    'steps': [
+        {'id': 1, 'title': 'Plan}', 'description': 'Nested {"x": [1, 2]}', 'sgxp_reward': 10},
+        {'id': 2, 'title': 'Build', 'meta': {'tools': ['saw', 'nails']}, 'sgxp_reward': 20},
+    ],
+    'reflection_prompts': ['Who helped?'],
+    'safety_notes': None,
+}
+
+EXPECTED = [
+    ('quest_name', QUEST['quest_name']),
+    ('mission_summary', QUEST['mission_summary']),
+    ('step', QUEST['steps'][0]),
+    ('step', QUEST['steps'][1]),
+]
+
+
+def test_parser_emits_fields_and_steps_whatever_the_chunking():
+    """Events come out complete and in order for any split of the body."""
+    for text in (json.dumps(QUEST), json.dumps(QUEST, indent=2)):
+        for size in (1, 5, 64, len(text)):
+            parser = QuestStreamParser()
+            events = []
+            for start in range(0, len(text), size):
+                events += parser.feed(text[start:start + size])
+            assert events == EXPECTED and not parser.failed
+
+
+def test_parser_reports_the_name_before_the_body_is_complete():
+    """The quest name is available as soon as its string closes."""
+    parser = QuestStreamParser()
+    assert parser.feed('{"difficulty": 3, "quest_name": "OPERATION EARLY"') == [('quest_name', 'OPERATION EARLY')]
+    assert parser.feed(', "steps": [{"id": 1}') == [('step', {'id': 1})]
+
+
+def test_parser_stops_on_malformed_input():
+    """Broken JSON marks the parser failed instead of raising."""
+    parser = QuestStreamParser()
+    assert parser.feed('{"quest_name": "bad \\q escape", ') == []
+    assert parser.failed and parser.feed('"steps": []}') == []
+
+
+class _FakeClient:
+    def __init__(self, chunks, quest):
+        self.chunks, self.quest = chunks, quest
+
+    def stream(self, payload):
+        yield from self.chunks
+        return self.quest
+
+
+def _events(monkeypatch, client, data=None):
+    monkeypatch.setattr(inference_client, 'get_client', lambda: client)
+    monkeypatch.setattr(quest_cache, 'get_cache', lambda: None)
+    offline = {'quest_name': 'OFFLINE', 'mission_summary': 'Local.', 'steps': [{'id': 1}]}
+    return list(quest_stream.generate_events(data or {'mission_idea': 'fence'}, lambda d: offline))
+
+
+def test_generate_events_streams_then_returns_the_validated_quest(monkeypatch):
+    """Upstream text is parsed as it arrives and the final quest closes the stream."""
+    text = json.dumps(QUEST)
+    events = _events(monkeypatch, _FakeClient([text[:40], text[40:]], QUEST))
+    assert events == EXPECTED + [('quest', QUEST)]
+
+
+def test_generate_events_resets_when_upstream_fails_part_way(monkeypatch):
+    """Partial content is withdrawn before the offline quest is sent."""
+    events = _events(monkeypatch, _FakeClient([json.dumps(QUEST)[:60]], None))
+    assert events[0] == ('quest_name', QUEST['quest_name'])
+    assert events[events.index(('reset', None)) + 1] == ('quest_name', 'OFFLINE')
+    assert events[-1][0] == 'quest' and events[-1][1]['quest_name'] == 'OFFLINE'
+
+
+def test_format_event_is_one_sse_message():
+    """Each event is an event line, one data line and a blank line."""
+    assert quest_stream.format_event('step', {'title': 'a\nb'}) == b'event: step\ndata: {"title":"a\\nb"}\n\n'
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+# Add raindrop-backend to the Python path so we can import the writer
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+from quest_writer import QuestWriter  # type: ignore
+
+
+class _Store:
+    """Reserves ids from a counter and records written batches."""
+
+    def __init__(self):
+        self.next_id = 0
+        self.batches = []
+        self.rows = {}
+        self.fail = False
+
+    def reserve(self, count):
+        ids = list(range(self.next_id + 1, self.next_id + count + 1))
+        self.next_id += count
+        return ids
+
+    def write(self, records):
+        if self.fail:
+            raise RuntimeError('database is down')
+        self.batches.append([r['id'] for r in records])
+        for record in records:
+            self.rows.setdefault(record['id'], record)
+
+
+def _writer(store, spill_dir, **kwargs):
+    kwargs.setdefault('flush_interval', 60)
+    return QuestWriter(store.reserve, store.write, spill_dir=str(spill_dir), **kwargs)
+
+
+def _spilled(spill_dir):
+    return [json.loads(line) for path in sorted(spill_dir.glob('*.ndjson')) for line in path.read_text().splitlines()]
+
+
+def test_quests_get_reserved_ids_and_are_written_in_batches(tmp_path):
+    """Ids come from prefetched blocks and quests are written batch_size at a time."""
+    store = _Store()
+    writer = _writer(store, tmp_path, batch_size=2, id_prefetch=3)
+    ids = [writer.submit('hero', {'quest_name': f'Q{i}', 'steps': []})['id'] for i in range(5)]
+    assert ids == [1, 2, 3, 4, 5] and store.next_id == 6
+    # Reaching batch_size wakes the flusher, which may already be writing.
+    writer.flush()
+    assert sorted(store.rows) == ids and max(len(batch) for batch in store.batches) == 2
+    assert _spilled(tmp_path) == [] and writer.stats()['pending'] == 0
+    writer.close()
+
+
+def test_failed_flush_keeps_the_queue_and_the_spill(tmp_path):
+    """Quests survive a failed flush and are written by the next one."""
+    store = _Store()
+    writer = _writer(store, tmp_path)
+    writer.submit('hero', {'quest_name': 'ONE'})
+    store.fail = True
+    assert writer.flush() == 0
+    writer.submit('hero', {'quest_name': 'TWO'})
+    assert writer.has_pending(session_id='hero') and len(_spilled(tmp_path)) == 2
+    assert store.rows == {}
+    store.fail = False
+    assert writer.flush() == 2
+    assert sorted(store.rows) == [1, 2] and _spilled(tmp_path) == []
+    assert writer.stats()['failed_flushes'] == 1
+    writer.close()
+
+
+def test_spill_of_a_crashed_worker_is_recovered(tmp_path):
+    """A new writer requeues segments whose owner no longer holds their lock."""
+    orphan = {'id': 41, 'session_id': 'hero', 'created_at': '2025-01-01T00:00:00+00:00', 'quest': {},
+              'completed_step_ids': [], 'earned_sgxp': 0, 'total_sgxp': 0}
+    (tmp_path / 'quests-999999999.lock').write_text('')
+    (tmp_path / 'quests-999999999.1.ndjson').write_text(json.dumps(orphan) + '\n{"id": 42, "sess')
+    store = _Store()
+    writer = _writer(store, tmp_path).start()
+    assert writer.stats()['recovered'] == 1
+    assert not (tmp_path / 'quests-999999999.1.ndjson').exists()
+    assert writer.flush() == 1 and store.rows[41]['session_id'] == 'hero'
+    writer.close()
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+
+# Add raindrop-backend to the Python path so we can import the limiters
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import pytest
+
+from rate_limit import AsyncConcurrencyLimiter, ConcurrencyLimiter, MemoryBucketStore, Overloaded, RateLimiter, SQLiteBucketStore  # type: ignore
+
+
+def test_bucket_allows_a_burst_then_asks_to_retry():
+    """A client gets ``burst`` requests at once, then a Retry-After for the next token."""
+    limiter = RateLimiter('generate', per_minute=6, burst=3)
+    assert [limiter.take('hero')[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = limiter.take('hero')
+    assert not allowed and retry_after == 10
+    assert limiter.take('sidekick') == (True, 0)
+    assert limiter.take('hero', cost=5)[0] is False
+    assert limiter.stats() == {'allowed': 4, 'limited': 2, 'store_errors': 0}
+
+
+def test_memory_store_forgets_least_recent_clients():
+    """Beyond maxsize the least recently seen bucket is dropped (and starts full)."""
+    store = MemoryBucketStore(maxsize=2)
+    for key in ('a', 'b', 'c'):
+        store.take(key, 1, rate=0.001, burst=1)
+    assert store.take('a', 1, rate=0.001, burst=1)[0]
+    assert not store.take('c', 1, rate=0.001, burst=1)[0]
+
+
+def test_sqlite_store_is_shared_between_limiters(tmp_path):
+    """Two workers pointing at one file spend from the same bucket."""
+    path = str(tmp_path / 'limits.db')
+    worker_a = RateLimiter('delete', per_minute=60, burst=2, store=SQLiteBucketStore(path))
+    worker_b = RateLimiter('delete', per_minute=60, burst=2, store=SQLiteBucketStore(path))
+    assert worker_a.take('hero')[0] and worker_b.take('hero')[0]
+    assert worker_a.take('hero') == (False, 1)
+
+
+def test_concurrency_limiter_queues_then_sheds():
+    """Beyond the limit callers queue (bounded), then are shed with Retry-After."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=1, queue_timeout=5)
+    held = limiter.acquire()
+    queued = []
+    waiter = threading.Thread(target=lambda: queued.append(limiter.acquire()))
+    waiter.start()
+    while limiter.stats()['waiting'] == 0:
+        time.sleep(0.001)
+    with pytest.raises(Overloaded) as shed:
+        limiter.acquire()
+    assert shed.value.retry_after >= 1
+    limiter.release(held)
+    waiter.join(5)
+    assert queued and limiter.stats()['in_flight'] == 1
+    limiter.release(queued[0])
+    stats = limiter.stats()
+    assert (stats['admitted'], stats['queued'], stats['shed']) == (2, 1, 1)
+
+
+def test_concurrency_limiter_times_out_in_the_queue():
+    """A queued caller gives up after queue_timeout."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=5, queue_timeout=0.01)
+    with limiter.slot():
+        with pytest.raises(Overloaded):
+            limiter.acquire()
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_async_limiter_queues_sheds_and_frees_cancelled_waiters():
+    """On the event loop: queue, shed, time out, and no slot lost to a cancelled waiter."""
+    import asyncio
+
+    async def scenario():
+        limiter = AsyncConcurrencyLimiter(limit=1, max_queue=2, queue_timeout=0.2)
+        held = await limiter.acquire()
+        cancelled = asyncio.ensure_future(limiter.acquire())
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        limiter.release(held)
+        limiter.release(await queued)
+        stats = limiter.stats()
+        assert (stats['in_flight'], stats['waiting']) == (0, 0)
+        assert (stats['admitted'], stats['queued'], stats['shed']) == (2, 2, 1)
+
+        # A waiter cancelled right after being handed a slot passes it on.
+        held = await limiter.acquire()
+        handed = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release(held)
+        handed.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await handed
+        assert limiter.stats()['in_flight'] == 0
+        limiter.release(await limiter.acquire())
+
+        held = await limiter.acquire()
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        limiter.release(held)
+        assert limiter.stats()['in_flight'] == 0
+
+    asyncio.run(scenario())
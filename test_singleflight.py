@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+import time
+
+# Add raindrop-backend to the Python path so we can import the coalescer
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import pytest
+
+from singleflight import SingleFlight  # type: ignore
+
+
+def _run_concurrently(flight, key, fn, n):
+    results = [None] * n
+    start = threading.Barrier(n)
+
+    def worker(i):
+        start.wait()
+        try:
+            results[i] = flight.do(key, fn)
+        except Exception as exc:  # collected for assertions
+            results[i] = exc
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_callers_share_one_execution():
+    """Ten simultaneous callers trigger a single generation."""
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'quest_name': 'OPERATION SHARED'}
+
+    results = _run_concurrently(flight, 'same-mission', slow, 10)
+    assert len(calls) == 1
+    assert all(result == ({'quest_name': 'OPERATION SHARED'}, result[1]) for result in results)
+    assert sum(1 for _, shared in results if not shared) == 1
+    assert flight.stats() == {'leaders': 1, 'coalesced': 9, 'in_flight': 0}
+
+
+def test_errors_propagate_and_release_the_key():
+    """A failing leader fails its waiters, and the next call runs again."""
+    flight = SingleFlight()
+
+    def boom():
+        time.sleep(0.05)
+        raise RuntimeError('upstream down')
+
+    results = _run_concurrently(flight, 'k', boom, 4)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.do('k', lambda: 'recovered') == ('recovered', False)
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    """Only identical keys are coalesced."""
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == (1, False)
+    assert flight.do('b', lambda: 2) == (2, False)
+    with pytest.raises(ZeroDivisionError):
+        flight.do('c', lambda: 1 / 0)
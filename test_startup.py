@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raindrop-backend')
+
+# Generous enough for a slow CI box; a regression to eager imports of the
+# database and HTTP stacks roughly doubles the import time.
+IMPORT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1500'))
+
+HEAVY_MODULES = ('psycopg2', 'requests', 'asyncio', 'brotli', 'db_postgres', 'db_sqlite')
+
+PROBE = (
+    'import json, sys, time\n'
+    'started = time.perf_counter()\n'
+    'import app\n'
+    'elapsed = (time.perf_counter() - started) * 1000\n'
+    'print(json.dumps({"ms": elapsed, "heavy": [m for m in %r if m in sys.modules]}))\n' % (HEAVY_MODULES,)
+)
+
+
+def _import_app(extra_env):
+    env = {k: v for k, v in os.environ.items() if not k.startswith('RAINDROP_')}
+    env.update(extra_env)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def test_import_app_defers_heavy_dependencies():
+    """Importing the app loads no database driver, HTTP client or event loop."""
+    result, importtime = _import_app({'DATABASE_URL': 'postgresql://localhost/unused', 'DB_BACKEND': 'auto'})
+    assert result['heavy'] == []
+    assert 'import time:' in importtime
+
+
+def test_import_app_within_budget():
+    """A cold ``import app`` stays inside the startup budget."""
+    result, _ = _import_app({'DB_BACKEND': 'none'})
+    assert result['ms'] < IMPORT_BUDGET_MS, f"import app took {result['ms']:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)"
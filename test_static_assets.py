@@ -0,0 +1,70 @@
+import os
+import sys
+
+# Add raindrop-backend to the Python path so we can import the asset pipeline
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+from flask import Flask
+
+from static_assets import StaticAssets, write_build  # type: ignore
+
+
+def _frontend(tmp_path):
+    (tmp_path / 'index.html').write_text('<script src="app.js"></script><a href="https://example.com">x</a>')
+    (tmp_path / 'app.js').write_text('console.log("citizen hero");\n' * 50)
+    return str(tmp_path)
+
+
+def _client(assets):
+    app = Flask(__name__, static_folder=None)
+    app.add_url_rule('/<path:path>', 'asset', assets.serve)
+    return app.test_client()
+
+
+def test_index_references_fingerprinted_assets(tmp_path):
+    """HTML points at immutable fingerprinted names; plain names must revalidate."""
+    assets = StaticAssets(_frontend(tmp_path))
+    client = _client(assets)
+    fingerprinted = assets.urls['app.js']
+    index = client.get('/index.html')
+    assert f'src="{fingerprinted}"' in index.get_data(as_text=True)
+    assert 'href="https://example.com"' in index.get_data(as_text=True)
+    assert index.headers['Cache-Control'] == 'no-cache'
+    resp = client.get(f'/{fingerprinted}')
+    assert resp.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert client.get('/app.js').headers['Cache-Control'] == 'no-cache'
+    assert client.get('/missing.js').status_code == 404
+
+
+def test_content_negotiation_and_revalidation(tmp_path):
+    """Compressed bodies follow Accept-Encoding and each has its own ETag."""
+    client = _client(StaticAssets(_frontend(tmp_path)))
+    plain = client.get('/app.js', headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert len(gzipped.data) < len(plain.data)
+    assert gzipped.headers['Vary'] == 'Accept-Encoding'
+    assert gzipped.headers['ETag'] != plain.headers['ETag']
+    again = client.get('/app.js', headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+
+
+def test_reload_picks_up_changed_files(tmp_path):
+    """With reload on, an edited file gets a new fingerprint."""
+    assets = StaticAssets(_frontend(tmp_path), reload=True)
+    before = assets.urls['app.js']
+    (tmp_path / 'app.js').write_text('console.log("changed");\n')
+    client = _client(assets)
+    assert client.get('/index.html').status_code == 200
+    assert assets.urls['app.js'] != before
+
+
+def test_build_writes_static_host_layout(tmp_path):
+    """The build step writes fingerprinted files next to their compressed copies."""
+    src, out = tmp_path / 'src', tmp_path / 'dist'
+    src.mkdir()
+    write_build(_frontend(src), str(out))
+    names = sorted(os.listdir(out))
+    assert 'index.html' in names and 'app.js.gz' in names
+    assert any(name.startswith('app.') and name.endswith('.js.gz') and name != 'app.js.gz' for name in names)
@@ -0,0 +1,324 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add raindrop-backend to the Python path so we can import the db helpers
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'raindrop-backend'))
+
+import pytest
+
+import db  # type: ignore
+
+
+def _quest(name, help_mode='supplies', rewards=(10, 20)):
+    return {
+        'quest_name': name,
+        'help_mode': help_mode,
+        'steps': [{'id': i + 1, 'description': f'step {i + 1}', 'sgxp_reward': r} for i, r in enumerate(rewards)],
+    }
+
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def store(request, monkeypatch, tmp_path):
+    """The db API on a fresh database for each backend."""
+    if request.param == 'postgres':
+        url = os.getenv('TEST_DATABASE_URL')
+        if not url:
+            pytest.skip('set TEST_DATABASE_URL to run the suite against Postgres')
+        monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setenv('DB_BACKEND', request.param)
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'quests.sqlite3'))
+    db.init_schema()
+    if request.param == 'postgres':
+        # Aggregates are global there, so keep this test's rows to itself.
+        for session in ('a', 'b'):
+            db.delete_all_quests(f'{tmp_path.name}-{session}')
+    return db
+
+
+def test_insert_page_and_get_match_across_backends(store, tmp_path):
+    """Keyset pages, single reads and the JSON passthrough agree with each other."""
+    session = f'{tmp_path.name}-a'
+    ids = [store.insert_quest(session, _quest(f'Q{i}'))['id'] for i in range(5)]
+    first, cursor = store.list_quests_page(session, limit=3)
+    assert [q['id'] for q in first] == ids[:-4:-1]
+    assert first[0]['quest_name'] == 'Q4' and first[0]['total_sgxp'] == 30
+    rest, end = store.list_quests_page(session, limit=3, cursor=cursor)
+    assert [q['id'] for q in rest] == ids[1::-1] and end is None
+
+    text, json_cursor = store.list_quests_page_json(session, limit=3)
+    assert [q['id'] for q in json.loads(text)] == [q['id'] for q in first]
+    assert json_cursor == cursor
+    single = store.get_quest_by_id(ids[0])
+    assert single['quest_name'] == 'Q0' and single['completed_step_ids'] == []
+    assert json.loads(store.get_quest_json_by_id(ids[0]))['steps'] == single['steps']
+    assert store.get_quest_by_id(10 ** 9) is None and store.get_quest_json_by_id(10 ** 9) is None
+    with pytest.raises(ValueError):
+        store.list_quests_page(session, cursor='not-a-cursor')
+
+
+def test_progress_stats_and_leaderboard(store, tmp_path):
+    """Step progress moves the per-session and global aggregates."""
+    a, b = f'{tmp_path.name}-a', f'{tmp_path.name}-b'
+    before = store.get_global_stats()
+    first = store.insert_quest(a, _quest('GREEN ROOTS', 'helpers'))['id']
+    store.insert_quests(b, [_quest('BOOK DRIVE'), _quest('BOOK DRIVE')])
+    assert store.get_quest_progress(first)['rewards'] == {1: 10, 2: 20}
+    assert store.apply_step_progress({first: {1: True, 2: True}}) == 1
+    assert store.apply_step_progress({first: {2: False}}) == 1
+    assert store.get_quest_progress(first)['completed_step_ids'] == [1]
+
+    assert store.get_session_stats(a) == {'quest_count': 1, 'completed_quests': 0, 'total_sgxp': 30, 'earned_sgxp': 10}
+    assert store.get_session_stats(b)['quest_count'] == 2
+    overall = store.get_global_stats()
+    assert overall['quest_count'] - before['quest_count'] == 3
+    assert overall['help_modes']['helpers'] - before['help_modes'].get('helpers', 0) == 1
+    codenames = {row['codename']: row['quest_count'] for row in overall['top_codenames']}
+    assert codenames.get('BOOK DRIVE', 0) >= 2
+    board = [row['session_id'] for row in store.get_leaderboard(limit=100)]
+    assert board.index(a) < board.index(b)
+
+    assert store.delete_quest(b, first) is False
+    assert store.delete_quest(a, first) is True
+    assert store.delete_all_quests(b) == 2
+    assert store.get_session_stats(b)['quest_count'] == 0
+
+
+def test_export_import_round_trip(store, tmp_path):
+    """Exported records import back with their ids, and re-imports are no-ops."""
+    session = f'{tmp_path.name}-a'
+    inserted = store.insert_quests(session, [_quest('ONE'), _quest('TWO')])
+    records = [json.loads(line) for line in store.iter_quest_export(session_id=session, batch_size=1)]
+    assert [r['id'] for r in records] == [row['id'] for row in inserted]
+    assert records[1]['quest']['quest_name'] == 'TWO'
+
+    assert store.delete_all_quests(session) == 2
+    assert store.import_quests(records) == 2
+    assert store.import_quests(records) == 0
+    restored = store.get_quest_by_id(records[0]['id'])
+    assert restored['quest_name'] == 'ONE' and restored['session_id'] == session
+    fresh = dict(records[0], id=None, created_at=None)
+    assert store.import_quests([fresh]) == 1
+    assert store.get_session_stats(session)['quest_count'] == 3
+
+
+def test_reserved_ids_are_never_handed_out_again(store, tmp_path):
+    """Reserved ids are skipped by inserts and can be written later with import."""
+    session = f'{tmp_path.name}-a'
+    reserved = store.reserve_quest_ids(3)
+    assert reserved == sorted(reserved) and len(set(reserved)) == 3
+    assert store.insert_quest(session, _quest('AFTER'))['id'] > reserved[-1]
+    record = {'id': reserved[0], 'session_id': session, 'created_at': None, 'quest': _quest('RESERVED'),
+              'completed_step_ids': [], 'earned_sgxp': 0, 'total_sgxp': 30}
+    assert store.import_quests([record]) == 1
+    assert store.reserve_quest_ids(1)[0] > reserved[-1]
+    assert store.get_quest_by_id(reserved[0])['quest_name'] == 'RESERVED'
+
+
+def test_chunked_deletes_and_retention_purge(store, tmp_path):
+    """Bulk deletes go in chunks, and purges drop only quests past retention."""
+    a, b = f'{tmp_path.name}-a', f'{tmp_path.name}-b'
+    store.insert_quests(a, [_quest(f'Q{i}') for i in range(5)])
+    assert store.delete_all_quests(a, chunk_size=2) == 5
+    assert store.get_session_stats(a)['quest_count'] == 0
+
+    old = [{'session_id': b, 'created_at': f'{2000 + i}-01-15T12:00:00+00:00', 'quest': _quest(f'OLD{i}'),
+            'completed_step_ids': [], 'earned_sgxp': 0, 'total_sgxp': 30} for i in range(3)]
+    assert store.import_quests(old) == 3
+    kept = store.insert_quest(b, _quest('NEW'))['id']
+    result = store.purge_expired_quests(retention_months=12, chunk_size=2)
+    assert result['cutoff'] == store.retention_cutoff(12)
+    assert result['rows_deleted'] + len(result['partitions_dropped']) >= 3
+    page, _ = store.list_quests_page(b)
+    assert [q['id'] for q in page] == [kept]
+    assert store.get_session_stats(b)['quest_count'] == 1
+    assert store.purge_expired_quests(retention_months=0)['cutoff'] is None
+
+
+def test_deduplicated_quests_read_back_whole(store, tmp_path, monkeypatch):
+    """With QUEST_DEDUP on, offline quests read, export and count as before."""
+    import generate_quest  # type: ignore
+
+    monkeypatch.setenv('QUEST_DEDUP', '1')
+    session = f'{tmp_path.name}-a'
+    offline = [generate_quest.generate_quest({'mission_idea': idea, 'help_mode': 'helpers'})
+               for idea in ('plant a "garden"', 'book drive', '')]
+    inline = _quest('SMART', 'helpers')
+    ids = [row['id'] for row in store.insert_quests(session, offline + [inline])]
+    for quest_id, quest in zip(ids, offline + [inline]):
+        stored = store.get_quest_by_id(quest_id)
+        assert {key: stored[key] for key in quest} == quest
+        assert json.loads(store.get_quest_json_by_id(quest_id))['steps'] == quest['steps']
+    page, _ = store.list_quests_page(session)
+    assert [q['mission_summary'] for q in page[1:]] == [q['mission_summary'] for q in offline[::-1]]
+
+    step_id = offline[1]['steps'][0]['id']
+    assert store.apply_step_progress({ids[1]: {step_id: True}}) == 1
+    assert store.get_quest_progress(ids[1])['completed_step_ids'] == [step_id]
+    stats = store.get_global_stats()
+    codenames = {row['codename'] for row in stats['top_codenames']}
+    assert offline[0]['quest_name'] in codenames and stats['help_modes']['helpers'] >= 4
+
+    records = [json.loads(line) for line in store.iter_quest_export(session_id=session)]
+    assert [r['quest'] for r in records] == offline + [inline]
+    assert store.delete_all_quests(session) == 4
+    assert store.import_quests(records) == 4
+    assert store.get_quest_by_id(ids[0])['steps'] == offline[0]['steps']
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    """The db API on an empty Postgres schema.  TEST_DATABASE_URL is wiped:
+    point it at a throwaway database."""
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('set TEST_DATABASE_URL to run the suite against Postgres')
+    monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setenv('DB_BACKEND', 'postgres')
+    import db_postgres  # type: ignore
+    import quest_dedup  # type: ignore
+
+    conn = db_postgres.get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            # Detached partitions outlive DROP TABLE quests.
+            cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename LIKE 'quests%'")
+            tables = [row[0] for row in cur.fetchall()] + [
+                'quest_bodies', 'quest_retired_partitions', 'quest_session_stats',
+                'quest_global_stats', 'quest_group_counts', 'schema_version',
+            ]
+            cur.execute('DROP TABLE IF EXISTS {} CASCADE'.format(', '.join(f'"{name}"' for name in tables)))
+    finally:
+        conn.close()
+    monkeypatch.setattr(quest_dedup, '_known_hashes', {})
+    return db_postgres
+
+
+def _months_ago(count, day=15):
+    return (db.add_months(db.month_start(datetime.now(timezone.utc)), -count)).replace(day=day, hour=12)
+
+
+def _record(session, created_at, name):
+    return {'session_id': session, 'created_at': created_at.isoformat(), 'quest': _quest(name),
+            'completed_step_ids': [], 'earned_sgxp': 0, 'total_sgxp': 30}
+
+
+def test_partitioning_a_populated_quests_table_keeps_rows_ids_and_stats(postgres, monkeypatch):
+    """partition_quests_table turns a plain table with data into quests_legacy."""
+    monkeypatch.setattr(postgres, 'QUEST_PARTITIONING', False)
+    db.init_schema()
+    assert db.list_quest_partitions() == []
+    first = db.insert_quest('legacy', _quest('GREEN ROOTS'))['id']
+    db.insert_quests('legacy', [_quest('BOOK DRIVE'), _quest('BOOK DRIVE')])
+    assert db.import_quests([_record('legacy', _months_ago(30), 'OLD')]) == 1
+    assert db.apply_step_progress({first: {1: True}}) == 1
+    before_page, _ = db.list_quests_page('legacy', limit=10)
+    before_stats = db.get_session_stats('legacy')
+
+    monkeypatch.setattr(postgres, 'QUEST_PARTITIONING', True)
+    created = db.partition_quests_table()
+    partitions = db.list_quest_partitions()
+    assert partitions[0]['name'] == 'quests_legacy' and partitions[0]['start'] is None
+    assert created and {p['name'] for p in partitions[1:]} == set(created)
+    assert db.partition_quests_table() == []
+    db.init_schema()
+    # The attach reused the indexes built before the swap; none was built under the lock.
+    conn = postgres.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'quests_legacy'")
+            assert {row[0] for row in cur.fetchall()} == {
+                'quests_legacy_pkey', 'quests_legacy_id_created_key', 'quests_legacy_session_created_id_idx',
+            }
+    finally:
+        conn.close()
+
+    after_page, _ = db.list_quests_page('legacy', limit=10)
+    assert after_page == before_page
+    assert db.get_session_stats('legacy') == before_stats
+    assert db.get_quest_progress(first)['completed_step_ids'] == [1]
+    # The id sequence carries over and the stats trigger still fires.
+    newest = db.insert_quest('legacy', _quest('AFTER'))['id']
+    assert newest > max(q['id'] for q in before_page)
+    assert db.get_session_stats('legacy')['quest_count'] == before_stats['quest_count'] + 1
+
+
+def test_writes_into_a_month_without_a_partition_create_it(postgres):
+    """Imports of old months and inserts after a partition went missing both land."""
+    db.init_schema()
+    old = _months_ago(40)
+    name = f'quests_p{old:%Y_%m}'
+    assert name not in {p['name'] for p in db.list_quest_partitions()}
+    assert db.import_quests([_record('gaps', old, 'OLD')]) == 1
+    assert name in {p['name'] for p in db.list_quest_partitions()}
+
+    current = f'quests_p{datetime.now(timezone.utc):%Y_%m}'
+    conn = postgres.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP TABLE "{current}"')
+        conn.commit()
+    finally:
+        conn.close()
+    quest_id = db.insert_quest('gaps', _quest('NOW'))['id']
+    assert current in {p['name'] for p in db.list_quest_partitions()}
+    assert db.get_quest_by_id(quest_id)['quest_name'] == 'NOW'
+    assert db.get_session_stats('gaps')['quest_count'] == 2
+
+
+def test_purge_drops_only_expired_partitions(postgres):
+    """Months wholly before the cutoff are detached and dropped; the rest stay."""
+    db.init_schema()
+    months = {count: f'quests_p{_months_ago(count):%Y_%m}' for count in (14, 13, 12, 1)}
+    assert db.import_quests([_record('purge', _months_ago(count), f'M{count}') for count in months]) == 4
+    db.insert_quest('purge', _quest('NOW'))
+    before = db.get_global_stats()
+
+    result = db.purge_expired_quests(retention_months=12)
+    assert result['cutoff'] == db.retention_cutoff(12)
+    assert result['partitions_dropped'] == [months[14], months[13]]
+    assert result['rows_deleted'] == 0
+    remaining = {p['name'] for p in db.list_quest_partitions()}
+    assert months[12] in remaining and months[1] in remaining
+    assert not {months[14], months[13]} & remaining
+    page, _ = db.list_quests_page('purge', limit=10)
+    assert sorted(q['quest_name'] for q in page) == ['M1', 'M12', 'NOW']
+    assert db.get_session_stats('purge')['quest_count'] == 3
+    assert before['quest_count'] - db.get_global_stats()['quest_count'] == 2
+
+    conn = postgres.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT to_regclass(%s), to_regclass(%s)', (months[14], months[13]))
+            assert cur.fetchone() == (None, None)
+            cur.execute('SELECT COUNT(*) FROM quest_retired_partitions')
+            assert cur.fetchone()[0] == 0
+    finally:
+        conn.close()
+    assert db.purge_expired_quests(retention_months=12)['partitions_dropped'] == []
+
+
+def test_deduplicated_missions_with_escapes_round_trip(postgres, monkeypatch):
+    """quest_document splices missions that need JSON escaping back exactly."""
+    import generate_quest  # type: ignore
+    import quest_dedup  # type: ignore
+
+    monkeypatch.setenv('QUEST_DEDUP', '1')
+    db.init_schema()
+    missions = ['say "hi" to the neighbours', r'C:\shelter\food \u00e9', 'café für Größe ☕ 日本語 🚀',
+                'tab\tnew\nline', 'quote \' and "\\" mix']
+    quests = [generate_quest.generate_quest({'mission_idea': idea, 'help_mode': 'supplies'}) for idea in missions]
+    assert all(quest_dedup.split_quest(quest).body_hash for quest in quests)
+    ids = [row['id'] for row in db.insert_quests('escapes', quests)]
+
+    for quest_id, quest in zip(ids, quests):
+        stored = db.get_quest_by_id(quest_id)
+        assert {key: stored[key] for key in quest} == quest
+        assert {key: value for key, value in json.loads(db.get_quest_json_by_id(quest_id)).items()
+                if key in quest} == quest
+    text, _ = db.list_quests_page_json('escapes', limit=10)
+    assert [{key: q[key] for key in quests[0]} for q in json.loads(text)] == quests[::-1]
+    exported = [json.loads(line)['quest'] for line in db.iter_quest_export(session_id='escapes')]
+    assert [{key: q[key] for key in quest} for q, quest in zip(exported, quests)] == quests